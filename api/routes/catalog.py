@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from database.connection import AsyncSessionLocal
 from database.models import Channel, Auction, User, UserSubscription, Category, ChannelCategory
 from services.subscription_service import subscription_service
+from services.category_registry import category_registry, clean_name
 from services.monitor import monitor
 from pydantic import BaseModel, HttpUrl
 from typing import List, Optional
@@ -14,7 +15,6 @@ from config.settings import config
 import io
 import os
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 
@@ -145,18 +145,10 @@ async def get_channels(
         )
         
         if category:
-            # Більш робастний парсинг: прибираємо всі символи до першої літери/цифри 
-            # (емодзі зазвичай на початку)
-            clean_cat = category
-            match = re.search(r'[a-zA-Zа-яА-Я0-9іІїЇєЄ]', category)
-            if match:
-                clean_cat = category[match.start():].strip()
-            
-            logger.info(f"🧹 Cleaned category name: '{category}' -> '{clean_cat}'")
-            
-            cat_stmt = select(Category.id).where(Category.name == clean_cat)
-            cat_res = await db.execute(cat_stmt)
-            cat_id = cat_res.scalar()
+            # Категорія з довідника в пам'яті: мітка з емодзі або чиста назва, без урахування регістру
+            clean_cat = clean_name(category) or category
+            cat_entry = await category_registry.get(category)
+            cat_id = cat_entry.id if cat_entry else None
             
             if cat_id:
                 # JOIN з ChannelCategory для фільтрації та отримання активності
@@ -510,9 +502,7 @@ async def place_bid(bid: AuctionBidRequest, db: AsyncSession = Depends(get_db)):
 async def get_all_auctions(db: AsyncSession = Depends(get_db)):
     """Отримати всі активні аукціони для Кабінету"""
     # Отримуємо всі унікальні видимі категорії з БД
-    cat_stmt = select(Category).where(Category.is_visible == True)
-    cat_res = await db.execute(cat_stmt)
-    categories = [f"{cat.emoji} {cat.name}" for cat in cat_res.scalars().all()]
+    categories = await category_registry.labels()
 
     # Отримуємо фактичні аукціони
     now = datetime.now(timezone.utc)
@@ -30,8 +30,8 @@ async def main():
     logger.info("Bot is ready to poll!")
     
     # Запуск моніторингу у фоні
-    from services.monitor import monitor
-    monitor_task = asyncio.create_task(monitor.run_monitoring())
+    from services.monitor_pool import monitor_pool
+    monitor_task = asyncio.create_task(monitor_pool.run())
 
     # Запуск планувальника ранкових дайджестів (8:00)
     from services.scheduler import run_scheduler
@@ -72,7 +72,7 @@ async def main():
         logger.error(f"Error during polling: {e}")
     finally:
         # Зупиняємо моніторинг коректно
-        await monitor.stop()
+        await monitor_pool.stop()
         if not monitor_task.done():
             monitor_task.cancel()
             try:
@@ -16,8 +16,16 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     
     # AI Configuration
-    GEMINI_API_KEY: str
+    GEMINI_API_KEY: Optional[str] = None  # Обов'язковий для LLM_PROVIDER=gemini
     OPENAI_API_KEY: Optional[str] = None
+    LLM_PROVIDER: str = "gemini"  # gemini | openai | mock
+    LLM_MODEL: Optional[str] = None  # Модель генерації (за замовчуванням — своя для кожного провайдера)
+    LLM_EMBEDDING_MODEL: Optional[str] = None
+    OPENAI_BASE_URL: Optional[str] = None  # Будь-який OpenAI-сумісний сервер (vLLM, Ollama, LM Studio)
+    MOCK_LLM_LATENCY: float = 0.2  # Секунд на запит до mock-провайдера
+    MOCK_LLM_FAILURE_RATE: float = 0.0  # Частка запитів, що завершуються помилкою
+    LLM_CASSETTE_MODE: Optional[str] = None  # record | replay — запис/відтворення відповідей за хешем запиту
+    LLM_CASSETTE_PATH: str = "data/llm_cassette.jsonl"
     
     # Redis Configuration
     REDIS_URL: Optional[str] = "redis://localhost:6379/0"
@@ -27,6 +35,110 @@ class Settings(BaseSettings):
     DIGEST_TIME: str = "20:00"
     WEBAPP_URL: Optional[str] = None
 
+    # Ingest (пакетний запис публікацій)
+    INGEST_BATCH_SIZE: int = 100
+    INGEST_FLUSH_INTERVAL: float = 0.5
+    INGEST_MAX_BUFFER: int = 5000  # Понад це add() чекає на запис у БД (backpressure під час збою)
+
+    # Monitor (оновлення списку каналів)
+    CHANNEL_REFRESH_INTERVAL: int = 60
+    CHANNEL_FULL_RESYNC_INTERVAL: int = 1800
+
+    # Monitor (водяні знаки та догін пропущених повідомлень)
+    GAP_FILL_DELAY: float = 5.0
+    GAP_FILL_MAX_MESSAGES: int = 500
+    CATCH_UP_MAX_HOURS: int = 24
+
+    # MTProto governor (глобальний адаптивний ліміт запитів, req/s)
+    MTPROTO_GLOBAL_RATE: float = 10.0
+    MTPROTO_MIN_RATE: float = 1.0
+
+    # Backfill (сканування історії каналів)
+    BACKFILL_WORKERS: int = 3
+    BACKFILL_MIN_MESSAGES: int = 20
+    BACKFILL_MAX_MESSAGES: int = 300
+    BACKFILL_POLL_INTERVAL: float = 10.0
+    BACKFILL_PROGRESS_INTERVAL: float = 30.0
+
+    # Оновлення переглядів/реакцій публікацій
+    ENGAGEMENT_REFRESH_INTERVAL: int = 900
+    ENGAGEMENT_WINDOW_HOURS: int = 24
+
+    # Шардинг моніторингу між кількома Telegram-акаунтами
+    TELETHON_SESSIONS: Optional[str] = None  # StringSession додаткових акаунтів через кому
+    MONITOR_LOCAL_SHARDS: Optional[str] = None  # Номери шардів цього процесу ("0,1"); за замовчуванням — усі
+    SHARD_FLOOD_REBALANCE_SECONDS: int = 300
+
+    # Холодний старт: паралельність join/leave за знімком діалогів
+    JOIN_CONCURRENCY: int = 3
+    LEAVE_BATCH_SIZE: int = 20
+
+    # Черга прийому оновлень Telethon
+    INTAKE_QUEUE_SIZE: int = 2000
+    INTAKE_CONSUMERS: int = 8
+    INTAKE_OVERLOAD_POLICY: str = "pause_backfill"  # pause_backfill, block, drop
+
+    # Черга кластеризації
+    CLUSTER_WORKERS: int = 4
+    CLUSTER_MAX_ATTEMPTS: int = 5
+    CLUSTER_RETRY_BASE_DELAY: float = 30.0
+    CLUSTER_POLL_INTERVAL: float = 5.0
+    CLUSTER_JOB_TIMEOUT: int = 600  # running довше — завдання вважається покинутим
+
+    # Довідник категорій у пам'яті
+    CATEGORY_REFRESH_INTERVAL: int = 60  # Секунд між звірками відбитку таблиці categories
+    CATEGORY_STATS_FLUSH_INTERVAL: float = 10.0  # Запис накопичених лічильників channel_categories
+
+    # Дедуплікація дослівних репостів
+    FINGERPRINT_WINDOW_HOURS: int = 24
+    FINGERPRINT_MIN_LENGTH: int = 40  # коротші тексти ("Тривога!") не дедуплікуються
+
+    # Майже-дублікати (MinHash/LSH) як перший етап кластеризації
+    NEAR_DUP_ENABLED: bool = True
+    NEAR_DUP_THRESHOLD: float = 0.5  # оцінка схожості Жаккара шинґлів
+    NEAR_DUP_NUM_PERM: int = 128
+    NEAR_DUP_SHINGLE_SIZE: int = 3
+    NEAR_DUP_MIN_SHINGLES: int = 5
+    NEAR_DUP_WINDOW_HOURS: int = 12
+
+    # Семантичне зв'язування сюжетів за ембедингами (гаряче вікно в пам'яті)
+    VECTOR_CLUSTERING_ENABLED: bool = False
+    VECTOR_INDEX_WINDOW_HOURS: int = 24
+
+    # Мікро-батчинг ембедингів
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_DELAY: float = 0.02  # Секунд очікування на заповнення пакета
+
+    # Пакетна генерація метаданих сюжетів (кілька нових сюжетів в одному запиті до LLM)
+    STORY_BATCH_SIZE: int = 8  # Не більше CLUSTER_WORKERS: кожен воркер подає одну публікацію
+    STORY_BATCH_MAX_DELAY: float = 0.15
+
+    # Локальний класифікатор категорій (без виклику LLM при високій впевненості)
+    LOCAL_CLASSIFIER_ENABLED: bool = True  # Діє, лише якщо файл моделі існує
+    LOCAL_CLASSIFIER_PATH: str = "data/category_model.npz"
+    LOCAL_CLASSIFIER_THRESHOLD: float = 0.85
+    LOCAL_CLASSIFIER_PRIOR_WEIGHT: float = 1.0  # Вага апріорного розподілу каналу (0 — лише текст)
+    LOCAL_CLASSIFIER_PRIOR_REFRESH: int = 600
+    LOCAL_BRIEF_MAX_CHARS: int = 280  # Коротші пости з впевненою категорією — без LLM (екстрактивно)
+
+    # Планувальник AI-запитів (смуги пріоритету та хвилинний бюджет провайдера)
+    AI_RPM_LIMIT: int = 1000  # Запитів на хвилину для всіх смуг разом (0 — без обмеження)
+    AI_TPM_LIMIT: int = 1000000  # Токенів на хвилину (оцінка ~4 символи на токен)
+    AI_BUDGET_SHARE: float = 1.0  # Частка AI_RPM_LIMIT/AI_TPM_LIMIT цього процесу (сума по процесах — не більше 1)
+    AI_INTERACTIVE_CONCURRENCY: int = 4
+    AI_DIGEST_CONCURRENCY: int = 4
+    AI_CLUSTERING_CONCURRENCY: int = 4
+    AI_BACKFILL_CONCURRENCY: int = 2
+    AI_BACKFILL_AGE: int = 3600  # Публікації, старші за стільки секунд, кластеризуються в смузі backfill
+
+    # Кеш ембедингів
+    EMBEDDING_CACHE_SIZE: int = 20000  # Записів у LRU в пам'яті (~1.5 КБ кожен)
+    EMBEDDING_CACHE_PERSIST: bool = True  # Постійний рівень у таблиці embedding_cache
+
+    # Метрики інжесту
+    METRICS_PORT: Optional[int] = None  # Локальний HTTP-ендпоінт /metrics (вимкнено, якщо не задано)
+    METRICS_DUMP_INTERVAL: int = 300
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
 config = Settings()
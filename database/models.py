@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 from typing import List, Optional
-from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text, Time, UniqueConstraint
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Integer, LargeBinary, SmallInteger, String, Text, Time, UniqueConstraint
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from pgvector.sqlalchemy import Vector
 
@@ -24,6 +24,10 @@ class Channel(Base):
     posts_count_24h: Mapped[int] = mapped_column(Integer, default=0)
     avatar_url: Mapped[Optional[str]] = mapped_column(String)
     last_scanned_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    # Найбільший оброблений telegram_message_id (водяний знак для догону після рестарту)
+    last_message_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    # Шард монітора, акаунт якого приєднався до каналу (закріплення переживає рестарт)
+    shard: Mapped[Optional[str]] = mapped_column(String)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     publications: Mapped[List["Publication"]] = relationship(back_populates="channel")
@@ -59,6 +63,8 @@ class Story(Base):
     title: Mapped[Optional[str]] = mapped_column(Text)
     summary: Mapped[Optional[str]] = mapped_column(Text)
     category: Mapped[Optional[str]] = mapped_column(Text)
+    # Хто визначив категорію: llm, local (services/local_classifier.py) або default (LLM недоступний)
+    category_source: Mapped[Optional[str]] = mapped_column(String(8))
     first_seen_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     last_updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     confidence_score: Mapped[float] = mapped_column(Float, default=0.0)
@@ -80,10 +86,14 @@ class Publication(Base):
     telegram_message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     content: Mapped[Optional[str]] = mapped_column(Text)
     category: Mapped[Optional[str]] = mapped_column(String)
+    # Успадковується від сюжету; NULL — публікації до появи колонки (категорія від LLM)
+    category_source: Mapped[Optional[str]] = mapped_column(String(8))
     url: Mapped[Optional[str]] = mapped_column(Text)
     published_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     views: Mapped[int] = mapped_column(Integer, default=0)
     reactions: Mapped[int] = mapped_column(Integer, default=0)
+    # Відбиток нормалізованого тексту (services/fingerprint.py) для пошуку дослівних репостів
+    content_hash: Mapped[Optional[str]] = mapped_column(String(16), index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     story: Mapped["Story"] = relationship(back_populates="publications")
@@ -122,6 +132,60 @@ class ChannelCategory(Base):
     last_post_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
+class BackfillJob(Base):
+    """Черга сканування історії каналів (переживає рестарти)."""
+    __tablename__ = "backfill_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    channel_id: Mapped[int] = mapped_column(ForeignKey("channels.id", ondelete="CASCADE"), unique=True, nullable=False)
+    priority: Mapped[int] = mapped_column(Integer, default=2) # 0 — додано користувачем, 1 — ядро, 2 — інші
+    hours: Mapped[int] = mapped_column(Integer, default=24)
+    status: Mapped[str] = mapped_column(String, default="pending", index=True) # pending, running, done, failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    shard: Mapped[Optional[str]] = mapped_column(String) # шард монітора, що виконує сканування
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+class ChannelEntity(Base):
+    """Кеш сутностей Telegram для акаунта-шарда: access_hash дозволяє звертатися до каналу без resolve/join після рестарту."""
+    __tablename__ = "channel_entities"
+    __table_args__ = (
+        UniqueConstraint("shard", "channel_id", name="uq_channel_entity_shard"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    shard: Mapped[str] = mapped_column(String, nullable=False) # access_hash прив'язаний до акаунта
+    channel_id: Mapped[int] = mapped_column(ForeignKey("channels.id", ondelete="CASCADE"), nullable=False)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False) # "голий" id без -100
+    access_hash: Mapped[Optional[int]] = mapped_column(BigInteger)
+    username: Mapped[Optional[str]] = mapped_column(String)
+    title: Mapped[Optional[str]] = mapped_column(String)
+    joined: Mapped[bool] = mapped_column(Boolean, default=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+class ClusterJob(Base):
+    """Черга кластеризації публікацій (переживає рестарти; виконані завдання видаляються)."""
+    __tablename__ = "cluster_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    publication_id: Mapped[int] = mapped_column(ForeignKey("publications.id", ondelete="CASCADE"), unique=True, nullable=False)
+    status: Mapped[str] = mapped_column(String, default="pending", index=True) # pending, running, dead
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)) # не раніше (backoff)
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+class EmbeddingCacheEntry(Base):
+    """Постійний рівень кешу ембедингів (services/embedding_cache.py): ключ — хеш моделі, розмірності й нормалізованого тексту."""
+    __tablename__ = "embedding_cache"
+
+    key: Mapped[str] = mapped_column(String(32), primary_key=True)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    dim: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    vector: Mapped[bytes] = mapped_column(LargeBinary, nullable=False) # float16, little-endian
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
+
 class Auction(Base):
     __tablename__ = "auctions"
 
@@ -1,5 +1,6 @@
 import asyncio
 from services.clustering import cluster_publication
+from services.category_stats import channel_category_counter
 from database.connection import AsyncSessionLocal
 from database.models import Publication
 from sqlalchemy import select, desc
@@ -28,6 +29,7 @@ async def test():
         print(f"Testing clustering for pub {pub.id}...")
         try:
             await cluster_publication(pub.id)
+            await channel_category_counter.flush()
             print("Clustering finished.")
         except Exception as e:
             print(f"Error: {e}")
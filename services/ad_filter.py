@@ -0,0 +1,79 @@
+"""
+Pulse Ad Filter — швидке виявлення реклами без звернень до БД.
+Набір маркерів компілюється один раз на кожен набір контекстних винятків,
+категорії каналів беруться з кешу монітора.
+
+Примітка: в CPython альтернація з ~40 літералів у re працює повільніше
+за послідовні `in`-перевірки (substring search реалізовано на C), тому
+"компіляція" — це мінімізований кортеж маркерів, а не регулярний вираз.
+"""
+
+# Маркери реклами (порядок не важливий, дублікати прибираються при компіляції)
+AD_MARKERS = [
+    "#реклама", "#promo", "реклама", "за посиланням",
+    "купити", "знижка", "підписуйтесь", "реєструйтеся",
+    "зареєструватися", "гроші", "казино", "ставки",
+    "промокод", "заробіток", "виплати", "крипта",
+    "біткоїн", "bitcoin", "курс валют тут", "дивіться за посиланням",
+    "переходьте", "підпишись", "еко-система", "інвестування",
+    "безкоштовно", "дарма", "акція", "розіграш", "айфон",
+    "інтим", "бутик", "шоп", "18+", "🔞", "замовити",
+    "магазин", "знижк", "промокод", "ловіть", "тільки сьогодні",
+    "t.me/+", "t.me/joinchat", "#промо"
+]
+
+# Контекстні винятки: (підрядки категорії каналу, маркери, які для неї не вважаються рекламою)
+CONTEXT_EXCEPTIONS = [
+    (("крипт", "фінанс"), ["крипта", "біткоїн", "bitcoin", "інвестування", "виплати"]),
+    (("подорож", "туризм"), ["за посиланням", "дивіться за посиланням", "переходьте"]),
+]
+
+
+class AdFilter:
+    """Попередньо скомпільований матчер рекламних маркерів з урахуванням категорії каналу."""
+
+    def __init__(self, markers: list[str] = None):
+        self.markers = list(dict.fromkeys(markers or AD_MARKERS))
+        # frozenset винятків -> кортеж маркерів (наборів винятків лише кілька)
+        self._compiled: dict[frozenset[str], tuple[str, ...]] = {}
+        # категорія (lower) -> frozenset винятків
+        self._category_exceptions: dict[str, frozenset[str]] = {}
+        self._markers_for(frozenset())
+
+    def _markers_for(self, exceptions: frozenset[str]) -> tuple[str, ...]:
+        compiled = self._compiled.get(exceptions)
+        if compiled is None:
+            # Маркер пропускається, якщо будь-який виняток є його підрядком
+            allowed = [m for m in self.markers if not any(exc in m for exc in exceptions)]
+            # Маркер, що містить інший дозволений маркер, ніколи не змінить результат
+            compiled = tuple(m for m in allowed if not any(o != m and o in m for o in allowed))
+            self._compiled[exceptions] = compiled
+        return compiled
+
+    def exceptions_for(self, category: str | None) -> frozenset[str]:
+        """Повертає набір маркерів-винятків для категорії каналу."""
+        if not category:
+            return frozenset()
+        cat = category.lower()
+        cached = self._category_exceptions.get(cat)
+        if cached is None:
+            exceptions = []
+            for needles, markers in CONTEXT_EXCEPTIONS:
+                if any(n in cat for n in needles):
+                    exceptions.extend(markers)
+            cached = frozenset(exceptions)
+            self._category_exceptions[cat] = cached
+        return cached
+
+    def is_ad(self, text: str, category: str | None = None) -> bool:
+        """Перевіряє, чи є текст рекламою для каналу заданої категорії."""
+        if not text:
+            return False
+        text_lower = text.lower()
+        for marker in self._markers_for(self.exceptions_for(category)):
+            if marker in text_lower:
+                return True
+        return False
+
+
+ad_filter = AdFilter()
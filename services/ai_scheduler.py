@@ -0,0 +1,244 @@
+"""
+Pulse AI Scheduler — єдина точка для всіх запитів до LLM (services/ai_service.py).
+Смуги пріоритету: interactive (дії користувача в боті) > digest (ранкова/вечірня
+розсилка) > clustering (нові сюжети) > backfill (історія каналів). Кожна смуга має
+власний ліміт одночасних запитів; спільний бюджет запитів і токенів на хвилину
+(AI_RPM_LIMIT / AI_TPM_LIMIT) нижчі смуги не можуть вичерпати до дна — частина
+лишається за вищими. Якщо смуга не отримала слот за MAX_WAIT_BY_LANE, запит
+відхиляється (AIBudgetExceeded) і викликач деградує до екстрактивного результату.
+
+Бюджет і пріоритети діють у межах процесу. Якщо LLM використовують кілька процесів
+(бот і воркери services/monitor_pool.py), ліміт провайдера ділиться між ними через
+AI_BUDGET_SHARE: напр. бот (interactive, digest) — 0.4, кожен із трьох воркерів — 0.2.
+Так воркери не можуть вибрати бюджет, зарезервований за смугами бота.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from enum import IntEnum
+from config.settings import config
+from services.metrics import metrics
+
+
+class Lane(IntEnum):
+    """Чим менше значення — тим вищий пріоритет."""
+    INTERACTIVE = 0   # класифікація каналу, пересланого користувачем
+    DIGEST = 1        # generate_daily_digest під час розсилки
+    CLUSTERING = 2    # метадані нових сюжетів і ембединги live-публікацій
+    BACKFILL = 3      # те саме для публікацій зі сканування історії
+
+
+# Частка хвилинного бюджету, яку смуга не може зачепити (лишається вищим смугам)
+RESERVE_BY_LANE = {
+    Lane.INTERACTIVE: 0.0,
+    Lane.DIGEST: 0.1,
+    Lane.CLUSTERING: 0.2,
+    Lane.BACKFILL: 0.5,
+}
+
+# Максимальне очікування слота (сек), після якого запит відхиляється
+MAX_WAIT_BY_LANE = {
+    Lane.INTERACTIVE: 20,
+    Lane.DIGEST: 300,
+    Lane.CLUSTERING: 60,
+    Lane.BACKFILL: 120,
+}
+
+# Оцінка відповіді, якщо викликач не обмежив max_output_tokens
+DEFAULT_OUTPUT_TOKENS = 512
+
+
+def estimate_tokens(text: str) -> int:
+    """Груба оцінка кількості токенів (~4 символи на токен) — для бюджету, не для білінгу."""
+    return len(text or "") // 4 + 1
+
+
+def process_share(limit: int) -> int:
+    """Частка спільного ліміту для цього процесу (AI_BUDGET_SHARE); 0 — без обмеження."""
+    if limit <= 0:
+        return 0
+    return max(1, round(limit * config.AI_BUDGET_SHARE))
+
+
+class AIBudgetExceeded(RuntimeError):
+    pass
+
+
+class QuotaBucket:
+    """Хвилинний бюджет як token bucket: місткість — ліміт за хвилину, поповнення рівномірне."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _amount(self, amount: float, reserve: float) -> float:
+        # Запит, більший за доступну смузі частину, інакше чекав би вічно
+        return min(amount, self.capacity * (1 - reserve))
+
+    def wait_time(self, now: float, amount: float, reserve: float) -> float:
+        """Скільки секунд чекати, доки списання amount не опустить залишок нижче резерву смуги."""
+        self._refill(now)
+        missing = self._amount(amount, reserve) + self.capacity * reserve - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def consume(self, amount: float, reserve: float = 0.0):
+        self.tokens -= self._amount(amount, reserve)
+
+    def adjust(self, amount: float):
+        """Коригування після відповіді (фактичний розмір відрізнився від оцінки); може піти в мінус."""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+@dataclass
+class LaneStats:
+    requests: int = 0
+    errors: int = 0
+    rejected: int = 0
+    degraded: int = 0
+    queue_time: float = 0.0
+    latency: float = 0.0
+
+
+class AIScheduler:
+    def __init__(self, rpm: int = None, tpm: int = None, concurrency: dict[Lane, int] = None):
+        # Явні rpm/tpm (бенчмарки) — бюджет саме цього планувальника; з налаштувань — частка процесу
+        rpm = process_share(config.AI_RPM_LIMIT) if rpm is None else rpm
+        tpm = process_share(config.AI_TPM_LIMIT) if tpm is None else tpm
+        # 0 — без обмеження
+        self._requests = QuotaBucket(rpm) if rpm > 0 else None
+        self._tokens = QuotaBucket(tpm) if tpm > 0 else None
+        self.concurrency = concurrency or {
+            Lane.INTERACTIVE: config.AI_INTERACTIVE_CONCURRENCY,
+            Lane.DIGEST: config.AI_DIGEST_CONCURRENCY,
+            Lane.CLUSTERING: config.AI_CLUSTERING_CONCURRENCY,
+            Lane.BACKFILL: config.AI_BACKFILL_CONCURRENCY,
+        }
+        self._slots = {lane: asyncio.Semaphore(max(1, n)) for lane, n in self.concurrency.items()}
+        self._waiting: dict[Lane, int] = {lane: 0 for lane in Lane}
+        self._active: dict[Lane, int] = {lane: 0 for lane in Lane}
+        # Кількість очікувачів, що вже мають слот смуги і чекають лише на бюджет
+        self._ready: dict[Lane, int] = {lane: 0 for lane in Lane}
+        self.stats: dict[Lane, LaneStats] = {lane: LaneStats() for lane in Lane}
+        for lane in Lane:
+            key = lane.name.lower()
+            metrics.register_gauge(f"ai_{key}_waiting", lambda lane=lane: self._waiting[lane])
+            metrics.register_gauge(f"ai_{key}_active", lambda lane=lane: self._active[lane])
+        if self._requests:
+            metrics.register_gauge("ai_rpm_available", lambda: round(self._requests.tokens, 1))
+        if self._tokens:
+            metrics.register_gauge("ai_tpm_available", lambda: round(self._tokens.tokens))
+
+    def _higher_lane_ready(self, lane: Lane) -> bool:
+        return any(self._ready[other] for other in Lane if other < lane)
+
+    def _budget_wait(self, lane: Lane, tokens: int, now: float) -> float:
+        reserve = RESERVE_BY_LANE[lane]
+        wait = 0.0
+        if self._requests:
+            wait = self._requests.wait_time(now, 1, reserve)
+        if self._tokens:
+            wait = max(wait, self._tokens.wait_time(now, tokens, reserve))
+        return wait
+
+    def _reject(self, lane: Lane, started: float, reason: str):
+        self.stats[lane].rejected += 1
+        metrics.inc(f"ai_{lane.name.lower()}_rejected")
+        raise AIBudgetExceeded(f"{lane.name.lower()} lane: {reason} after {time.monotonic() - started:.1f}s")
+
+    async def _acquire(self, lane: Lane, tokens: int) -> float:
+        """Чекає на слот смуги та бюджет; повертає час у черзі або кидає AIBudgetExceeded."""
+        started = time.monotonic()
+        deadline = started + MAX_WAIT_BY_LANE[lane]
+        self._waiting[lane] += 1
+        try:
+            try:
+                await asyncio.wait_for(self._slots[lane].acquire(), timeout=MAX_WAIT_BY_LANE[lane])
+            except asyncio.TimeoutError:
+                self._reject(lane, started, "no free slot")
+            self._ready[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = 0.02 if self._higher_lane_ready(lane) else self._budget_wait(lane, tokens, now)
+                    if wait <= 0:
+                        break
+                    if now + wait > deadline:
+                        self._reject(lane, started, "over budget")
+                    await asyncio.sleep(min(wait, 1.0))
+            except BaseException:
+                self._slots[lane].release()
+                raise
+            finally:
+                self._ready[lane] -= 1
+        finally:
+            self._waiting[lane] -= 1
+
+        reserve = RESERVE_BY_LANE[lane]
+        if self._requests:
+            self._requests.consume(1, reserve)
+        if self._tokens:
+            self._tokens.consume(tokens, reserve)
+        return time.monotonic() - started
+
+    async def call(self, lane: Lane, func, *args, tokens: int = 0, **kwargs):
+        """
+        Виконує запит до LLM у смузі lane; tokens — оцінка вхідних і вихідних токенів.
+        AIBudgetExceeded, якщо слот не звільнився вчасно; помилки провайдера прокидаються.
+        """
+        key = lane.name.lower()
+        queue_time = await self._acquire(lane, tokens)
+        stats = self.stats[lane]
+        stats.requests += 1
+        stats.queue_time += queue_time
+        metrics.inc(f"ai_{key}_requests")
+        metrics.observe(f"ai_{key}_queue", queue_time)
+        self._active[lane] += 1
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            stats.errors += 1
+            metrics.inc(f"ai_{key}_errors")
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            stats.latency += latency
+            metrics.observe(f"ai_{key}_latency", latency)
+            self._active[lane] -= 1
+            self._slots[lane].release()
+
+    def adjust_tokens(self, delta: int):
+        """Дозаписує різницю між фактичним і оціненим розміром відповіді."""
+        if self._tokens and delta:
+            self._tokens.adjust(delta)
+
+    def note_degraded(self, lane: Lane, items: int = 1):
+        """Фіксує результат, отриманий без LLM (екстрактивно) через бюджет або помилку."""
+        self.stats[lane].degraded += items
+        metrics.inc(f"ai_{lane.name.lower()}_degraded", items)
+
+    def snapshot(self) -> dict:
+        """Поточні метрики по смугах (для логів/бенчмарків)."""
+        lanes = {}
+        for lane, s in self.stats.items():
+            lanes[lane.name.lower()] = {
+                **vars(s),
+                "avg_queue_time": round(s.queue_time / s.requests, 4) if s.requests else 0.0,
+                "avg_latency": round(s.latency / s.requests, 4) if s.requests else 0.0,
+                "waiting": self._waiting[lane],
+                "active": self._active[lane],
+            }
+        return {
+            "rpm_available": round(self._requests.tokens, 1) if self._requests else None,
+            "tpm_available": round(self._tokens.tokens) if self._tokens else None,
+            "lanes": lanes,
+        }
+
+
+ai_scheduler = AIScheduler()
@@ -1,24 +1,48 @@
 """
-Pulse AI Service — класифікація каналів та генерація дайджестів через Google Gemini.
-Використовує новий SDK google-genai (замість deprecated google-generativeai).
+Pulse AI Service — класифікація каналів, метадані сюжетів, ембединги та дайджести.
+Запити йдуть через змінний провайдер (services/llm_provider.py, LLM_PROVIDER):
+Gemini, OpenAI-сумісний сервер або локальний mock, з опційним записом/відтворенням.
+Кожен запит проходить через планувальник (services/ai_scheduler.py) у своїй смузі
+пріоритету; якщо бюджет вичерпано або LLM недоступний — результат екстрактивний.
 """
 
-from google import genai
-from google.genai import types
-from config.settings import config
+import asyncio
+import re
+from functools import partial
 from bot.categories import CATEGORY_NAMES_FOR_AI, CATEGORY_MAP
+from services.embedding_batcher import EmbeddingBatcher
+from services.embedding_cache import EmbeddingCache
+from services.category_registry import category_registry, clean_name
+from services.local_classifier import local_classifier
+from services.llm_provider import CassetteMiss, LLMProvider, create_provider
+from services.ai_scheduler import ai_scheduler, AIBudgetExceeded, DEFAULT_OUTPUT_TOKENS, Lane, estimate_tokens
 from loguru import logger
 
 
-# Ініціалізація клієнта Gemini з підтримкою v1beta (для text-embedding-004)
-client = genai.Client(api_key=config.GEMINI_API_KEY)
+# Провайдер LLM створюється з налаштувань при першому використанні (get_llm): імпорт модуля
+# не вимагає ключів, а бенчмарки й тести можуть підставити свій провайдер до першого запиту
+llm: LLMProvider | None = None
 
-from database.connection import AsyncSessionLocal
-from database.models import Category
-from sqlalchemy import select
 
-# Модель для генерації тексту
-MODEL_ID = "gemini-2.0-flash"
+def get_llm() -> LLMProvider:
+    global llm
+    if llm is None:
+        llm = create_provider()
+    return llm
+
+
+def _llm_name() -> str:
+    # Для логів у обробниках помилок: не створює провайдера (створення могло й упасти)
+    return llm.name if llm else "LLM"
+
+
+async def _generate(prompt: str, lane: Lane, **kwargs) -> str:
+    """llm.generate через планувальник: бюджет списується за оцінкою і коригується за відповіддю."""
+    output_estimate = kwargs.get("max_output_tokens") or DEFAULT_OUTPUT_TOKENS
+    response = await ai_scheduler.call(lane, get_llm().generate, prompt,
+                                       tokens=estimate_tokens(prompt) + output_estimate, **kwargs)
+    ai_scheduler.adjust_tokens(estimate_tokens(response) - output_estimate)
+    return response
 
 # Промпт для класифікації каналу
 CLASSIFY_PROMPT = """Ти — AI-класифікатор українських Telegram-каналів.
@@ -40,20 +64,20 @@ CLASSIFY_PROMPT = """Ти — AI-класифікатор українських
 
 
 async def get_existing_categories() -> list[str]:
-    """Отримує список назв категорій з БД."""
-    try:
-        async with AsyncSessionLocal() as session:
-            stmt = select(Category.name).where(Category.is_visible == True)
-            res = await session.execute(stmt)
-            return list(res.scalars().all())
-    except Exception as e:
-        logger.error(f"Error fetching categories: {e}")
-        return CATEGORY_NAMES_FOR_AI
+    """Список назв видимих категорій (з довідника в пам'яті)."""
+    return await category_registry.names() or CATEGORY_NAMES_FOR_AI
 
-async def classify_channel(title: str, username: str | None, sample_text: str | None) -> str:
+async def classify_channel(title: str, username: str | None, sample_text: str | None,
+                           lane: Lane = Lane.INTERACTIVE) -> str:
     """
-    Визначає категорію каналу через Gemini Flash.
+    Визначає категорію каналу (локально або через LLM).
     """
+    # Впевнений локальний прогноз (лише серед категорій каналів) — без виклику LLM
+    local = await local_classifier.classify(f"{title or ''}\n{sample_text or ''}")
+    if local and clean_name(local) in CATEGORY_MAP:
+        logger.info(f"Local classifier: '{title}' → {CATEGORY_MAP[clean_name(local)]}")
+        return CATEGORY_MAP[clean_name(local)]
+
     try:
         existing_cats = await get_existing_categories()
         prompt = CLASSIFY_PROMPT.format(
@@ -65,19 +89,15 @@ async def classify_channel(title: str, username: str | None, sample_text: str |
         
         logger.debug(f"Classifying channel: {title}")
         
-        response = await client.aio.models.generate_content(
-            model=MODEL_ID,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.1,
-                max_output_tokens=50,
-            )
-        )
+        response = await _generate(prompt, lane, temperature=0.1, max_output_tokens=50)
         
-        result = response.text.strip()
-        logger.info(f"Gemini classified '{title}' as: {result}")
+        result = response.strip()
+        logger.info(f"{_llm_name()} classified '{title}' as: {result}")
         
         # Шукаємо найкращий збіг у дозволених категоріях
+        entry = await category_registry.get(result)
+        if entry:
+            return entry.label
         if result in CATEGORY_MAP:
             return CATEGORY_MAP[result]
         
@@ -87,47 +107,111 @@ async def classify_channel(title: str, username: str | None, sample_text: str |
                 logger.debug(f"Partial match: '{result}' → '{full_cat}'")
                 return full_cat
         
-        logger.warning(f"Unknown category from Gemini: '{result}', falling back to '📰 Події'")
+        logger.warning(f"Unknown category from {_llm_name()}: '{result}', falling back to '📰 Події'")
         return "📰 Події"
         
     except Exception as e:
-        logger.error(f"Gemini classification error: {e}")
+        logger.error(f"{_llm_name()} classification error: {e}")
+        ai_scheduler.note_degraded(lane)
         return "📰 Події"
 
 
-async def get_text_embedding(text: str) -> list[float] | None:
+# Єдине джерело розмірності ембедингів (провайдер, кеш, індекс сюжетів у пам'яті)
+EMBEDDING_DIM = 768
+
+
+async def _embed_many(texts: list[str], lane: Lane = Lane.CLUSTERING) -> list:
     """
-    Генерує векторне представлення тексту (embedding) через Gemini.
-    Model: gemini-embedding-001
-    Output dimension: 768
+    Один пакетний запит ембедингів до провайдера (порядок збережено).
+    Якщо при відтворенні запису бракує частини текстів — записані повертаються,
+    а на місці відсутніх стоїть CassetteMiss (його отримає лише відповідний виклик).
     """
+    tokens = sum(estimate_tokens(t) for t in texts)
     try:
-        if not text:
-            return None
-            
-        truncated_text = text[:8000]
-        
-        result = await client.aio.models.embed_content(
-            model="gemini-embedding-001",
-            contents=truncated_text,
-            config=types.EmbedContentConfig(
-                task_type="CLUSTERING",
-                output_dimensionality=768,
-            ),
-        )
-        
-        if result.embeddings and len(result.embeddings) > 0:
-            return list(result.embeddings[0].values)
-        return None
-        
-    except Exception as e:
-        logger.error(f"Gemini embedding error: {e}")
+        return await ai_scheduler.call(lane, get_llm().embed, texts, EMBEDDING_DIM, tokens=tokens)
+    except CassetteMiss:
+        if len(texts) == 1:
+            raise
+    results = await asyncio.gather(*(_embed_many([t], lane) for t in texts), return_exceptions=True)
+    return [r if isinstance(r, BaseException) else r[0] for r in results]
+
+
+# CassetteMiss не підміняється на None: відтворення без запису має падати, а не деградувати
+embedding_batcher = EmbeddingBatcher(_embed_many, propagate=(CassetteMiss,))
+# Публікації зі сканування історії — окремі пакети в нижчій смузі планувальника AI
+backfill_embedding_batcher = EmbeddingBatcher(partial(_embed_many, lane=Lane.BACKFILL), name="embedding_backfill",
+                                              propagate=(CassetteMiss,))
+# Ключ кешу залежить від моделі ембедингів провайдера — кеш створюється разом з ним
+embedding_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global embedding_cache
+    if embedding_cache is None:
+        embedding_cache = EmbeddingCache(get_llm().embedding_model, EMBEDDING_DIM)
+    return embedding_cache
+
+
+async def get_text_embedding(text: str, lane: Lane = Lane.CLUSTERING) -> list[float] | None:
+    """
+    Генерує векторне представлення тексту (embedding) через провайдера LLM.
+    Output dimension: 768
+    Результати кешуються за вмістом тексту (services/embedding_cache.py),
+    промахи об'єднуються в пакетні запити (services/embedding_batcher.py) своєї смуги.
+    """
+    if not text:
         return None
+    batcher = backfill_embedding_batcher if lane == Lane.BACKFILL else embedding_batcher
+    return await get_embedding_cache().get_or_compute(text[:8000], batcher.embed)
+
 
+STORY_CATEGORIES = "Політика, Війна, Суспільство, Економіка, Світ, Технології, Спорт, Кримінал, Культура"
+
+
+def _fallback_story_info() -> dict:
+    return {
+        "title": "Нова історія",
+        "summary": "Автоматично створена історія",
+        "category": "Події"
+    }
 
-async def generate_story_info(text: str) -> dict:
+
+def _valid_story_info(item) -> bool:
+    return isinstance(item, dict) and isinstance(item.get("title"), str) and bool(item["title"].strip())
+
+
+_URL_RE = re.compile(r"(?:https?://|www\.|t\.me/)\S+", re.IGNORECASE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+def extractive_story_info(text: str, category: str = "Події") -> dict:
+    """
+    Метадані без LLM: заголовок — перше речення (до 10 слів), саммарі — перші два речення.
+    Для коротких постів з уже відомою категорією та як запасний варіант при недоступності LLM
+    (позначка extractive — категорію не визначала модель).
+    """
+    lines = [" ".join(_URL_RE.sub(" ", line).split()) for line in (text or "").splitlines()]
+    lines = [line for line in lines if line]
+    if not lines:
+        return {**_fallback_story_info(), "category": category, "extractive": True}
+    sentences = _SENTENCE_RE.split(" ".join(lines))
+    # Перше речення; надто коротке ("Терміново!") доповнюється наступним
+    words = []
+    for sentence in sentences:
+        words += sentence.split()
+        if len(words) >= 4:
+            break
+    title = " ".join(words[:10]) + ("…" if len(words) > 10 else "")
+    summary = " ".join(sentences[:2])
+    if len(summary) > 300:
+        summary = summary[:300].rsplit(" ", 1)[0] + "…"
+    return {"title": title, "summary": summary, "category": category, "extractive": True}
+
+
+async def generate_story_info(text: str, lane: Lane = Lane.CLUSTERING) -> dict:
     """
     Генерує заголовок, короткий опис та категорію для нової історії.
+    Без відповіді LLM (бюджет, помилка) — екстрактивні метадані.
     """
     prompt = f"""Проаналізуй текст новини та створи для неї метадані.
 Це індивідуальна новина з Telegram-каналу.
@@ -138,7 +222,7 @@ async def generate_story_info(text: str) -> dict:
 Необхідні дані:
 1. Заголовок (до 10 слів, інформативний, без клікбейту, суть події)
 2. Саммарі (до 2 речень, стисло)
-3. Категорія (обери ОДНУ з: Політика, Війна, Суспільство, Економіка, Світ, Технології, Спорт, Кримінал, Культура)
+3. Категорія (обери ОДНУ з: {STORY_CATEGORIES})
 
 Відповідай у форматі JSON:
 {{
@@ -148,27 +232,102 @@ async def generate_story_info(text: str) -> dict:
 }}
 """
     try:
-        response = await client.aio.models.generate_content(
-            model=MODEL_ID,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"
-            )
-        )
+        response = await _generate(prompt, lane, json_mode=True)
+        import json
+        meta = json.loads(response)
+        if isinstance(meta, list) and meta:
+            meta = meta[0]
+        if not _valid_story_info(meta):
+            raise ValueError(f"unexpected response: {response[:200]}")
+        return meta
+    except AIBudgetExceeded as e:
+        logger.warning(f"Story info degraded to extractive: {e}")
+    except CassetteMiss:
+        # Відтворення без запису не має тихо деградувати до екстрактивних метаданих
+        raise
+    except Exception as e:
+        logger.error(f"{_llm_name()} story generation error: {e}")
+    ai_scheduler.note_degraded(lane)
+    return extractive_story_info(text)
+
+
+async def generate_story_info_batch(texts: list[str], lane: Lane = Lane.CLUSTERING) -> list[dict | CassetteMiss]:
+    """
+    Метадані для кількох нових історій одним запитом: модель повертає JSON-масив
+    {id, title, summary, category} у порядку текстів. Елементи, яких бракує або які
+    не вдалося розібрати, догенеровуються поодинці через generate_story_info;
+    якщо смузі не вистачило бюджету — одразу екстрактивно, без повторних запитів.
+    Елемент, для якого немає запису при відтворенні, повертається як CassetteMiss —
+    решта пакета від цього не страждає.
+    """
+    if len(texts) <= 1:
+        return [await generate_story_info(t, lane) for t in texts]
+
+    items = "\n\n".join(f"### Новина {i}\n{t[:2000]}" for i, t in enumerate(texts, 1))
+    prompt = f"""Проаналізуй {len(texts)} незалежних новин з Telegram-каналів і створи метадані для КОЖНОЇ.
+
+{items}
+
+Для кожної новини:
+1. Заголовок (до 10 слів, інформативний, без клікбейту, суть події)
+2. Саммарі (до 2 речень, стисло)
+3. Категорія (обери ОДНУ з: {STORY_CATEGORIES})
+
+Відповідай JSON-масивом рівно з {len(texts)} об'єктів у тому ж порядку, де id — номер новини:
+[
+  {{"id": 1, "title": "...", "summary": "...", "category": "..."}}
+]
+"""
+    results: list[dict | None] = [None] * len(texts)
+    try:
+        response = await _generate(prompt, lane, json_mode=True)
         import json
-        return json.loads(response.text)
+        parsed = json.loads(response)
+        if isinstance(parsed, dict):
+            # Модель іноді загортає масив в об'єкт: {"items": [...]}
+            parsed = next((v for v in parsed.values() if isinstance(v, list)), [])
+        if not isinstance(parsed, list):
+            parsed = []
+        for position, item in enumerate(parsed):
+            if not _valid_story_info(item):
+                continue
+            # Номер з відповіді, а якщо його немає — позиція (лише коли кількість збігається)
+            index = item.get("id")
+            index = index - 1 if isinstance(index, int) else (position if len(parsed) == len(texts) else None)
+            if index is not None and 0 <= index < len(texts) and results[index] is None:
+                results[index] = {k: item[k] for k in ("title", "summary", "category") if k in item}
+    except AIBudgetExceeded as e:
+        logger.warning(f"Story batch degraded to extractive ({len(texts)} items): {e}")
+        ai_scheduler.note_degraded(lane, len(texts))
+        return [extractive_story_info(t) for t in texts]
     except Exception as e:
-        logger.error(f"Gemini story generation error: {e}")
-        return {
-            "title": "Нова історія",
-            "summary": "Автоматично створена історія",
-            "category": "Події"
-        }
+        logger.error(f"{_llm_name()} story batch error ({len(texts)} items): {e}")
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        logger.warning(f"Story batch: {len(missing)}/{len(texts)} items regenerated individually")
+        fallback = await asyncio.gather(*(generate_story_info(texts[i], lane) for i in missing),
+                                        return_exceptions=True)
+        for i, meta in zip(missing, fallback):
+            results[i] = meta
+    return results
 
 
-async def generate_digest(news_items: list[dict]) -> str:
+def extractive_digest(news_items: list[dict]) -> str:
+    """Персональний дайджест без LLM: перше речення кожної новини з посиланням на канал."""
+    lines = ["📰 **Ваш персональний дайджест**", ""]
+    for item in news_items:
+        title = extractive_story_info(item.get("text", ""))["title"]
+        source = f"[{item['channel']}]({item['url']})" if item.get("url") else f"_{item['channel']}_"
+        lines.append(f"• {title} — {source}")
+    lines += ["", "Детальніше читайте в каналах."]
+    return "\n".join(lines)
+
+
+async def generate_digest(news_items: list[dict], lane: Lane = Lane.DIGEST) -> str:
     """
     Генерує дайджест на основі списку новин.
+    Без відповіді LLM (бюджет, помилка) — екстрактивний дайджест з тих самих новин.
     """
     if not news_items:
         return "Немає новин для дайджесту."
@@ -197,23 +356,39 @@ async def generate_digest(news_items: list[dict]) -> str:
 """
 
     try:
-        response = await client.aio.models.generate_content(
-            model=MODEL_ID,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.3,
-            )
-        )
-        logger.info(f"Gemini usage: {response.usage_metadata}")
-        return response.text
+        return await _generate(prompt, lane, temperature=0.3)
+    except AIBudgetExceeded as e:
+        logger.warning(f"Digest degraded to extractive: {e}")
     except Exception as e:
-        logger.error(f"AI Generation Error: {e}")
-        return "Вибачте, не вдалося згенерувати дайджест через помилку AI."
-
-
-async def generate_daily_digest(context: dict) -> str:
+        logger.error(f"{_llm_name()} digest error: {e}")
+    ai_scheduler.note_degraded(lane)
+    return extractive_digest(news_items)
+
+
+def extractive_daily_digest(context: dict) -> str:
+    """Дайджест без LLM: готові заголовки й саммарі сюжетів та перші речення інших новин."""
+    lines = ["🔥 **ГОЛОВНІ СЮЖЕТИ**", ""]
+    for story in context.get("top_stories", []):
+        names = [s["name"] if isinstance(s, dict) else s for s in story.get("sources", [])
+                 if isinstance(s, str) or (isinstance(s, dict) and "name" in s)]
+        sources = f" (_{', '.join(names[:3])}_)" if names else ""
+        lines.append(f"**{story.get('title', '')}** — {story.get('summary', '')}{sources}")
+        lines.append("")
+    briefs = context.get("other_news", [])[:5]
+    if briefs:
+        lines += ["📰 **КОРОТКО ПРО ІНШЕ**", ""]
+        for item in briefs:
+            text = extractive_story_info(item.get("text") or item.get("summary", ""))["title"]
+            lines.append(f"• {text} — _{item.get('channel', '')}_")
+    if not context.get("top_stories"):
+        lines = lines[2:]
+    return "\n".join(lines).strip()
+
+
+async def generate_daily_digest(context: dict, lane: Lane = Lane.DIGEST) -> str:
     """
     Генерує розширений дайджест дня.
+    Без відповіді LLM (бюджет, помилка) — екстрактивний дайджест з тих самих даних.
     context: {
         "top_stories": [{"title": str, "summary": str, "sources": [Source]}],
         "other_news": [{"channel": str, "text": str, "url": str}]
@@ -266,14 +441,10 @@ async def generate_daily_digest(context: dict) -> str:
 """
 
     try:
-        response = await client.aio.models.generate_content(
-            model=MODEL_ID,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.3,
-            )
-        )
-        return response.text
+        return await _generate(prompt, lane, temperature=0.3)
+    except AIBudgetExceeded as e:
+        logger.warning(f"Daily digest degraded to extractive: {e}")
     except Exception as e:
-        logger.error(f"Gemini daily digest error: {e}")
-        return "Не вдалося згенерувати дайджест."
+        logger.error(f"{_llm_name()} daily digest error: {e}")
+    ai_scheduler.note_degraded(lane)
+    return extractive_daily_digest(context)
@@ -0,0 +1,217 @@
+"""
+Pulse Backfill Scheduler — обмежена пріоритетна черга сканування історії каналів.
+Завдання зберігаються в таблиці backfill_jobs (переживають рестарт), виконуються
+фіксованою кількістю воркерів; глибина сканування залежить від posts_count_24h.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from loguru import logger
+from sqlalchemy import case, func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from config.settings import config
+from database.connection import AsyncSessionLocal
+from database.models import BackfillJob, Channel
+
+# Пріоритети (менше — раніше)
+PRIORITY_USER_ADDED = 0
+PRIORITY_CORE = 1
+PRIORITY_DEFAULT = 2
+
+MAX_ATTEMPTS = 3
+
+CLAIM_SQL = text("""
+    UPDATE backfill_jobs
+    SET status = 'running', attempts = attempts + 1, updated_at = now(),
+        shard = :shard  -- завдання без шарда закріплюється за тим, хто взяв, щоб start() міг його повернути
+    WHERE id = (
+        SELECT id FROM backfill_jobs
+        WHERE status = 'pending' AND (shard = :shard OR shard IS NULL)
+        ORDER BY priority, created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, channel_id, hours, attempts
+""")
+
+
+def scan_depth(posts_count_24h: int | None, hours: int) -> int:
+    """Скільки повідомлень читати: очікувана кількість за вікно з запасом, у межах [MIN, MAX]."""
+    if not posts_count_24h:
+        return config.BACKFILL_MAX_MESSAGES
+    expected = posts_count_24h * hours / 24
+    return max(config.BACKFILL_MIN_MESSAGES, min(config.BACKFILL_MAX_MESSAGES, int(expected * 1.5) + 1))
+
+
+class BackfillScheduler:
+    """Виконує завдання backfill_jobs через ChannelMonitor._scan_channel."""
+
+    def __init__(self, monitor, workers: int = None):
+        self.monitor = monitor
+        self.workers = workers or config.BACKFILL_WORKERS
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        # Статистика поточної сесії для звітів про прогрес
+        self.done = 0
+        self.failed = 0
+        self.in_flight = 0
+        self._started_at: float | None = None
+
+    async def start(self):
+        if self._tasks:
+            return
+        # Завдання, що "висіли" в running після падіння/деплою, повертаються в чергу
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(BackfillJob)
+                .where(BackfillJob.status == "running", BackfillJob.shard == self.monitor.name)
+                .values(status="pending")
+            )
+            await session.commit()
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._progress_loop()))
+        logger.info(f"📚 [{self.monitor.name}] Backfill scheduler started ({self.workers} workers)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def pause(self):
+        """Призупиняє взяття нових завдань (поточні доскановуються)."""
+        if self._resumed.is_set():
+            logger.info("📚 Backfill призупинено")
+        self._resumed.clear()
+
+    def resume(self):
+        if not self._resumed.is_set():
+            logger.info("📚 Backfill відновлено")
+        self._resumed.set()
+
+    async def enqueue(self, jobs: list[tuple[int, int, int]], retry_failed: bool = False):
+        """
+        Додає завдання (channel_id, priority, hours) одним INSERT.
+        Для вже відомого каналу підвищує пріоритет і повертає завдання в pending (якщо воно не виконується).
+        Завдання, що вичерпали MAX_ATTEMPTS (failed), лишаються failed разом з лічильником спроб,
+        якщо викликач явно не просить повтору (retry_failed — наприклад, користувач додав канал знову).
+        """
+        if not jobs:
+            return
+        rows = [
+            {"channel_id": ch_id, "priority": prio, "hours": hours, "shard": self.monitor.name}
+            for ch_id, prio, hours in jobs
+        ]
+        stmt = pg_insert(BackfillJob).values(rows)
+        keep = [BackfillJob.status == "running"]
+        if not retry_failed:
+            keep.append(BackfillJob.status == "failed")
+        keep = or_(*keep)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["channel_id"],
+            set_={
+                "priority": func.least(BackfillJob.priority, stmt.excluded.priority),
+                "hours": func.greatest(BackfillJob.hours, stmt.excluded.hours),
+                "status": case((keep, BackfillJob.status), else_="pending"),
+                "attempts": case((keep, BackfillJob.attempts), else_=0),
+                "shard": case((keep, BackfillJob.shard), else_=stmt.excluded.shard),
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+        async with AsyncSessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+        self._wakeup.set()
+
+    async def _claim(self):
+        async with AsyncSessionLocal() as session:
+            row = (await session.execute(CLAIM_SQL, {"shard": self.monitor.name})).first()
+            await session.commit()
+            return row
+
+    async def _finish(self, job_id: int, status: str):
+        async with AsyncSessionLocal() as session:
+            await session.execute(update(BackfillJob).where(BackfillJob.id == job_id).values(status=status))
+            await session.commit()
+
+    async def _worker(self, index: int):
+        while True:
+            await self._resumed.wait()
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Backfill worker {index}: помилка отримання завдання: {e}")
+                await asyncio.sleep(config.BACKFILL_POLL_INTERVAL)
+                continue
+
+            if not job:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=config.BACKFILL_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.in_flight += 1
+            try:
+                ok = await self._run(job)
+            except Exception as e:
+                logger.error(f"Backfill: помилка завдання для каналу {job.channel_id}: {e}")
+                ok = False
+            finally:
+                self.in_flight -= 1
+
+            if ok:
+                self.done += 1
+                status = "done"
+            else:
+                status = "pending" if job.attempts < MAX_ATTEMPTS else "failed"
+                if status == "failed":
+                    self.failed += 1
+            await self._finish(job.id, status)
+
+    async def _run(self, job) -> bool:
+        async with AsyncSessionLocal() as session:
+            channel = await session.get(Channel, job.channel_id)
+        if not channel or not channel.is_active:
+            return True
+
+        identifier = channel.username or channel.telegram_id
+        depth = scan_depth(channel.posts_count_24h, job.hours)
+        logger.info(f"🚀 Backfill {channel.title}: останні {job.hours}г, до {depth} повідомлень")
+        return await self.monitor._scan_channel(channel.id, identifier, hours=job.hours, max_messages=depth)
+
+    async def _progress_loop(self):
+        last_reported = None
+        while True:
+            await asyncio.sleep(config.BACKFILL_PROGRESS_INTERVAL)
+            try:
+                async with AsyncSessionLocal() as session:
+                    pending = (await session.execute(
+                        select(func.count(BackfillJob.id)).where(
+                            BackfillJob.status == "pending", BackfillJob.shard == self.monitor.name
+                        )
+                    )).scalar() or 0
+            except Exception as e:
+                logger.debug(f"Backfill progress query failed: {e}")
+                continue
+
+            state = (self.done, self.failed, pending)
+            if state == last_reported or (pending == 0 and self.in_flight == 0 and last_reported is None):
+                continue
+            last_reported = state
+
+            elapsed_min = max((time.monotonic() - self._started_at) / 60, 1e-6)
+            rate = self.done / elapsed_min
+            eta = f"{(pending + self.in_flight) / rate:.1f} хв" if rate > 0 else "невідомо"
+            logger.info(
+                f"📚 Backfill: {self.done} готово, {self.failed} невдалих, {self.in_flight} в роботі, "
+                f"{pending} в черзі ({rate:.1f}/хв, ETA {eta})"
+            )
@@ -0,0 +1,78 @@
+"""
+Pulse Micro-Batching — об'єднання конкурентних викликів в один пакетний запит.
+Кожен submit(item) чекає на свій Future; пакет відправляється, щойно набирається
+batch_size елементів або минає max_delay секунд від першого елемента в пакеті.
+wait_for_more (необов'язково) каже, чи є сенс чекати на інших: якщо ні, пакет
+відправляється одразу, і одиничний виклик не платить затримкою за батчинг.
+Помилка пакета підміняється error_result, крім типів із propagate — їх отримує кожен
+submit. process_many може повернути виняток на місці окремого елемента — його отримає
+лише відповідний submit.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+from loguru import logger
+from services.metrics import metrics
+
+ProcessMany = Callable[[list], Awaitable[list]]
+
+
+class MicroBatcher:
+    def __init__(self, process_many: ProcessMany, batch_size: int, max_delay: float, name: str,
+                 wait_for_more: Callable[[], bool] = None, error_result: Any = None,
+                 propagate: tuple[type[BaseException], ...] = ()):
+        self.process_many = process_many
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.name = name
+        self.wait_for_more = wait_for_more
+        self.error_result = error_result
+        self.propagate = propagate
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        # Статистика для бенчмарків та метрик
+        self.requests = 0
+        self.items = 0
+
+    async def submit(self, item):
+        """Результат обробки одного елемента (error_result, якщо пакет завершився помилкою, яку не треба пропускати далі)."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.batch_size or (self.wait_for_more and not self.wait_for_more()):
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        if self._pending:
+            # Залишок після повного пакета чекає наступного вікна
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        if batch:
+            asyncio.create_task(self._send(batch))
+
+    async def _send(self, batch: list[tuple[Any, asyncio.Future]]):
+        self.requests += 1
+        self.items += len(batch)
+        metrics.inc(f"{self.name}_requests")
+        metrics.inc(f"{self.name}_items", len(batch))
+        try:
+            with metrics.timer(f"{self.name}_request"):
+                results = await self.process_many([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"got {len(results)} results for {len(batch)} items")
+        except self.propagate as e:
+            results = [e] * len(batch)
+        except Exception as e:
+            logger.error(f"{self.name} batch error ({len(batch)} items): {e}")
+            results = [self.error_result] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
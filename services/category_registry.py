@@ -0,0 +1,115 @@
+"""
+Pulse Category Registry — довідник категорій (таблиця categories) у пам'яті процесу.
+Спільний для класифікації каналів, кластеризації та каталогу: назва → id / емодзі /
+повна мітка "емодзі назва", пошук без урахування регістру та емодзі-префікса.
+Завантажується один раз; не частіше ніж раз на CATEGORY_REFRESH_INTERVAL секунд
+звіряє відбиток таблиці (один рядок md5) і перечитує її лише при змінах.
+Категорії, створені цим процесом, додаються в реєстр одразу.
+"""
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from loguru import logger
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from config.settings import config
+from database.connection import AsyncSessionLocal
+from database.models import Category
+
+# Один рядок, що змінюється при будь-якій зміні id/назви/емодзі/видимості
+VERSION_SQL = text("""
+    SELECT md5(coalesce(string_agg(id || ':' || name || ':' || coalesce(emoji, '') || ':' || is_visible::text, ','
+                                   ORDER BY id), ''))
+    FROM categories
+""")
+
+# Все до першої літери/цифри — емодзі-префікс мітки ("📍 Київ" -> "Київ")
+_PREFIX_RE = re.compile(r"^[\W_]+")
+
+
+def clean_name(label: str) -> str:
+    return _PREFIX_RE.sub("", label or "").strip()
+
+
+@dataclass
+class CategoryEntry:
+    id: int
+    name: str
+    emoji: str
+    is_visible: bool = True
+
+    @property
+    def label(self) -> str:
+        return f"{self.emoji} {self.name}"
+
+
+class CategoryRegistry:
+    def __init__(self, refresh_interval: float = None):
+        self.refresh_interval = refresh_interval if refresh_interval is not None else config.CATEGORY_REFRESH_INTERVAL
+        self._by_name: dict[str, CategoryEntry] = {}  # lower(name) -> запис
+        self._version: str | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, force: bool = False):
+        """Перечитує таблицю, якщо змінився її відбиток (або force)."""
+        if not force and self._version is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        async with self._lock:
+            if not force and self._version is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            try:
+                async with AsyncSessionLocal() as session:
+                    version = (await session.execute(VERSION_SQL)).scalar()
+                    if force or version != self._version:
+                        rows = (await session.execute(select(Category))).scalars().all()
+                        self._by_name = {
+                            c.name.lower(): CategoryEntry(c.id, c.name, c.emoji or "📰", bool(c.is_visible))
+                            for c in rows
+                        }
+                        if self._version is not None:
+                            logger.info(f"🏷 Category registry reloaded: {len(self._by_name)} categories")
+                        self._version = version
+            except Exception as e:
+                # Працюємо зі старим знімком; наступна спроба — після інтервалу
+                logger.error(f"Category registry refresh error: {e}")
+            self._checked_at = time.monotonic()
+
+    async def all(self, visible_only: bool = True) -> list[CategoryEntry]:
+        await self.refresh()
+        return [c for c in self._by_name.values() if c.is_visible or not visible_only]
+
+    async def names(self, visible_only: bool = True) -> list[str]:
+        return [c.name for c in await self.all(visible_only)]
+
+    async def labels(self, visible_only: bool = True) -> list[str]:
+        return [c.label for c in await self.all(visible_only)]
+
+    async def get(self, name_or_label: str | None) -> CategoryEntry | None:
+        """Категорія за назвою або повною міткою ("⚽ Спорт", "спорт")."""
+        if not name_or_label:
+            return None
+        await self.refresh()
+        entry = self._by_name.get(name_or_label.strip().lower())
+        return entry or self._by_name.get(clean_name(name_or_label).lower())
+
+    async def get_or_create(self, name: str, emoji: str = "📰") -> CategoryEntry:
+        """Існуюча категорія (без урахування регістру) або нова з емодзі за замовчуванням."""
+        entry = await self.get(name)
+        if entry:
+            return entry
+        name = clean_name(name) or name.strip()
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                pg_insert(Category).values(name=name, emoji=emoji).on_conflict_do_nothing(index_elements=["name"])
+            )
+            category = (await session.execute(select(Category).where(Category.name == name))).scalar_one()
+            await session.commit()
+        entry = CategoryEntry(category.id, category.name, category.emoji or emoji, bool(category.is_visible))
+        self._by_name[entry.name.lower()] = entry
+        logger.info(f"🏷 New category: {entry.label}")
+        return entry
+
+
+category_registry = CategoryRegistry()
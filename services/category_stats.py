@@ -0,0 +1,96 @@
+"""
+Pulse Category Stats — відкладений запис лічильників активності каналів у категоріях.
+Кластеризація лише накопичує в пам'яті приріст posts_count та найпізніший last_post_at
+для пари (channel_id, category_id); фоновий цикл раз на CATEGORY_STATS_FLUSH_INTERVAL
+записує все одним INSERT ... ON CONFLICT DO UPDATE. Так сплески з одного каналу
+не блокуються на гарячому рядку channel_categories і не додають SELECT+UPDATE
+на кожну публікацію. Залишок записується при зупинці (stop).
+"""
+import asyncio
+from datetime import datetime
+from loguru import logger
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from config.settings import config
+from database.connection import AsyncSessionLocal
+from database.models import ChannelCategory
+from services.metrics import metrics
+
+
+class ChannelCategoryCounter:
+    def __init__(self, flush_interval: float = None):
+        self.flush_interval = flush_interval or config.CATEGORY_STATS_FLUSH_INTERVAL
+        # (channel_id, category_id) -> [приріст posts_count, найпізніший last_post_at]
+        self._pending: dict[tuple[int, int], list] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        metrics.register_gauge("category_stats_pending", lambda: self.pending)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, channel_id: int, category_id: int, published_at: datetime, count: int = 1):
+        entry = self._pending.get((channel_id, category_id))
+        if entry is None:
+            self._pending[(channel_id, category_id)] = [count, published_at]
+        else:
+            entry[0] += count
+            if published_at > entry[1]:
+                entry[1] = published_at
+
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Зупиняє фоновий цикл і записує накопичене."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            # Стабільний порядок рядків — без взаємних блокувань між процесами
+            rows = [
+                {"channel_id": ch_id, "category_id": cat_id, "posts_count": count, "last_post_at": last_post_at}
+                for (ch_id, cat_id), (count, last_post_at) in sorted(batch.items(), key=lambda kv: kv[0])
+            ]
+            stmt = pg_insert(ChannelCategory).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_channel_category",
+                set_={
+                    "posts_count": ChannelCategory.posts_count + stmt.excluded.posts_count,
+                    "last_post_at": func.greatest(ChannelCategory.last_post_at, stmt.excluded.last_post_at),
+                    "updated_at": func.now(),
+                },
+            )
+            try:
+                with metrics.timer("category_stats_flush"):
+                    async with AsyncSessionLocal() as session:
+                        await session.execute(stmt)
+                        await session.commit()
+            except Exception as e:
+                # Повертаємо приріст у буфер — буде записаний наступним flush
+                for (ch_id, cat_id), (count, last_post_at) in batch.items():
+                    self.add(ch_id, cat_id, last_post_at, count)
+                logger.error(f"Помилка запису лічильників категорій ({len(rows)} рядків): {e}")
+                return
+        logger.debug(f"📊 Channel category stats: {len(rows)} rows flushed")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+channel_category_counter = ChannelCategoryCounter()
@@ -6,6 +6,7 @@ from database.models import Channel
 from database.connection import AsyncSessionLocal
 from sqlalchemy import select
 from services.monitor import monitor
+from services.telegram_governor import Priority
 
 class ChannelService:
     """Сервіс для валідації та створення каналів через Telegram API"""
@@ -59,7 +60,9 @@ class ChannelService:
                 
                 # Для get_entity краще передавати int якщо це число
                 to_resolve = int_id if is_numeric else clean_id
-                entity = await monitor.client.get_entity(to_resolve)
+                entity = await monitor.governor.call(
+                    "get_entity", monitor.client.get_entity, to_resolve, priority=Priority.INTERACTIVE
+                )
                 
                 if not isinstance(entity, TelethonChannel):
                     return None, f"'{identifier}' не є каналом (можливо це група або користувач)"
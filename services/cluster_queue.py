@@ -0,0 +1,187 @@
+"""
+Pulse Cluster Queue — довговічна обмежена черга кластеризації публікацій.
+Завдання (cluster_jobs) створюються в тій самій транзакції, що й публікації,
+тож після падіння чи деплою нічого не губиться. Фіксована кількість воркерів
+забирає завдання через FOR UPDATE SKIP LOCKED (безпечно для кількох процесів),
+невдалі повторюються з експоненційною затримкою, а після CLUSTER_MAX_ATTEMPTS
+залишаються в статусі dead для ручного розбору.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from loguru import logger
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from config.settings import config
+from database.connection import AsyncSessionLocal
+from database.models import ClusterJob
+from services.category_stats import channel_category_counter
+from services.metrics import metrics
+
+CLAIM_SQL = text("""
+    UPDATE cluster_jobs
+    SET status = 'running', attempts = attempts + 1, updated_at = now()
+    WHERE id = (
+        SELECT id FROM cluster_jobs
+        WHERE status = 'pending' AND available_at <= now()
+        ORDER BY available_at, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, publication_id, attempts
+""")
+
+# Завдання в running довше за цей час вважаються покинутими (процес упав) і повертаються в чергу
+RECLAIM_SQL = text("""
+    UPDATE cluster_jobs SET status = 'pending', updated_at = now()
+    WHERE status = 'running' AND updated_at < now() - make_interval(secs => :timeout)
+""")
+
+
+def cluster_jobs_insert(publication_ids: list[int]):
+    """INSERT завдань для нових публікацій (виконується в транзакції запису публікацій)."""
+    return (
+        pg_insert(ClusterJob)
+        .values([{"publication_id": pub_id} for pub_id in publication_ids])
+        .on_conflict_do_nothing(index_elements=["publication_id"])
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Експоненційна затримка перед повтором: base, 2*base, 4*base ... (не більше години)."""
+    return min(3600.0, config.CLUSTER_RETRY_BASE_DELAY * 2 ** max(0, attempts - 1))
+
+
+class ClusterQueue:
+    """Пул воркерів, що виконує cluster_publication для завдань з cluster_jobs."""
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or config.CLUSTER_WORKERS
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self.in_flight = 0
+        # Останні виміряні розміри черги (оновлюються фоновим циклом)
+        self.pending = 0
+        self.dead = 0
+
+    def notify(self, publication_ids: list[int] = None):
+        """Будить воркерів (слухач PublicationWriter: завдання вже записані разом з публікаціями)."""
+        self._wakeup.set()
+
+    async def start(self):
+        if self._tasks:
+            return
+        from services.ai_service import get_llm
+        get_llm()  # помилка налаштувань провайдера LLM — одразу при старті, а не на першому завданні
+        await channel_category_counter.start()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._housekeeping_loop()))
+        metrics.register_gauge("cluster_queue_pending", lambda: self.pending)
+        metrics.register_gauge("cluster_queue_dead", lambda: self.dead)
+        metrics.register_gauge("cluster_queue_in_flight", lambda: self.in_flight)
+        logger.info(f"🧩 Cluster queue started ({self.workers} workers)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await channel_category_counter.stop()
+
+    async def enqueue(self, publication_ids: list[int]):
+        """Ставить публікації в чергу окремою транзакцією (для інструментів та повторної обробки)."""
+        if not publication_ids:
+            return
+        async with AsyncSessionLocal() as session:
+            await session.execute(cluster_jobs_insert(publication_ids))
+            await session.commit()
+        self._wakeup.set()
+
+    async def _claim(self):
+        async with AsyncSessionLocal() as session:
+            row = (await session.execute(CLAIM_SQL)).first()
+            await session.commit()
+            return row
+
+    async def _complete(self, job_id: int):
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(ClusterJob).where(ClusterJob.id == job_id))
+            await session.commit()
+
+    async def _fail(self, job, error: Exception):
+        dead = job.attempts >= config.CLUSTER_MAX_ATTEMPTS
+        values = {"status": "dead" if dead else "pending", "last_error": str(error)[:1000]}
+        if not dead:
+            values["available_at"] = datetime.now(timezone.utc) + timedelta(seconds=retry_delay(job.attempts))
+        async with AsyncSessionLocal() as session:
+            await session.execute(update(ClusterJob).where(ClusterJob.id == job.id).values(**values))
+            await session.commit()
+        if dead:
+            metrics.inc("cluster_dead")
+            logger.error(f"🧩 Публікація {job.publication_id}: кластеризація не вдалася {job.attempts} разів, dead: {error}")
+        else:
+            metrics.inc("cluster_retry")
+            logger.warning(f"🧩 Публікація {job.publication_id}: помилка кластеризації (спроба {job.attempts}), повтор: {error}")
+
+    async def _worker(self, index: int):
+        from services.clustering import cluster_publication
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Cluster worker {index}: помилка отримання завдання: {e}")
+                await asyncio.sleep(config.CLUSTER_POLL_INTERVAL)
+                continue
+
+            if not job:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=config.CLUSTER_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.in_flight += 1
+            try:
+                await cluster_publication(job.publication_id)
+            except Exception as e:
+                await self._safe(self._fail(job, e))
+            else:
+                metrics.inc("cluster_done")
+                await self._safe(self._complete(job.id))
+            finally:
+                self.in_flight -= 1
+
+    @staticmethod
+    async def _safe(coro):
+        # Помилка БД при фіналізації не зупиняє воркера: завдання повернеться через RECLAIM_SQL
+        try:
+            await coro
+        except Exception as e:
+            logger.error(f"Cluster queue: помилка оновлення завдання: {e}")
+
+    async def _housekeeping_loop(self):
+        while True:
+            try:
+                async with AsyncSessionLocal() as session:
+                    reclaimed = await session.execute(RECLAIM_SQL, {"timeout": config.CLUSTER_JOB_TIMEOUT})
+                    counts = dict((await session.execute(
+                        select(ClusterJob.status, func.count(ClusterJob.id))
+                        .where(ClusterJob.status.in_(("pending", "dead")))
+                        .group_by(ClusterJob.status)
+                    )).all())
+                    await session.commit()
+                if reclaimed.rowcount:
+                    logger.warning(f"🧩 Повернуто в чергу {reclaimed.rowcount} завислих завдань кластеризації")
+                    self._wakeup.set()
+                self.pending = counts.get("pending", 0)
+                self.dead = counts.get("dead", 0)
+            except Exception as e:
+                logger.debug(f"Cluster queue housekeeping failed: {e}")
+            await asyncio.sleep(config.CLUSTER_POLL_INTERVAL)
+
+
+cluster_queue = ClusterQueue()
@@ -4,11 +4,25 @@ Pulse Clustering Service — логіка групування новин у с
 """
 from sqlalchemy import select, update
 from loguru import logger
+from config.settings import config
 from database.connection import AsyncSessionLocal
-from database.models import Publication, Story, Category, ChannelCategory
-from services.ai_service import get_text_embedding, generate_story_info, get_existing_categories
+from database.models import Publication, Story
+from services.ai_service import get_text_embedding, generate_story_info_batch, extractive_story_info
+from services.ai_scheduler import Lane
+from services.batching import MicroBatcher
+from services.category_registry import category_registry
+from services.category_stats import channel_category_counter
+from services.metrics import metrics
+from services.fingerprint import fingerprint_index
+from services.llm_provider import CassetteMiss
+from services.local_classifier import local_classifier
+from services.near_dup import near_dup_detector
+from services.vector_index import story_vector_index
 from pgvector.sqlalchemy import Vector
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import asyncio
+from contextlib import contextmanager
+from functools import partial
 
 # Поріг схожості (Cosine Distance).
 # Чим менше, тим суворіше. Для Gemini embeddings:
@@ -18,10 +32,114 @@ from datetime import datetime, timezone
 # > 0.3 - різні теми
 SIMILARITY_THRESHOLD = 0.15
 
+# Скільки копія чекає, поки оригінал з тим самим відбитком отримає сюжет
+DUPLICATE_WAIT_SECONDS = 120
+
+
+
+class StoryCandidates:
+    """
+    Скільки завдань кластеризації ще можуть подати публікацію на генерацію метаданих сюжету.
+    Не враховує тих, хто вже чекає в батчері або чекає на оригінал дослівної копії.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    @contextmanager
+    def track(self):
+        self.count += 1
+        try:
+            yield
+        finally:
+            self.count -= 1
+
+    @contextmanager
+    def paused(self):
+        self.count -= 1
+        try:
+            yield
+        finally:
+            self.count += 1
+
+
+story_candidates = StoryCandidates()
+
+# Нові сюжети від одночасних воркерів черги генеруються одним запитом до LLM;
+# пакет відправляється, щойно решта воркерів уже в ньому (або не дійде до LLM)
+story_info_batcher = MicroBatcher(
+    generate_story_info_batch,
+    batch_size=config.STORY_BATCH_SIZE,
+    max_delay=config.STORY_BATCH_MAX_DELAY,
+    name="story_info",
+    wait_for_more=lambda: story_candidates.count > 0,
+    propagate=(CassetteMiss,),
+)
+# Публікації зі сканування історії — окремі пакети в нижчій смузі планувальника AI
+backfill_story_info_batcher = MicroBatcher(
+    partial(generate_story_info_batch, lane=Lane.BACKFILL),
+    batch_size=config.STORY_BATCH_SIZE,
+    max_delay=config.STORY_BATCH_MAX_DELAY,
+    name="story_info_backfill",
+    wait_for_more=lambda: story_candidates.count > 0,
+    propagate=(CassetteMiss,),
+)
+
 async def cluster_publication(publication_id: int):
     """
     Аналізує публікацію та прив'язує її до існуючої історії або створює нову.
     """
+    try:
+        with metrics.timer("cluster_publication"), story_candidates.track():
+            status = await _cluster_publication(publication_id)
+    finally:
+        fingerprint_index.release(publication_id)
+    if status:
+        metrics.publication_done(publication_id)
+    return status
+
+
+async def _find_duplicate_story(session, publication: Publication) -> Story | None:
+    """
+    Сюжет дослівної копії цієї публікації (той самий content_hash у межах вікна):
+    спершу індекс у пам'яті, потім індексована колонка, а якщо оригінал саме кластеризується —
+    чекаємо на його результат. На час очікування транзакція сесії завершується, щоб копія
+    не тримала з'єднання пулу; publication після нього перечитується.
+    """
+    fingerprint = publication.content_hash
+    story_id = fingerprint_index.get(fingerprint)
+    if story_id is None:
+        window_start = publication.published_at - timedelta(hours=config.FINGERPRINT_WINDOW_HOURS)
+        res = await session.execute(
+            select(Publication.story_id)
+            .where(
+                Publication.content_hash == fingerprint,
+                Publication.story_id.isnot(None),
+                Publication.id != publication.id,
+                Publication.published_at >= window_start,
+            )
+            .order_by(Publication.id)
+            .limit(1)
+        )
+        story_id = res.scalar_one_or_none()
+    if story_id is None:
+        waiter = fingerprint_index.lead(fingerprint, publication.id)
+        if waiter is None:
+            return None
+        # Сесія досі лише читала — rollback повертає з'єднання в пул
+        await session.rollback()
+        try:
+            with story_candidates.paused():
+                story_id = await asyncio.wait_for(asyncio.shield(waiter), timeout=DUPLICATE_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            story_id = None
+        await session.refresh(publication)
+        if story_id is None:
+            return None
+    return await session.get(Story, story_id)
+
+
+async def _cluster_publication(publication_id: int):
     logger.info(f"Clustering publication {publication_id}...")
     
     async with AsyncSessionLocal() as session:
@@ -42,52 +160,87 @@ async def cluster_publication(publication_id: int):
         # 2. Individual Post Mode: Skip embedding and similarity search
         text_to_embed = publication.content or ""
         embedding = None # Not needed when clustering is disabled
+        # Публікації зі сканування історії йдуть до LLM у нижчій смузі планувальника AI
+        age = datetime.now(timezone.utc) - publication.published_at
+        lane = Lane.CLUSTERING if age.total_seconds() < config.AI_BACKFILL_AGE else Lane.BACKFILL
 
+        # 3. Дослівний репост уже відомої новини — приєднуємо до її сюжету без виклику LLM
         story_to_link = None
+        if publication.content_hash:
+            story_to_link = await _find_duplicate_story(session, publication)
+            if story_to_link:
+                metrics.inc("duplicates_linked")
+
+        # 3b. Майже дослівне переписування (MinHash/LSH) — теж без ембедингу та LLM
+        signature = None
+        if config.NEAR_DUP_ENABLED:
+            await near_dup_detector.warm_up()
+            signature = near_dup_detector.signature(text_to_embed)
+            if story_to_link is None and signature is not None:
+                match = near_dup_detector.find_story(signature)
+                if match:
+                    story_to_link = await session.get(Story, match[0])
+                    if story_to_link:
+                        metrics.inc("near_duplicates_linked")
+                        logger.info(f"Publication {publication_id} ≈ story {match[0]} (jaccard≈{match[1]:.2f})")
+
+        # 3c. Семантична близькість: ембединг проти гарячого вікна сюжетів у пам'яті (без pgvector-запиту)
+        if story_to_link is None and config.VECTOR_CLUSTERING_ENABLED:
+            with metrics.timer("get_text_embedding"):
+                embedding = await get_text_embedding(text_to_embed, lane)
+            if embedding is not None:
+                await story_vector_index.warm_up()
+                with metrics.timer("vector_index_query"):
+                    match = story_vector_index.query(embedding, SIMILARITY_THRESHOLD)
+                if match:
+                    story_to_link = await session.get(Story, match[0])
+                    if story_to_link:
+                        metrics.inc("vector_linked")
+                        logger.info(f"Publication {publication_id} → story {match[0]} (distance {match[1]:.3f})")
+
+        db_cat = None
         
         # 4. Линковка або створення
         if story_to_link:
             publication.story_id = story_to_link.id
             publication.category = story_to_link.category # Inherit category
+            publication.category_source = story_to_link.category_source
             
             # Оновлюємо час сюжету на час найновішої публікації
             if publication.published_at > story_to_link.last_updated_at:
                 story_to_link.last_updated_at = publication.published_at
             status = "linked"
+
+            # Категорія сюжету зберігається як "емодзі назва"
+            db_cat = await category_registry.get(story_to_link.category)
         else:
             # Створюємо нову історію
             # Генеруємо метадані через LLM
-            meta = await generate_story_info(text_to_embed)
-            
-            # Map result to full category with emoji
-            from services.ai_service import CATEGORY_MAP
-            raw_cat = meta.get("category", "Події")
-            
-            # Динамічне отримання або створення категорії в БД
-            existing_cats = await get_existing_categories()
-            # Шукаємо збіг (case insensitive)
-            cat_name = raw_cat
-            for c in existing_cats:
-                if c.lower() == raw_cat.lower():
-                    cat_name = c
-                    break
-            
-            # Знаходимо або створюємо категорію в таблиці categories
-            stmt_cat = select(Category).where(Category.name == cat_name)
-            res_cat = await session.execute(stmt_cat)
-            db_cat = res_cat.scalar_one_or_none()
-            
-            if not db_cat:
-                db_cat = Category(name=cat_name, emoji="📰")
-                session.add(db_cat)
-                await session.flush()
+            # Впевнена локальна категорія: короткий пост — без LLM, інакше LLM лише для заголовка/саммарі
+            local_cat = await local_classifier.classify(text_to_embed, publication.channel_id)
+            category_source = "local" if local_cat else "llm"
+            if local_cat and len(text_to_embed) <= config.LOCAL_BRIEF_MAX_CHARS:
+                meta = extractive_story_info(text_to_embed, local_cat)
+                metrics.inc("story_info_local")
+            else:
+                batcher = backfill_story_info_batcher if lane == Lane.BACKFILL else story_info_batcher
+                with metrics.timer("generate_story_info"), story_candidates.paused():
+                    meta = await batcher.submit(text_to_embed) or {}
+                if not local_cat and (meta.get("extractive") or not meta.get("category")):
+                    category_source = "default"
+                if local_cat:
+                    meta["category"] = local_cat
+                    metrics.inc("category_local")
             
-            full_cat = f"{db_cat.emoji} {db_cat.name}"
+            # Категорія з довідника (без урахування регістру) або нова
+            db_cat = await category_registry.get_or_create(str(meta.get("category") or "Події"))
+            full_cat = db_cat.label
 
             new_story = Story(
                 title=meta.get("title", "Нова подія"),
                 summary=meta.get("summary", ""),
                 category=full_cat,
+                category_source=category_source,
                 embedding_vector=embedding,
                 first_seen_at=publication.published_at, # Використовуємо час публікації
                 last_updated_at=publication.published_at,
@@ -98,32 +251,22 @@ async def cluster_publication(publication_id: int):
             
             publication.story_id = new_story.id
             publication.category = full_cat # Set direct category
+            publication.category_source = category_source
             status = "created"
             logger.info(f"Created new story {new_story.id}: {new_story.title}")
 
-        # 5. Оновлюємо ChannelCategory активність
+        with metrics.timer("cluster_commit"):
+            await session.commit()
+        # 5. Активність каналу в категорії — відкладений пакетний запис (services/category_stats.py)
         if publication.channel_id and db_cat:
-            stmt_ch_cat = select(ChannelCategory).where(
-                ChannelCategory.channel_id == publication.channel_id,
-                ChannelCategory.category_id == db_cat.id
-            )
-            res_ch_cat = await session.execute(stmt_ch_cat)
-            ch_cat = res_ch_cat.scalar_one_or_none()
-            
-            if not ch_cat:
-                ch_cat = ChannelCategory(
-                    channel_id=publication.channel_id,
-                    category_id=db_cat.id,
-                    posts_count=1,
-                    last_post_at=publication.published_at
-                )
-                session.add(ch_cat)
-            else:
-                ch_cat.posts_count += 1
-                if publication.published_at > ch_cat.last_post_at:
-                    ch_cat.last_post_at = publication.published_at
-            
-            logger.info(f"Updated ChannelCategory: channel={publication.channel_id}, cat={db_cat.name}, posts={ch_cat.posts_count}")
-
-        await session.commit()
+            channel_category_counter.add(publication.channel_id, db_cat.id, publication.published_at)
+        if publication.content_hash:
+            fingerprint_index.remember(publication.content_hash, publication.story_id)
+        if signature is not None:
+            near_dup_detector.add(publication.id, publication.story_id, signature)
+        if config.VECTOR_CLUSTERING_ENABLED:
+            if status == "created" and embedding is not None:
+                story_vector_index.add(publication.story_id, embedding, publication.published_at)
+            elif status == "linked":
+                story_vector_index.touch(publication.story_id, publication.published_at)
         return status
@@ -0,0 +1,57 @@
+"""
+Pulse Embedding Batcher — мікро-батчинг запитів ембедингів (services/batching.py).
+Конкурентні виклики embed() відправляються одним multi-content запитом, щойно
+набирається EMBEDDING_BATCH_SIZE текстів або минає EMBEDDING_BATCH_MAX_DELAY секунд
+від першого тексту в пакеті.
+FakeEmbeddingProvider — локальний провайдер з імітацією мережевої затримки для
+офлайн-бенчмарку (tools/bench_embedding_batcher.py).
+"""
+import asyncio
+import hashlib
+from typing import Awaitable, Callable
+import numpy as np
+from config.settings import config
+from services.batching import MicroBatcher
+
+EmbedMany = Callable[[list[str]], Awaitable[list[list[float] | None]]]
+
+
+class EmbeddingBatcher(MicroBatcher):
+    def __init__(self, embed_many: EmbedMany, batch_size: int = None, max_delay: float = None,
+                 name: str = "embedding", propagate: tuple[type[BaseException], ...] = ()):
+        super().__init__(
+            embed_many,
+            batch_size=batch_size or config.EMBEDDING_BATCH_SIZE,
+            max_delay=max_delay if max_delay is not None else config.EMBEDDING_BATCH_MAX_DELAY,
+            name=name,
+            propagate=propagate,
+        )
+
+    async def embed(self, text: str) -> list[float] | None:
+        """Ембединг одного тексту (None — помилка провайдера)."""
+        return await self.submit(text)
+
+
+class FakeEmbeddingProvider:
+    """
+    Детерміновані псевдо-ембединги з затримкою "запиту" latency + per_item * len(texts).
+    max_inflight імітує обмеження API на одночасні запити (пул з'єднань / квоту).
+    """
+
+    def __init__(self, dim: int = 768, latency: float = 0.15, per_item: float = 0.002, max_inflight: int = 4):
+        self.dim = dim
+        self.latency = latency
+        self.per_item = per_item
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self.calls = 0
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+        v = np.random.default_rng(seed).normal(size=self.dim)
+        return (v / np.linalg.norm(v)).tolist()
+
+    async def embed_many(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        async with self._inflight:
+            await asyncio.sleep(self.latency + self.per_item * len(texts))
+        return [self._vector(t) for t in texts]
@@ -0,0 +1,124 @@
+"""
+Pulse Embedding Cache — кеш ембедингів, адресований вмістом тексту.
+Ключ — blake2b від (модель, розмірність, нормалізований текст), тому репости,
+повторна кластеризація після tools/reset_clusters.py та бекфіли, що перечитують
+ті самі повідомлення, не звертаються до API повторно.
+Два рівні: обмежений LRU у пам'яті та таблиця embedding_cache у БД (вектори float16
+у bytea — 1.5 КБ на 768 вимірів). Одночасні промахи за одним ключем об'єднуються
+в один виклик провайдера. Лічильники hit/miss — у services/metrics.
+"""
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable
+import numpy as np
+from loguru import logger
+from config.settings import config
+from services.fingerprint import normalize_text
+from services.metrics import metrics
+
+
+def cache_key(text: str, model: str, dim: int) -> str:
+    # Якщо після нормалізації нічого не лишилось (лише емодзі/посилання) — ключ від сирого тексту
+    normalized = normalize_text(text) or text
+    return hashlib.blake2b(f"{model}\x00{dim}\x00{normalized}".encode(), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, model: str, dim: int, size: int = None, persist: bool = None):
+        self.model = model
+        self.dim = dim
+        self.size = size or config.EMBEDDING_CACHE_SIZE
+        self.persist = config.EMBEDDING_CACHE_PERSIST if persist is None else persist
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()  # key -> float16-вектор
+        self._inflight: dict[str, asyncio.Future] = {}
+        metrics.register_gauge("embedding_cache_size", lambda: len(self))
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+
+    async def _load(self, key: str) -> np.ndarray | None:
+        from sqlalchemy import select
+        from database.connection import AsyncSessionLocal
+        from database.models import EmbeddingCacheEntry
+
+        try:
+            async with AsyncSessionLocal() as session:
+                data = (await session.execute(
+                    select(EmbeddingCacheEntry.vector).where(EmbeddingCacheEntry.key == key)
+                )).scalar()
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup error: {e}")
+            return None
+        if data is None or len(data) != self.dim * 2:
+            return None
+        return np.frombuffer(data, dtype=np.float16)
+
+    async def _store(self, key: str, vector: np.ndarray):
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        from database.connection import AsyncSessionLocal
+        from database.models import EmbeddingCacheEntry
+
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    pg_insert(EmbeddingCacheEntry)
+                    .values(key=key, model=self.model, dim=self.dim, vector=vector.tobytes())
+                    .on_conflict_do_nothing(index_elements=["key"])
+                )
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Embedding cache store error: {e}")
+
+    async def get_or_compute(self, text: str, compute: Callable[[str], Awaitable[list[float] | None]]) -> list[float] | None:
+        """Ембединг з кешу або через compute(text); None від провайдера не кешується."""
+        key = cache_key(text, self.model, self.dim)
+        vector = self._lru.get(key)
+        if vector is not None:
+            self._lru.move_to_end(key)
+            metrics.inc("embedding_cache_hit_memory")
+            return vector.astype(np.float32).tolist()
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.inc("embedding_cache_hit_inflight")
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        result = None
+        error = None
+        try:
+            if self.persist:
+                vector = await self._load(key)
+                if vector is not None:
+                    metrics.inc("embedding_cache_hit_db")
+                    self._remember(key, vector)
+                    result = vector.astype(np.float32).tolist()
+                    return result
+
+            metrics.inc("embedding_cache_miss")
+            result = await compute(text)
+            if result is not None and len(result) == self.dim:
+                vector = np.asarray(result, dtype=np.float16)
+                self._remember(key, vector)
+                if self.persist:
+                    await self._store(key, vector)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            del self._inflight[key]
+            if error is None:
+                future.set_result(result)
+            else:
+                # Ті, хто чекає на цей самий текст, отримують ту саму помилку, а не None
+                future.set_exception(error)
+                future.exception()
@@ -0,0 +1,119 @@
+"""
+Pulse Engagement Refresher — періодичне оновлення переглядів та реакцій публікацій.
+Для публікацій у вікні дайджесту робить пакетні запити get_messages (до 100 id на запит
+в межах каналу) і записує результат одним set-based UPDATE на кожен пакет.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from loguru import logger
+from sqlalchemy import select, text
+from config.settings import config
+from database.connection import AsyncSessionLocal
+from database.models import Publication
+from services.telegram_governor import Priority
+
+# Максимум id в одному messages.getHistory/getMessages запиті
+MESSAGES_PER_REQUEST = 100
+
+UPDATE_SQL = text("""
+    UPDATE publications AS p
+    SET views = v.views, reactions = v.reactions
+    FROM unnest(
+        CAST(:ids AS integer[]), CAST(:views AS integer[]), CAST(:reactions AS integer[])
+    ) AS v(id, views, reactions)
+    WHERE p.id = v.id AND (p.views IS DISTINCT FROM v.views OR p.reactions IS DISTINCT FROM v.reactions)
+""")
+
+
+def count_reactions(message) -> int:
+    """Сумарна кількість реакцій на повідомлення."""
+    reactions = getattr(message, "reactions", None)
+    if not reactions or not getattr(reactions, "results", None):
+        return 0
+    return sum(getattr(r, "count", 0) or 0 for r in reactions.results)
+
+
+class EngagementRefresher:
+    """Фонове оновлення Publication.views / Publication.reactions для відстежуваних каналів."""
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(config.ENGAGEMENT_REFRESH_INTERVAL)
+            try:
+                await self.refresh_once()
+            except Exception as e:
+                logger.error(f"Помилка оновлення переглядів/реакцій: {e}")
+
+    async def refresh_once(self) -> int:
+        """Оновлює перегляди та реакції для публікацій за останні ENGAGEMENT_WINDOW_HOURS. Повертає к-сть оновлених."""
+        threshold = datetime.now(timezone.utc) - timedelta(hours=config.ENGAGEMENT_WINDOW_HOURS)
+        tracked = list(self.monitor._tracked.keys())
+        if not tracked:
+            return 0
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Publication.id, Publication.channel_id, Publication.telegram_message_id)
+                .where(Publication.published_at >= threshold, Publication.channel_id.in_(tracked))
+            )
+            rows = result.all()
+
+        by_channel: dict[int, dict[int, int]] = defaultdict(dict)
+        for pub_id, channel_id, msg_id in rows:
+            by_channel[channel_id][msg_id] = pub_id
+
+        updated = 0
+        requests = 0
+        for channel_id, msg_to_pub in by_channel.items():
+            identifier = self.monitor._identifier_for(channel_id)
+            if not identifier:
+                continue
+            msg_ids = sorted(msg_to_pub)
+            for i in range(0, len(msg_ids), MESSAGES_PER_REQUEST):
+                chunk = msg_ids[i:i + MESSAGES_PER_REQUEST]
+                try:
+                    messages = await self.monitor.governor.call(
+                        "get_messages", self.monitor.client.get_messages, self.monitor._peer_for(channel_id, identifier),
+                        ids=chunk, priority=Priority.BACKFILL
+                    )
+                    requests += 1
+                except Exception as e:
+                    logger.warning(f"Не вдалося отримати статистику повідомлень {identifier}: {e}")
+                    break
+
+                batch = [
+                    (msg_to_pub[m.id], m.views or 0, count_reactions(m))
+                    for m in messages if m is not None and m.id in msg_to_pub
+                ]
+                updated += await self._write_batch(batch)
+
+        logger.info(f"👁 Оновлено перегляди/реакції: {updated} публікацій ({requests} запитів, {len(by_channel)} каналів)")
+        return updated
+
+    async def _write_batch(self, batch: list[tuple[int, int, int]]) -> int:
+        if not batch:
+            return 0
+        ids, views, reactions = (list(col) for col in zip(*batch))
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(UPDATE_SQL, {"ids": ids, "views": views, "reactions": reactions})
+            await session.commit()
+            return result.rowcount
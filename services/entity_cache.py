@@ -0,0 +1,124 @@
+"""
+Pulse Entity Cache — персистентний кеш сутностей Telegram (channel_entities).
+Зберігає для кожного акаунта-шарда telegram_id, access_hash, username, title
+та ознаку участі в каналі. Після рестарту монітор будує InputPeerChannel без
+resolve/get_entity і не повторює JoinChannelRequest для вже приєднаних каналів.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from telethon.tl.types import InputPeerChannel
+from database.connection import AsyncSessionLocal
+from database.models import ChannelEntity
+
+
+@dataclass
+class EntityEntry:
+    telegram_id: int
+    access_hash: int | None = None
+    username: str | None = None
+    title: str | None = None
+    joined: bool = False
+
+
+class EntityCache:
+    """Кеш сутностей одного шарда: у пам'яті + відкладений upsert у БД."""
+
+    def __init__(self, shard: str):
+        self.shard = shard
+        self.enabled = True
+        self.entries: dict[int, EntityEntry] = {}
+        self._dirty: set[int] = set()
+
+    async def load(self) -> dict[int, EntityEntry]:
+        """Завантажує кеш шарда з БД (channel_id -> EntityEntry)."""
+        if not self.enabled:
+            return {}
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(ChannelEntity).where(ChannelEntity.shard == self.shard))
+            for row in result.scalars().all():
+                self.entries[row.channel_id] = EntityEntry(
+                    telegram_id=row.telegram_id,
+                    access_hash=row.access_hash,
+                    username=row.username,
+                    title=row.title,
+                    joined=row.joined,
+                )
+        return self.entries
+
+    def input_peer(self, channel_db_id: int) -> InputPeerChannel | None:
+        """InputPeerChannel з кешованого access_hash (None, якщо хеш невідомий)."""
+        entry = self.entries.get(channel_db_id) if self.enabled else None
+        if entry and entry.access_hash is not None:
+            return InputPeerChannel(channel_id=entry.telegram_id, access_hash=entry.access_hash)
+        return None
+
+    def is_joined(self, channel_db_id: int) -> bool:
+        entry = self.entries.get(channel_db_id) if self.enabled else None
+        return bool(entry and entry.joined)
+
+    def remember(self, channel_db_id: int, entity=None, joined: bool = None):
+        """Оновлює запис з Telethon-сутності каналу та/або ознаки участі."""
+        if not self.enabled:
+            return
+        entry = self.entries.get(channel_db_id)
+        if entity is not None and getattr(entity, "id", None):
+            fields = {
+                "telegram_id": entity.id,
+                "access_hash": getattr(entity, "access_hash", None),
+                "username": (getattr(entity, "username", None) or "").lower() or None,
+                "title": getattr(entity, "title", None),
+            }
+            if entry is None:
+                entry = self.entries[channel_db_id] = EntityEntry(**fields)
+                self._dirty.add(channel_db_id)
+            else:
+                for key, value in fields.items():
+                    if value is not None and getattr(entry, key) != value:
+                        setattr(entry, key, value)
+                        self._dirty.add(channel_db_id)
+        if entry is not None and joined is not None and entry.joined != joined:
+            entry.joined = joined
+            self._dirty.add(channel_db_id)
+
+    async def flush(self):
+        """Записує змінені записи одним INSERT ... ON CONFLICT DO UPDATE."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "shard": self.shard,
+                "channel_id": ch_id,
+                "telegram_id": e.telegram_id,
+                "access_hash": e.access_hash,
+                "username": e.username,
+                "title": e.title,
+                "joined": e.joined,
+                "updated_at": now,
+            }
+            for ch_id in dirty if (e := self.entries.get(ch_id))
+        ]
+        stmt = pg_insert(ChannelEntity).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_channel_entity_shard",
+            set_={
+                "telegram_id": stmt.excluded.telegram_id,
+                "access_hash": stmt.excluded.access_hash,
+                "username": stmt.excluded.username,
+                "title": stmt.excluded.title,
+                "joined": stmt.excluded.joined,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(stmt)
+                await session.commit()
+        except Exception as e:
+            # Не втрачаємо зміни — спробуємо з наступним flush
+            self._dirty |= dirty
+            logger.error(f"Помилка збереження кешу сутностей ({len(rows)}): {e}")
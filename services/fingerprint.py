@@ -0,0 +1,99 @@
+"""
+Pulse Fingerprint — відбитки нормалізованого тексту для виявлення дослівних репостів.
+Текст приводиться до нижнього регістру, з нього прибираються посилання, згадки,
+емодзі, пунктуація та зайві пробіли; від результату береться blake2b (8 байт, hex).
+FingerprintIndex — вікно в пам'яті "відбиток → сюжет" поверх індексованої колонки
+publications.content_hash, щоб копія одразу приєднувалась до сюжету оригіналу без LLM.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from config.settings import config
+
+_URL_RE = re.compile(r"(?:https?://|www\.|t\.me/)\S+", re.IGNORECASE)
+_MENTION_RE = re.compile(r"@\w+")
+# \w охоплює літери та цифри будь-якої мови; все інше (емодзі, пунктуація, "_") — роздільник
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    text = _URL_RE.sub(" ", text.lower())
+    text = _MENTION_RE.sub(" ", text)
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def content_hash(text: str | None) -> str | None:
+    """Відбиток тексту або None, якщо після нормалізації він закороткий для надійного порівняння."""
+    if not text:
+        return None
+    normalized = normalize_text(text)
+    if len(normalized) < config.FINGERPRINT_MIN_LENGTH:
+        return None
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+class FingerprintIndex:
+    """
+    Відбиток → story_id за останні FINGERPRINT_WINDOW_HOURS.
+    Також координує одночасну кластеризацію копій: перша копія ("лідер") створює сюжет,
+    інші чекають на її результат замість власного виклику LLM.
+    """
+
+    def __init__(self, window_hours: int = None):
+        self.window = (window_hours or config.FINGERPRINT_WINDOW_HOURS) * 3600
+        # hash -> (story_id, monotonic-час закінчення), у порядку додавання
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        # hash -> (publication_id лідера, Future зі story_id)
+        self._inflight: dict[str, tuple[int, asyncio.Future]] = {}
+        self._owner_hash: dict[int, str] = {}
+
+    def get(self, fingerprint: str) -> int | None:
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self._entries[fingerprint]
+            return None
+        return entry[0]
+
+    def remember(self, fingerprint: str, story_id: int):
+        self._entries[fingerprint] = (story_id, time.monotonic() + self.window)
+        self._entries.move_to_end(fingerprint)
+        self._prune()
+
+    def _prune(self):
+        now = time.monotonic()
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest[1] >= now:
+                break
+            self._entries.popitem(last=False)
+
+    def lead(self, fingerprint: str, publication_id: int) -> asyncio.Future | None:
+        """
+        None — викликач став лідером для відбитка (має викликати release після кластеризації);
+        інакше — Future, що завершиться story_id лідера (або None, якщо лідер не впорався).
+        """
+        inflight = self._inflight.get(fingerprint)
+        if inflight is not None:
+            return inflight[1]
+        self._inflight[fingerprint] = (publication_id, asyncio.get_running_loop().create_future())
+        self._owner_hash[publication_id] = fingerprint
+        return None
+
+    def release(self, publication_id: int):
+        """Завершує лідерство публікації: очікувачі отримують story_id з індексу."""
+        fingerprint = self._owner_hash.pop(publication_id, None)
+        if fingerprint is None:
+            return
+        _, future = self._inflight.pop(fingerprint)
+        if not future.done():
+            future.set_result(self.get(fingerprint))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+fingerprint_index = FingerprintIndex()
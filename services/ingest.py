@@ -0,0 +1,240 @@
+"""
+Pulse Ingest Writer — буферизований пакетний запис публікацій.
+Замість окремої транзакції на кожне повідомлення збирає публікації в буфер
+і записує їх одним multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING id.
+У тій самій транзакції оновлюються водяні знаки каналів (channels.last_message_id)
+та створюються завдання черги кластеризації (cluster_jobs).
+Якщо БД недоступна, пакет повертається в буфер; буфер обмежений INGEST_MAX_BUFFER —
+понад нього add() чекає на успішний запис (backpressure на intake і сканування).
+Якщо пакет відхилено через дані (IntegrityError/DataError), він ділиться навпіл,
+доки не знайдуться проблемні рядки; вони логуються й відкидаються.
+"""
+import asyncio
+import time
+from typing import Callable
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError
+from config.settings import config
+from database.connection import AsyncSessionLocal
+from database.models import Publication
+from services.cluster_queue import cluster_jobs_insert
+from services.metrics import metrics
+
+
+class PublicationWriter:
+    """
+    Буфер публікацій зі скиданням за розміром або за часовим вікном.
+    Спільний для live-обробника та сканування історії (_scan_channel).
+    """
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None, max_buffer: int = None):
+        self.batch_size = batch_size or config.INGEST_BATCH_SIZE
+        self.flush_interval = flush_interval or config.INGEST_FLUSH_INTERVAL
+        self.max_buffer = max(self.batch_size, max_buffer or config.INGEST_MAX_BUFFER)
+        # (channel_id, telegram_message_id) -> рядок для INSERT (дедуплікація в межах буфера)
+        self._buffer: dict[tuple[int, int], dict] = {}
+        # Ключі live-повідомлень у буфері (для виміру затримки; скани історії не враховуються)
+        self._live: set[tuple[int, int]] = set()
+        # channel_id -> найбільший побачений telegram_message_id (ще не збережений у БД)
+        self._watermarks: dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        # Слухачі, які отримують id щойно вставлених публікацій (наприклад, пробудження черги кластеризації)
+        self._listeners: list[Callable[[list[int]], None]] = []
+        # Слухачі закомічених водяних знаків (channel_id -> max telegram_message_id)
+        self._watermark_listeners: list[Callable[[dict[int, int]], None]] = []
+        # Після невдалого запису скидання за розміром буфера відкладається до наступного вікна
+        self._retry_after = 0.0
+
+    def add_listener(self, callback: Callable[[list[int]], None]):
+        """Реєструє callback, що викликається зі списком нових publication_id після кожного flush."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def add_watermark_listener(self, callback: Callable[[dict[int, int]], None]):
+        """Реєструє callback, що отримує водяні знаки каналів, щойно збережені в БД."""
+        if callback not in self._watermark_listeners:
+            self._watermark_listeners.append(callback)
+
+    async def start(self):
+        """Запускає фоновий цикл скидання буфера за часом."""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Ingest writer started (batch={self.batch_size}, window={self.flush_interval}s)")
+
+    async def stop(self):
+        """Зупиняє фоновий цикл і записує все, що залишилось у буфері."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush()
+
+    async def add(self, row: dict, live: bool = False):
+        """
+        Додає публікацію в буфер.
+        Якщо буфер заповнено — скидає його одразу (природний backpressure для сканування історії).
+        Якщо запис не вдається і буфер досяг max_buffer — чекає, доки запис не відновиться.
+        live=True — повідомлення з real-time обробника (для метрик затримки).
+        """
+        key = (row["channel_id"], row["telegram_message_id"])
+        if key not in self._buffer and len(self._buffer) >= self.max_buffer:
+            await self._wait_for_room()
+        self._buffer.setdefault(key, row)
+        if live:
+            self._live.add(key)
+        if len(self._buffer) >= self.batch_size and time.monotonic() >= self._retry_after:
+            await self.flush()
+
+    async def _wait_for_room(self):
+        metrics.inc("publication_buffer_full")
+        logger.warning(f"💾 Буфер публікацій заповнено ({len(self._buffer)}), очікування запису в БД")
+        while len(self._buffer) >= self.max_buffer:
+            now = time.monotonic()
+            if now >= self._retry_after:
+                await self.flush()
+            else:
+                await asyncio.sleep(self._retry_after - now)
+
+    @property
+    def pending(self) -> int:
+        """Кількість публікацій у буфері, що чекають на запис."""
+        return len(self._buffer)
+
+    def note_watermark(self, channel_id: int, message_id: int):
+        """
+        Запам'ятовує найбільший побачений message_id каналу (включно з рекламою та медіа без тексту).
+        Зберігається в БД разом з наступним flush.
+        """
+        if message_id > self._watermarks.get(channel_id, 0):
+            self._watermarks[channel_id] = message_id
+
+    async def flush(self) -> list[int]:
+        """Записує буфер одним INSERT і повертає id нових (не дублікатів) публікацій."""
+        async with self._lock:
+            if not self._buffer and not self._watermarks:
+                return []
+            rows = list(self._buffer.values())
+            self._buffer = {}
+            live = self._live
+            self._live = set()
+            watermarks = self._watermarks
+            self._watermarks = {}
+            for row in rows:
+                if row["telegram_message_id"] > watermarks.get(row["channel_id"], 0):
+                    watermarks[row["channel_id"]] = row["telegram_message_id"]
+
+            try:
+                with metrics.timer("publication_insert"):
+                    try:
+                        inserted = await self._write(rows, watermarks)
+                    except (IntegrityError, DataError) as e:
+                        # Проблема в даних, а не в БД: повтор того самого пакета не допоможе
+                        logger.warning(f"Пакет з {len(rows)} публікацій відхилено ({e.__class__.__name__}), пошук проблемних рядків")
+                        inserted = await self._write_isolating(rows)
+                        await self._write([], watermarks)
+            except Exception as e:
+                # Повертаємо пакет у буфер (новіші записи з тим самим ключем мають перевагу) —
+                # наступний flush повторить запис, завдання кластеризації теж не губляться
+                for row in rows:
+                    self._buffer.setdefault((row["channel_id"], row["telegram_message_id"]), row)
+                self._live |= live
+                for channel_id, message_id in watermarks.items():
+                    self.note_watermark(channel_id, message_id)
+                self._retry_after = time.monotonic() + self.flush_interval
+                metrics.inc("publication_insert_failed")
+                logger.error(f"Помилка пакетного запису {len(rows)} публікацій (повтор з наступним flush): {e}")
+                return []
+            new_ids = [r.id for r in inserted]
+
+            for callback in self._watermark_listeners:
+                try:
+                    callback(watermarks)
+                except Exception as e:
+                    logger.error(f"Помилка обробника водяних знаків: {e}")
+
+            if not rows:
+                return []
+
+        metrics.inc("publications_saved", len(new_ids))
+        for row in inserted:
+            if (row.channel_id, row.telegram_message_id) in live:
+                metrics.observe_lag("e2e_lag_db", row.published_at)
+                metrics.track_publication(row.id, row.published_at)
+
+        skipped = len(rows) - len(new_ids)
+        logger.info(f"💾 Saved {len(new_ids)} publications (batch={len(rows)}, duplicates skipped={skipped})")
+
+        if new_ids:
+            for callback in self._listeners:
+                try:
+                    callback(new_ids)
+                except Exception as e:
+                    logger.error(f"Помилка обробника нових публікацій: {e}")
+        return new_ids
+
+    async def _write(self, rows: list[dict], watermarks: dict[int, int]) -> list:
+        """Одна транзакція: INSERT публікацій, завдання кластеризації, водяні знаки каналів."""
+        inserted = []
+        async with AsyncSessionLocal() as session:
+            if rows:
+                stmt = (
+                    pg_insert(Publication)
+                    .values(rows)
+                    .on_conflict_do_nothing(index_elements=["channel_id", "telegram_message_id"])
+                    .returning(
+                        Publication.id, Publication.channel_id,
+                        Publication.telegram_message_id, Publication.published_at
+                    )
+                )
+                result = await session.execute(stmt)
+                inserted = result.all()
+                new_ids = [r.id for r in inserted]
+                if new_ids:
+                    # Завдання кластеризації комітяться атомарно з публікаціями
+                    await session.execute(cluster_jobs_insert(new_ids))
+            if watermarks:
+                await session.execute(
+                    text("""
+                        UPDATE channels AS c
+                        SET last_message_id = GREATEST(COALESCE(c.last_message_id, 0), w.max_id)
+                        FROM unnest(CAST(:channel_ids AS integer[]), CAST(:max_ids AS bigint[])) AS w(channel_id, max_id)
+                        WHERE c.id = w.channel_id
+                    """),
+                    {"channel_ids": list(watermarks.keys()), "max_ids": list(watermarks.values())}
+                )
+            await session.commit()
+        return inserted
+
+    async def _write_isolating(self, rows: list[dict]) -> list:
+        """Записує rows половинами; рядки, які БД відхиляє поодинці, логуються й відкидаються."""
+        try:
+            return await self._write(rows, {})
+        except (IntegrityError, DataError) as e:
+            if len(rows) == 1:
+                row = rows[0]
+                metrics.inc("publication_insert_rejected")
+                logger.error(
+                    f"💾 Публікацію {row['channel_id']}/{row['telegram_message_id']} відкинуто: "
+                    f"{e.__class__.__name__}: {e.orig}"
+                )
+                return []
+        middle = len(rows) // 2
+        return await self._write_isolating(rows[:middle]) + await self._write_isolating(rows[middle:])
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Помилка фонового скидання буфера публікацій: {e}")
+
+
+publication_writer = PublicationWriter()
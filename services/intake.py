@@ -0,0 +1,105 @@
+"""
+Pulse Update Intake — відокремлення прийому оновлень Telethon від їх обробки.
+Обробник подій лише кладе оновлення в обмежену чергу; N споживачів виконують
+handle_new_message. Черга розбита на партиції за chat_id (одна партиція — один
+споживач), тож повідомлення одного каналу обробляються строго по черзі.
+
+Політика перевантаження (INTAKE_OVERLOAD_POLICY):
+  pause_backfill — при заповненні черги понад 80% призупиняє сканування історії
+                   (backfill, догін і заповнення розривів — звільняє MTProto та БД
+                   для live-оновлень), а якщо партиція повна — чекає на місце
+                   (backpressure на цикл оновлень Telethon);
+  block          — лише чекає на місце в партиції;
+  drop           — відкидає оновлення й одразу планує заповнення розриву
+                   для його каналу.
+"""
+import asyncio
+import time
+from loguru import logger
+from config.settings import config
+from services.metrics import metrics
+
+# Частки заповнення черги для призупинення/відновлення сканування історії (гістерезис)
+HIGH_WATERMARK = 0.8
+LOW_WATERMARK = 0.2
+
+
+class UpdateIntake:
+    """Обмежена партиційована черга оновлень одного шарда з пулом споживачів."""
+
+    def __init__(self, monitor, consumers: int = None, maxsize: int = None, policy: str = None):
+        self.monitor = monitor
+        self.consumers = consumers or config.INTAKE_CONSUMERS
+        self.maxsize = maxsize or config.INTAKE_QUEUE_SIZE
+        self.policy = policy or config.INTAKE_OVERLOAD_POLICY
+        partition_size = max(1, self.maxsize // self.consumers)
+        self._queues: list[asyncio.Queue] = [asyncio.Queue(partition_size) for _ in range(self.consumers)]
+        self._tasks: list[asyncio.Task] = []
+        self._backfill_paused = False
+        metrics.register_gauge(f"intake_depth_{monitor.name}", lambda: self.depth)
+
+    @property
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._consume(q)) for q in self._queues]
+        logger.info(f"📥 [{self.monitor.name}] Update intake: {self.consumers} consumers, queue {self.maxsize}, policy={self.policy}")
+
+    async def stop(self):
+        """Зупиняє споживачів; необроблені оновлення підбере догін за водяними знаками."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self.depth:
+            logger.warning(f"📥 [{self.monitor.name}] {self.depth} оновлень залишилось у черзі при зупинці")
+
+    async def submit(self, event):
+        """Обробник NewMessage: ставить оновлення в партицію свого каналу."""
+        metrics.inc("intake_received")
+        queue = self._queues[hash(event.chat_id) % self.consumers]
+        item = (time.perf_counter(), event)
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.policy == "drop":
+                metrics.inc("intake_dropped")
+                logger.debug(f"📥 Черга оновлень переповнена, повідомлення {event.chat_id}/{event.message.id} відкинуто")
+                self.monitor.note_dropped(event.chat_id, event.message.id)
+                return
+            metrics.inc("intake_blocked")
+            await queue.put(item)
+        self._check_overload()
+
+    def _check_overload(self):
+        if self.policy != "pause_backfill":
+            return
+        fill = self.depth / self.maxsize
+        if not self._backfill_paused and fill >= HIGH_WATERMARK:
+            self._backfill_paused = True
+            logger.warning(f"📥 [{self.monitor.name}] Черга оновлень заповнена на {fill:.0%}, сканування історії призупинено")
+            self.monitor.pause_history()
+        elif self._backfill_paused and fill <= LOW_WATERMARK:
+            self._backfill_paused = False
+            self.monitor.resume_history()
+
+    async def _consume(self, queue: asyncio.Queue):
+        while True:
+            enqueued_at, event = await queue.get()
+            try:
+                metrics.observe("intake_queue_wait", time.perf_counter() - enqueued_at)
+                await self.monitor.handle_new_message(event)
+                metrics.inc("intake_processed")
+            except Exception as e:
+                logger.error(f"Помилка споживача оновлень: {e}")
+            finally:
+                queue.task_done()
+                if self._backfill_paused:
+                    self._check_overload()
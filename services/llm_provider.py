@@ -0,0 +1,307 @@
+"""
+Pulse LLM Provider — змінний бекенд для генерації тексту та ембедингів.
+services/ai_service.py звертається лише до llm.generate() / llm.embed(); який саме
+бекенд за ними стоїть, визначає LLM_PROVIDER:
+  gemini  — Google Gemini (google-genai), клієнт створюється при першому запиті;
+  openai  — OpenAI або будь-який OpenAI-сумісний сервер (OPENAI_BASE_URL);
+  mock    — локальний детермінований провайдер із затримкою та ін'єкцією помилок.
+LLM_CASSETTE_MODE=record зберігає відповіді реального провайдера в JSONL за хешем
+запиту, replay — відтворює їх без мережі (для бенчмарків на ізольованій машині).
+"""
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from config.settings import config
+from loguru import logger
+from services.embedding_batcher import FakeEmbeddingProvider
+
+
+# Промпти метаданих сюжетів (services/ai_service.py): пакетний — розділи "### Новина N"
+_STORY_ITEM_RE = re.compile(r"^### Новина (\d+)", re.MULTILINE)
+_STORY_BATCH_TAIL = "\n\nДля кожної новини:"
+_STORY_TEXT_RE = re.compile(r"Текст:\n(.*?)\n\nНеобхідні дані", re.DOTALL)
+
+
+def story_prompt_texts(prompt: str) -> list[tuple[int | None, str]] | None:
+    """
+    Тексти новин із промпту метаданих сюжетів: [(номер, текст), ...] для пакетного,
+    [(None, текст)] для одиничного; None — промпт іншого типу.
+    """
+    parts = _STORY_ITEM_RE.split(prompt.split(_STORY_BATCH_TAIL)[0])
+    if len(parts) > 1:
+        # [преамбула, номер1, текст1, номер2, текст2, ...]
+        return [(int(num), body.strip()) for num, body in zip(parts[1::2], parts[2::2])]
+    single = _STORY_TEXT_RE.search(prompt)
+    return [(None, single.group(1))] if single else None
+
+
+class LLMProvider(abc.ABC):
+    name = "base"
+    model: str
+    embedding_model: str
+
+    @abc.abstractmethod
+    async def generate(self, prompt: str, json_mode: bool = False, temperature: float | None = None,
+                       max_output_tokens: int | None = None) -> str:
+        ...
+
+    @abc.abstractmethod
+    async def embed(self, texts: list[str], dim: int) -> list[list[float] | None]:
+        """Ембединги для кластеризації, по одному на текст у тому ж порядку."""
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = None, embedding_model: str = None):
+        self.api_key = api_key
+        self.model = model or "gemini-2.0-flash"
+        self.embedding_model = embedding_model or "gemini-embedding-001"
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    async def generate(self, prompt, json_mode=False, temperature=None, max_output_tokens=None):
+        from google.genai import types
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json" if json_mode else None,
+                temperature=temperature,
+                max_output_tokens=max_output_tokens,
+            )
+        )
+        logger.debug(f"Gemini usage: {response.usage_metadata}")
+        return response.text
+
+    async def embed(self, texts, dim):
+        from google.genai import types
+        result = await self.client.aio.models.embed_content(
+            model=self.embedding_model,
+            contents=texts,
+            config=types.EmbedContentConfig(
+                task_type="CLUSTERING",
+                output_dimensionality=dim,
+            ),
+        )
+        return [list(e.values) if e.values else None for e in result.embeddings or []]
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: str | None, base_url: str = None, model: str = None, embedding_model: str = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model or "gpt-4o-mini"
+        self.embedding_model = embedding_model or "text-embedding-3-small"
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+            # Локальні OpenAI-сумісні сервери зазвичай не перевіряють ключ
+            self._client = AsyncOpenAI(api_key=self.api_key or "not-needed", base_url=self.base_url)
+        return self._client
+
+    async def generate(self, prompt, json_mode=False, temperature=None, max_output_tokens=None):
+        kwargs = {}
+        if json_mode:
+            # json_object вимагає об'єкт верхнього рівня; масив модель загорне в {"items": [...]}
+            kwargs["response_format"] = {"type": "json_object"}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if max_output_tokens is not None:
+            kwargs["max_tokens"] = max_output_tokens
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs,
+        )
+        logger.debug(f"OpenAI usage: {response.usage}")
+        return response.choices[0].message.content or ""
+
+    async def embed(self, texts, dim):
+        response = await self.client.embeddings.create(model=self.embedding_model, input=texts, dimensions=dim)
+        return [list(item.embedding) for item in sorted(response.data, key=lambda d: d.index)]
+
+
+class MockProviderError(RuntimeError):
+    pass
+
+
+class MockProvider(LLMProvider):
+    """
+    Детерміновані відповіді без мережі. JSON-запити отримують метадані сюжету
+    (масив — для пакетного промпту з розділами "### Новина N"), решта — текст-заглушку.
+    """
+    name = "mock"
+    _CATEGORIES = ("Політика", "Війна", "Суспільство", "Економіка", "Світ", "Технології", "Спорт", "Кримінал", "Культура")
+
+    def __init__(self, latency: float = None, failure_rate: float = None, seed: int = 0):
+        self.model = "mock"
+        self.embedding_model = "mock-embedding"
+        self.latency = config.MOCK_LLM_LATENCY if latency is None else latency
+        self.failure_rate = config.MOCK_LLM_FAILURE_RATE if failure_rate is None else failure_rate
+        self._rng = random.Random(seed)
+        self._embedder = FakeEmbeddingProvider(latency=0, per_item=0, max_inflight=1 << 30)
+        self.calls = 0
+
+    async def _request(self):
+        self.calls += 1
+        # ±50% розкиду затримки — щоб хвости розподілу були схожі на справжні
+        await asyncio.sleep(self.latency * self._rng.uniform(0.5, 1.5))
+        if self._rng.random() < self.failure_rate:
+            raise MockProviderError("injected failure")
+
+    def _story(self, text: str, item_id: int = None) -> dict:
+        digest = hashlib.blake2b(text.encode(), digest_size=4).digest()
+        words = " ".join(text.split()[:8]) or "Подія"
+        story = {"title": words, "summary": text[:200], "category": self._CATEGORIES[digest[0] % len(self._CATEGORIES)]}
+        return {"id": item_id, **story} if item_id is not None else story
+
+    async def generate(self, prompt, json_mode=False, temperature=None, max_output_tokens=None):
+        await self._request()
+        if not json_mode:
+            return f"Mock response {hashlib.blake2b(prompt.encode(), digest_size=4).hexdigest()}"
+        texts = story_prompt_texts(prompt)
+        if texts and texts[0][0] is not None:
+            return json.dumps([self._story(text, num) for num, text in texts], ensure_ascii=False)
+        return json.dumps(self._story(texts[0][1] if texts else prompt), ensure_ascii=False)
+
+    async def embed(self, texts, dim):
+        await self._request()
+        self._embedder.dim = dim
+        return await self._embedder.embed_many(texts)
+
+
+class CassetteMiss(KeyError):
+    pass
+
+
+class CassetteProvider(LLMProvider):
+    """
+    Запис/відтворення відповідей іншого провайдера. Ключ — sha256 від типу запиту,
+    моделі, параметрів і тексту; ембединги зберігаються по одному тексту, тож склад
+    пакетів при відтворенні не має значення. Метадані сюжетів додатково записуються
+    по одній новині: промпт, якого немає в записі (інший склад пакета або одиничний
+    запит замість пакетного), збирається з них; якщо бракує хоч однієї — CassetteMiss.
+    """
+
+    def __init__(self, inner: LLMProvider, path: str, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.inner = inner
+        self.path = path
+        self.mode = mode
+        self.name = f"{inner.name}+{mode}"
+        self.model = inner.model
+        self.embedding_model = inner.embedding_model
+        self._entries: dict[str, object] = {}
+        self.misses = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry["response"]
+        logger.info(f"🎞 LLM cassette {mode}: {path} ({len(self._entries)} responses)")
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode()).hexdigest()
+
+    def _record(self, key: str, response):
+        self._entries[key] = response
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "response": response}, ensure_ascii=False) + "\n")
+
+    async def generate(self, prompt, json_mode=False, temperature=None, max_output_tokens=None):
+        key = self.key("generate", self.model, json_mode, temperature, max_output_tokens, prompt)
+        if key in self._entries:
+            return self._entries[key]
+        texts = story_prompt_texts(prompt) if json_mode else None
+        if self.mode == "replay":
+            if texts:
+                return self._replay_stories(texts)
+            self.misses += 1
+            raise CassetteMiss(f"no recorded response for prompt {key[:12]}")
+        response = await self.inner.generate(prompt, json_mode, temperature, max_output_tokens)
+        self._record(key, response)
+        if texts:
+            self._record_stories(texts, response)
+        return response
+
+    def _record_stories(self, texts: list[tuple[int | None, str]], response: str):
+        try:
+            parsed = json.loads(response)
+        except ValueError:
+            return
+        if isinstance(parsed, dict) and texts[0][0] is not None:
+            parsed = next((v for v in parsed.values() if isinstance(v, list)), [])
+        items = parsed if isinstance(parsed, list) else [parsed]
+        by_num = dict(texts)
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            num = item.get("id") if texts[0][0] is not None else None
+            text = by_num.get(num) if num is not None else (texts[position][1] if len(items) == len(texts) else None)
+            if text is not None:
+                story = {k: item[k] for k in ("title", "summary", "category") if k in item}
+                self._record(self.key("story", self.model, text), story)
+
+    def _replay_stories(self, texts: list[tuple[int | None, str]]) -> str:
+        stories = [self._entries.get(self.key("story", self.model, text)) for _, text in texts]
+        if any(story is None for story in stories):
+            missing = sum(story is None for story in stories)
+            self.misses += 1
+            raise CassetteMiss(f"no recorded story metadata for {missing} of {len(texts)} texts")
+        if texts[0][0] is None:
+            return json.dumps(stories[0], ensure_ascii=False)
+        return json.dumps([{"id": num, **story} for (num, _), story in zip(texts, stories)], ensure_ascii=False)
+
+    async def embed(self, texts, dim):
+        keys = [self.key("embed", self.embedding_model, dim, text) for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in self._entries]
+        if missing:
+            if self.mode == "replay":
+                self.misses += 1
+                raise CassetteMiss(f"no recorded embeddings for {len(missing)} texts")
+            vectors = await self.inner.embed([texts[i] for i in missing], dim)
+            fresh = dict(zip(missing, vectors))
+            for i, vector in fresh.items():
+                if vector is not None:
+                    self._record(keys[i], vector)
+            return [fresh[i] if i in fresh else self._entries[key] for i, key in enumerate(keys)]
+        return [self._entries[key] for key in keys]
+
+
+def create_provider(name: str = None, cassette_mode: str = None) -> LLMProvider:
+    name = (name or config.LLM_PROVIDER).lower()
+    if name == "gemini":
+        if not config.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY is required for LLM_PROVIDER=gemini")
+        provider = GeminiProvider(config.GEMINI_API_KEY, config.LLM_MODEL, config.LLM_EMBEDDING_MODEL)
+    elif name == "openai":
+        provider = OpenAIProvider(config.OPENAI_API_KEY, config.OPENAI_BASE_URL, config.LLM_MODEL,
+                                  config.LLM_EMBEDDING_MODEL)
+    elif name == "mock":
+        provider = MockProvider()
+    else:
+        raise ValueError(f"Unknown LLM provider: {name}")
+    mode = cassette_mode or config.LLM_CASSETTE_MODE
+    if mode:
+        provider = CassetteProvider(provider, config.LLM_CASSETTE_PATH, mode)
+    return provider
@@ -0,0 +1,196 @@
+"""
+Pulse Local Classifier — локальна (CPU, без мережі) класифікація категорії публікації.
+Текстова модель: hashing-векторизатор (уніграми + біграми нормалізованого тексту,
+crc32 → N_FEATURES ознак, log-TF, L2) і лінійна softmax-регресія, навчена офлайн
+на publications.category (tools/train_category_model.py).
+Апріорний розподіл каналу: категорії його публікацій від LLM (publications.category_source;
+власні рішення класифікатора й категорії за замовчуванням не враховуються, щоб модель
+не підсилювала сама себе) з додатковим згладжуванням.
+Підсумок ∝ p(категорія | текст) · p(категорія | канал)^PRIOR_WEIGHT; якщо впевненість
+не нижча за LOCAL_CLASSIFIER_THRESHOLD — категорія повертається без виклику LLM.
+"""
+import asyncio
+import os
+import time
+import zlib
+import numpy as np
+from loguru import logger
+from config.settings import config
+from services.fingerprint import normalize_text
+
+N_FEATURES = 2 ** 18
+# Згладжування апріорного розподілу каналу (псевдо-публікацій на категорію)
+PRIOR_ALPHA = 1.0
+
+
+def featurize(text: str, n_features: int = N_FEATURES) -> tuple[np.ndarray, np.ndarray]:
+    """Розріджений вектор тексту: (індекси ознак, ваги) з L2-нормою 1."""
+    tokens = normalize_text(text or "").split()
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not grams:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    hashed = np.fromiter((zlib.crc32(g.encode()) % n_features for g in grams), dtype=np.int64, count=len(grams))
+    indices, counts = np.unique(hashed, return_counts=True)
+    values = np.log1p(counts).astype(np.float32)
+    return indices, values / np.linalg.norm(values)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class LinearTextModel:
+    """Мультиноміальна логістична регресія над hashing-ознаками."""
+
+    def __init__(self, classes: list[str], n_features: int = N_FEATURES):
+        self.classes = list(classes)
+        self.n_features = n_features
+        self.weights = np.zeros((n_features, len(classes)), dtype=np.float32)
+        self.bias = np.zeros(len(classes), dtype=np.float32)
+
+    def _logits(self, batch: list[tuple[np.ndarray, np.ndarray]]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        rows = np.concatenate([np.full(len(idx), i, dtype=np.int64) for i, (idx, _) in enumerate(batch)])
+        cols = np.concatenate([idx for idx, _ in batch])
+        vals = np.concatenate([v for _, v in batch])
+        logits = np.tile(self.bias, (len(batch), 1))
+        np.add.at(logits, rows, self.weights[cols] * vals[:, None])
+        return logits, rows, cols, vals
+
+    def predict_proba(self, features: list[tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+        return _softmax(self._logits(features)[0])
+
+    def fit(self, features: list[tuple[np.ndarray, np.ndarray]], labels: np.ndarray, epochs: int = 8,
+            lr: float = 5.0, l2: float = 1e-6, batch_size: int = 256, seed: int = 0):
+        """Міні-пакетний SGD з крос-ентропією; labels — індекси в self.classes."""
+        rng = np.random.default_rng(seed)
+        for epoch in range(epochs):
+            order = rng.permutation(len(features))
+            loss = 0.0
+            for start in range(0, len(order), batch_size):
+                picked = order[start:start + batch_size]
+                batch = [features[i] for i in picked]
+                y = labels[picked]
+                logits, rows, cols, vals = self._logits(batch)
+                probs = _softmax(logits)
+                loss -= float(np.log(probs[np.arange(len(y)), y] + 1e-9).sum())
+                grad = probs
+                grad[np.arange(len(y)), y] -= 1.0
+                grad /= len(y)
+                np.add.at(self.weights, cols, -lr * (vals[:, None] * grad[rows] + l2 * self.weights[cols]))
+                self.bias -= lr * grad.sum(axis=0)
+            logger.info(f"epoch {epoch + 1}/{epochs}: loss {loss / max(len(features), 1):.4f}")
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Більшість рядків матриці нульові (невживані хеші) — зберігаємо лише ненульові
+        used = np.flatnonzero(np.abs(self.weights).sum(axis=1))
+        np.savez_compressed(path, classes=np.array(self.classes), n_features=self.n_features,
+                            rows=used, weights=self.weights[used].astype(np.float16), bias=self.bias)
+
+    @classmethod
+    def load(cls, path: str) -> "LinearTextModel":
+        data = np.load(path, allow_pickle=False)
+        model = cls([str(c) for c in data["classes"]], int(data["n_features"]))
+        model.weights[data["rows"]] = data["weights"].astype(np.float32)
+        model.bias = data["bias"].astype(np.float32)
+        return model
+
+
+def llm_labelled(model):
+    """Умова SQL: категорію визначив LLM (NULL — записи до появи category_source)."""
+    from sqlalchemy import func
+    return func.coalesce(model.category_source, "llm") == "llm"
+
+
+def channel_prior(counts: dict[str, int], classes: list[str]) -> np.ndarray:
+    """Згладжений розподіл категорій каналу (мітка -> кількість публікацій)."""
+    values = np.array([counts.get(c, 0) for c in classes], dtype=np.float32) + PRIOR_ALPHA
+    return values / values.sum()
+
+
+def combine(text_proba: np.ndarray, prior: np.ndarray | None, prior_weight: float) -> np.ndarray:
+    if prior is None or prior_weight <= 0:
+        return text_proba
+    scores = np.log(text_proba + 1e-9) + prior_weight * np.log(prior)
+    return _softmax(scores)
+
+
+class LocalCategoryClassifier:
+    def __init__(self, path: str = None, threshold: float = None, prior_weight: float = None):
+        self.path = path or config.LOCAL_CLASSIFIER_PATH
+        self.threshold = threshold if threshold is not None else config.LOCAL_CLASSIFIER_THRESHOLD
+        self.prior_weight = prior_weight if prior_weight is not None else config.LOCAL_CLASSIFIER_PRIOR_WEIGHT
+        self.model: LinearTextModel | None = None
+        self._loaded = False
+        # channel_id -> {мітка категорії: кількість публікацій з категорією від LLM}
+        self._channel_counts: dict[int, dict[str, int]] = {}
+        self._prior_loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _load_model(self):
+        self._loaded = True
+        if not os.path.exists(self.path):
+            logger.info(f"🏷 Local classifier: {self.path} not found, LLM categorisation only")
+            return
+        try:
+            self.model = LinearTextModel.load(self.path)
+            logger.info(f"🏷 Local classifier: {len(self.model.classes)} categories from {self.path}")
+        except Exception as e:
+            logger.error(f"Local classifier load error: {e}")
+
+    async def _refresh_prior(self):
+        if time.monotonic() - self._prior_loaded_at < config.LOCAL_CLASSIFIER_PRIOR_REFRESH:
+            return
+        async with self._lock:
+            if time.monotonic() - self._prior_loaded_at < config.LOCAL_CLASSIFIER_PRIOR_REFRESH:
+                return
+            from sqlalchemy import func, select
+            from database.connection import AsyncSessionLocal
+            from database.models import Publication
+
+            counts: dict[int, dict[str, int]] = {}
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        select(Publication.channel_id, Publication.category, func.count(Publication.id))
+                        .where(Publication.channel_id.isnot(None), Publication.category.isnot(None),
+                               llm_labelled(Publication))
+                        .group_by(Publication.channel_id, Publication.category)
+                    )
+                    for channel_id, category, posts in result.all():
+                        counts.setdefault(channel_id, {})[category] = posts
+                self._channel_counts = counts
+            except Exception as e:
+                logger.error(f"Local classifier prior refresh error: {e}")
+            self._prior_loaded_at = time.monotonic()
+
+    async def predict(self, text: str, channel_id: int | None = None) -> tuple[str, float] | None:
+        """(мітка категорії, впевненість) або None, якщо моделі немає."""
+        if not config.LOCAL_CLASSIFIER_ENABLED:
+            return None
+        if not self._loaded:
+            self._load_model()
+        if self.model is None or not text:
+            return None
+        proba = self.model.predict_proba([featurize(text, self.model.n_features)])[0]
+        prior = None
+        if channel_id is not None:
+            await self._refresh_prior()
+            counts = self._channel_counts.get(channel_id)
+            if counts:
+                prior = channel_prior(counts, self.model.classes)
+        proba = combine(proba, prior, self.prior_weight)
+        best = int(np.argmax(proba))
+        return self.model.classes[best], float(proba[best])
+
+    async def classify(self, text: str, channel_id: int | None = None) -> str | None:
+        """Категорія, якщо локальна впевненість не нижча за поріг; інакше None (потрібен LLM)."""
+        prediction = await self.predict(text, channel_id)
+        if prediction and prediction[1] >= self.threshold:
+            return prediction[0]
+        return None
+
+
+local_classifier = LocalCategoryClassifier()
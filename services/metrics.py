@@ -0,0 +1,230 @@
+"""
+Pulse Metrics — гістограми тривалості етапів інжесту, лічильники та gauge-метрики.
+Показує, який етап (get_chat → is_ad → INSERT → кластеризація → LLM → commit)
+домінує під навантаженням, і наскрізну затримку від дати повідомлення до сюжету.
+Дані виводяться періодичним дампом у лог та (якщо задано METRICS_PORT)
+локальним HTTP-ендпоінтом у форматі Prometheus text (/metrics) або JSON (/metrics.json).
+"""
+import asyncio
+import json
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable
+from loguru import logger
+from config.settings import config
+
+# Межі кошиків гістограми (секунди): від 1 мс до 1 години
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600,
+)
+
+# Скільки live-публікацій максимум чекають на вимір наскрізної затримки
+MAX_PENDING_LAG = 10000
+
+
+class Histogram:
+    """Гістограма з фіксованими кошиками (кумулятивні лічильники рахуються при експорті)."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Оцінка квантиля як верхня межа кошика, в який він потрапляє (не більше max)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 4),
+        }
+
+
+class _Timer:
+    """Контекстний менеджер для `with metrics.timer("stage"):` (працює і в async-коді)."""
+    __slots__ = ("_registry", "_name", "_started")
+
+    def __init__(self, registry: "MetricsRegistry", name: str):
+        self._registry = registry
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._registry.observe(self._name, time.perf_counter() - self._started)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self._gauges: dict[str, Callable[[], float]] = {}
+        # publication_id -> published_at для live-повідомлень, що ще не потрапили в сюжет
+        self._pending_lag: OrderedDict[int, datetime] = OrderedDict()
+        self._task: asyncio.Task | None = None
+        self._server: asyncio.AbstractServer | None = None
+
+    # --- Запис ---
+
+    def observe(self, name: str, seconds: float):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+        hist.observe(seconds)
+
+    def timer(self, name: str) -> _Timer:
+        return _Timer(self, name)
+
+    def inc(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def register_gauge(self, name: str, func: Callable[[], float]):
+        """Реєструє функцію, значення якої зчитується в момент експорту."""
+        self._gauges[name] = func
+
+    def observe_lag(self, name: str, published_at: datetime):
+        """Записує затримку від дати повідомлення в Telegram до поточного моменту."""
+        self.observe(name, max(0.0, (datetime.now(timezone.utc) - published_at).total_seconds()))
+
+    def track_publication(self, publication_id: int, published_at: datetime):
+        """Запам'ятовує live-публікацію, щоб виміряти наскрізну затримку після створення сюжету."""
+        self._pending_lag[publication_id] = published_at
+        if len(self._pending_lag) > MAX_PENDING_LAG:
+            self._pending_lag.popitem(last=False)
+            self.inc("lag_tracking_dropped")
+
+    def publication_done(self, publication_id: int):
+        """Фіксує наскрізну затримку (повідомлення → сюжет), якщо публікація відстежувалась."""
+        published_at = self._pending_lag.pop(publication_id, None)
+        if published_at is not None:
+            self.observe_lag("e2e_lag_story", published_at)
+
+    # --- Експорт ---
+
+    def _gauge_values(self) -> dict[str, float]:
+        values = {"pending_lag_publications": len(self._pending_lag)}
+        for name, func in self._gauges.items():
+            try:
+                values[name] = func()
+            except Exception as e:
+                logger.debug(f"Gauge {name} failed: {e}")
+        return values
+
+    def snapshot(self) -> dict:
+        return {
+            "histograms": {name: h.summary() for name, h in sorted(self.histograms.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": self._gauge_values(),
+        }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for name, hist in sorted(self.histograms.items()):
+            metric = f"pulse_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {hist.count}')
+            lines.append(f"{metric}_sum {hist.sum}")
+            lines.append(f"{metric}_count {hist.count}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE pulse_{name}_total counter")
+            lines.append(f"pulse_{name}_total {value}")
+        for name, value in sorted(self._gauge_values().items()):
+            lines.append(f"# TYPE pulse_{name} gauge")
+            lines.append(f"pulse_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self):
+        snap = self.snapshot()
+        if not snap["histograms"]:
+            return
+        stages = ", ".join(
+            f"{name} p50={h['p50']}s p95={h['p95']}s n={h['count']}"
+            for name, h in snap["histograms"].items()
+        )
+        counters = ", ".join(f"{k}={v}" for k, v in snap["counters"].items())
+        gauges = ", ".join(f"{k}={v}" for k, v in snap["gauges"].items())
+        logger.info(f"📈 Metrics: {stages} | {counters} | {gauges}")
+
+    # --- Фонові задачі ---
+
+    async def start(self):
+        """Запускає періодичний дамп і, якщо задано METRICS_PORT, HTTP-ендпоінт."""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._dump_loop())
+        if config.METRICS_PORT:
+            self._server = await asyncio.start_server(self._handle_http, "127.0.0.1", config.METRICS_PORT)
+            logger.info(f"📈 Metrics endpoint: http://127.0.0.1:{config.METRICS_PORT}/metrics")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.log_summary()
+
+    async def _dump_loop(self):
+        while True:
+            await asyncio.sleep(config.METRICS_DUMP_INTERVAL)
+            self.log_summary()
+
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            path = request_line.decode(errors="ignore").split(" ")[1] if request_line else "/"
+            if path.startswith("/metrics.json"):
+                body, content_type = json.dumps(self.snapshot(), default=str), "application/json"
+            else:
+                body, content_type = self.render_prometheus(), "text/plain; version=0.0.4"
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+
+metrics = MetricsRegistry()
@@ -1,23 +1,43 @@
-from telethon import TelegramClient, events
+from telethon import events
 from telethon.tl.types import Channel as TelethonChannel
-from telethon.errors import FloodWaitError
+from telethon.errors import FloodWaitError, ChannelsTooMuchError
 from loguru import logger
 from config.settings import config
 from database.connection import AsyncSessionLocal
-from database.models import Channel, Publication
-from sqlalchemy import select, update
-from sqlalchemy.exc import IntegrityError
+from database.models import Channel
+from services.ingest import publication_writer
+from services.cluster_queue import cluster_queue
+from services.metrics import metrics
+from services.ad_filter import ad_filter
+from services.telegram_governor import GovernedTelegramClient, MTProtoGovernor, Priority
+from services.engagement import EngagementRefresher
+from services.intake import UpdateIntake
+from services.entity_cache import EntityCache
+from services.fingerprint import content_hash
+from services.backfill import BackfillScheduler, PRIORITY_CORE, PRIORITY_DEFAULT, PRIORITY_USER_ADDED
+from sqlalchemy import select, update, func
 import asyncio
+import time
 from datetime import datetime, timedelta, timezone
 
 import os
 
 from telethon.sessions import StringSession
 
+# Завдання кластеризації записуються разом з публікаціями; слухач лише будить воркерів черги
+publication_writer.add_listener(cluster_queue.notify)
+metrics.register_gauge("ingest_buffer", lambda: publication_writer.pending)
+
+
 class ChannelMonitor:
-    def __init__(self):
+    def __init__(self, session=None, name: str = "shard0"):
+        # Назва шарда (акаунта) у пулі моніторів; пул призначає канали шардам
+        self.name = name
+        self.pool = None
         # Використовуємо StringSession для хмари (якщо є) або локальний файл
-        if config.TELETHON_SESSION:
+        if session is not None:
+            logger.info(f"✅ [{name}] Using StringSession")
+        elif config.TELETHON_SESSION:
             session = StringSession(config.TELETHON_SESSION)
             logger.info("✅ Using StringSession (Cloud Optimized)")
         else:
@@ -27,11 +47,23 @@ class ChannelMonitor:
             session = session_path
             logger.info(f"Using SQLiteSession at {session_path}")
         
-        self.client = TelegramClient(
+        # У викликах через governor FloodWait не "пересипається" всередині Telethon — ним керує governor;
+        # поза ним (обробники, інструменти, внутрішні запити) діє стандартний поріг Telethon
+        self.client = GovernedTelegramClient(
             session, 
             config.API_ID, 
-            config.API_HASH.strip()
+            config.API_HASH.strip(),
         )
+        # Усі виклики Telethon йдуть через governor (ліміти, пріоритети, метрики FloodWait)
+        self.governor = MTProtoGovernor(name)
+        # Обмежена пріоритетна черга сканування історії
+        self.backfill = BackfillScheduler(self)
+        # Персистентний кеш сутностей (access_hash, участь у каналі) для швидкого холодного старту
+        self.entities = EntityCache(name)
+        # Черга прийому оновлень: обробник Telethon не виконує конвеєр inline
+        self.intake = UpdateIntake(self)
+        # Періодичне оновлення переглядів/реакцій для ранжування джерел
+        self.engagement = EngagementRefresher(self)
         # Cache: telegram_id -> database_id
         self.active_channels: dict[int, int] = {}
         self.username_to_id: dict[str, int] = {}
@@ -39,9 +71,32 @@ class ChannelMonitor:
         self.chat_title_cache: dict[int, str] = {}
         # Cache: telegram chat_id -> username (для URL)
         self.chat_username_cache: dict[int, str] = {}
-        # Лічильник FloodWait інцидентів
-        self.flood_wait_count: int = 0
-        self.last_flood_wait: datetime | None = None
+        # Cache: database channel_id -> category (для контекстних винятків фільтра реклами)
+        self.channel_categories: dict[int, str | None] = {}
+        self.ad_filter = ad_filter
+        # Стан інкрементального оновлення: database channel_id -> (telegram_id, username)
+        self._tracked: dict[int, tuple[int, str]] = {}
+        # Канали, до яких клієнт уже приєднався (щоб не повторювати JoinChannelRequest)
+        self.joined_channel_ids: set[int] = set()
+        self._change_stamp: tuple | None = None
+        self._last_full_resync: datetime | None = None
+        # Водяні знаки: database channel_id -> найбільший telegram_message_id, уже збережений у БД
+        # (просуваються лише після коміту запису; від них рахуються догін і заповнення розривів)
+        self.last_message_ids: dict[int, int] = {}
+        # Найбільший побачений telegram_message_id (ще може чекати в буфері запису) — для виявлення розривів
+        self._seen_message_ids: dict[int, int] = {}
+        # Канали, для яких зараз виконується заповнення розриву
+        self._gap_fills: set[int] = set()
+        # Розриви, виявлені під час уже запущеного заповнення: channel_id -> (min_id, max_id)
+        self._pending_gaps: dict[int, tuple[int, int]] = {}
+        # Скинуте, коли черга оновлень перевантажена: догін і заповнення розривів чекають
+        self._history_resumed = asyncio.Event()
+        self._history_resumed.set()
+        self._needs_catch_up: bool = True
+        self._catching_up: bool = False
+        # Спільний буфер запису публікацій (live + сканування історії, всі шарди)
+        self.writer = publication_writer
+        self.writer.add_watermark_listener(self._on_watermarks_saved)
 
     async def start(self):
         logger.info("Starting Telethon Client (Event-Driven)...")
@@ -49,32 +104,196 @@ class ChannelMonitor:
             await self.client.start(phone=config.PHONE_NUMBER)
         except FloodWaitError as e:
             logger.warning(f"⏳ FloodWait при старті Telethon: очікування {e.seconds}с...")
-            self.flood_wait_count += 1
-            self.last_flood_wait = datetime.now()
+            self.governor.report_flood_wait("start", e.seconds)
             await asyncio.sleep(e.seconds)
             await self.client.start(phone=config.PHONE_NUMBER)
         
+        await self.writer.start()
+        await self.backfill.start()
+        await self.engagement.start()
+
+        # Прогрів з кешу сутностей, потім знімок діалогів: join лише тих каналів, де акаунта ще немає
+        await self._warm_up()
+        await self._sync_dialogs()
+
         # Initial fetch
         await self.refresh_channels()
         
-        # Register Handler
-        self.client.add_event_handler(self.handle_new_message, events.NewMessage(incoming=True))
+        # Register Handler (оновлення йдуть у чергу, обробляють споживачі intake)
+        self.intake.start()
+        self.client.add_event_handler(self.intake.submit, events.NewMessage(incoming=True))
         logger.info("Telethon Client started & Event Handler registered!")
 
-    async def refresh_channels(self):
-        """Оновлює локальний кеш активних каналів з БД та лікує 'сиріт'."""
+        # Догін повідомлень, пропущених поки воркер був вимкнений
+        self._needs_catch_up = False
+        asyncio.create_task(self.catch_up_channels())
+
+    async def _warm_up(self):
+        """Відновлює стан участі в каналах з персистентного кешу сутностей."""
+        try:
+            entries = await self.entities.load()
+        except Exception as e:
+            logger.warning(f"Не вдалося завантажити кеш сутностей: {e}")
+            return
+        joined = {ch_id for ch_id, entry in entries.items() if entry.joined}
+        self.joined_channel_ids |= joined
+        logger.info(f"♨️ [{self.name}] Кеш сутностей: {len(entries)} каналів, {len(joined)} уже приєднано")
+
+    @staticmethod
+    def _bare_id(telegram_id: int) -> int:
+        """telegram_id без префікса -100 (так само, як Channel.id у Telethon)."""
+        str_id = str(telegram_id)
+        return int(str_id[4:]) if str_id.startswith("-100") else abs(telegram_id)
+
+    async def _sync_dialogs(self):
+        """
+        Один прохід по діалогах акаунта (сторінками через governor) і порівняння з каталогом:
+        канали, де акаунт уже є, позначаються приєднаними (refresh_channels не робитиме для них join),
+        а неактивні канали каталогу без підписок, з яких акаунт не вийшов, покидаються пакетами.
+        """
+        from database.models import UserSubscription
+        started = time.perf_counter()
+        member: dict[int, TelethonChannel] = {}
+        try:
+            async for dialog in self.governor.iter_dialogs(self.client):
+                if isinstance(dialog.entity, TelethonChannel):
+                    member[dialog.entity.id] = dialog.entity
+        except Exception as e:
+            logger.warning(f"[{self.name}] Знімок діалогів не вдався, використовуємо кеш сутностей: {e}")
+            return
+
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                select(Channel.id, Channel.telegram_id, Channel.is_active, Channel.shard)
+            )).all()
+            subscribed = set((await session.execute(select(UserSubscription.channel_id).distinct())).scalars().all())
+        if self.pool:
+            self.pool.load_assignments((ch_id, shard) for ch_id, _, _, shard in rows if shard)
+
+        joined: set[int] = set()
+        to_leave: list[tuple[int, int]] = []
+        # Канали, де акаунт уже є, але закріплення в channels.shard ще немає (до міграції)
+        to_assign: list[int] = []
+        for ch_id, telegram_id, is_active, shard in rows:
+            entity = member.get(self._bare_id(telegram_id))
+            if entity is None:
+                self.entities.remember(ch_id, joined=False)
+                continue
+            self.entities.remember(ch_id, entity, joined=True)
+            if is_active:
+                joined.add(ch_id)
+                if self.pool and shard is None and self.pool.stable_owner(ch_id) == self.name:
+                    to_assign.append(ch_id)
+            elif ch_id not in subscribed:
+                # Неактивний канал без підписок покидає кожен акаунт, що в ньому є (не лише власник)
+                to_leave.append((ch_id, telegram_id))
+        if to_assign:
+            await self.pool.assign(to_assign, self.name)
+
+        self.joined_channel_ids = joined
+        logger.info(
+            f"📇 [{self.name}] Знімок діалогів: {len(member)} каналів, з каталогу вже приєднано {len(joined)}, "
+            f"до виходу {len(to_leave)} ({time.perf_counter() - started:.1f}с)"
+        )
+        await self._leave_many(to_leave)
+        await self.entities.flush()
+
+    async def _join_many(self, channels: list[Channel]):
+        """Приєднується до каналів з обмеженою паралельністю (темп стримує governor)."""
+        semaphore = asyncio.Semaphore(config.JOIN_CONCURRENCY)
+
+        async def join(ch: Channel):
+            async with semaphore:
+                identifier = self.entities.input_peer(ch.id) or ch.username or ch.telegram_id
+                if identifier and await self.join_channel(identifier, ch.id):
+                    self.joined_channel_ids.add(ch.id)
+
+        await asyncio.gather(*(join(ch) for ch in channels))
+
+    async def _leave_many(self, channels: list[tuple[int, int | str | None]]):
+        """
+        Виходить з каналів (channel_id, username/telegram_id) пакетами по LEAVE_BATCH_SIZE,
+        у межах пакета — паралельно. Канали, де акаунта вже немає за кешем сутностей, пропускаються.
+        """
+        semaphore = asyncio.Semaphore(config.JOIN_CONCURRENCY)
+
+        async def leave(ch_id: int, fallback):
+            async with semaphore:
+                entry = self.entities.entries.get(ch_id)
+                if entry is None or entry.joined:
+                    identifier = self.entities.input_peer(ch_id) or fallback
+                    if identifier:
+                        await self.leave_channel(identifier)
+                self.joined_channel_ids.discard(ch_id)
+                self.entities.remember(ch_id, joined=False)
+
+        for i in range(0, len(channels), config.LEAVE_BATCH_SIZE):
+            await asyncio.gather(*(leave(ch_id, fb) for ch_id, fb in channels[i:i + config.LEAVE_BATCH_SIZE]))
+        if channels and self.pool:
+            self.pool.mark_has_room(self.name)
+
+    async def _load_change_stamp(self, session) -> tuple:
+        """
+        Дешевий "водяний знак" змін: агрегати по підписках та активних каналах.
+        Будь-яке додавання/видалення підписки чи каналу змінює хоча б одне значення.
+        """
+        from database.models import UserSubscription
+        subs_res = await session.execute(
+            select(
+                func.count(UserSubscription.id),
+                func.max(UserSubscription.last_changed_at),
+                func.max(UserSubscription.created_at),
+            )
+        )
+        channels_res = await session.execute(
+            select(func.count(Channel.id), func.max(Channel.created_at)).where(Channel.is_active == True)
+        )
+        return tuple(subs_res.one()) + tuple(channels_res.one())
+
+    async def refresh_channels(self, force: bool = False):
+        """
+        Оновлює локальний кеш активних каналів з БД та лікує 'сиріт'.
+        Працює інкрементально: якщо водяний знак змін не зрушив — нічого не робить,
+        інакше застосовує лише дельту (нові канали — join/scan, зниклі — прибрати з кешу).
+        Раз на CHANNEL_FULL_RESYNC_INTERVAL виконується повна звірка (категорії, username, невдалі join).
+        """
         try:
             from database.models import UserSubscription
+            now = datetime.now(timezone.utc)
+            full_resync = force or self._last_full_resync is None or (
+                (now - self._last_full_resync).total_seconds() >= config.CHANNEL_FULL_RESYNC_INTERVAL
+            )
+
             async with AsyncSessionLocal() as session:
-                # 1. Канали, які ПОТРІБНО моніторити (активні + є підписки)
+                stamp = await self._load_change_stamp(session)
+                if stamp == self._change_stamp and not full_resync:
+                    return
+
+                # Закріплення каналів за шардами (могли змінитися в іншому процесі)
+                if self.pool and full_resync:
+                    self.pool.load_assignments((await session.execute(
+                        select(Channel.id, Channel.shard).where(Channel.shard.isnot(None))
+                    )).all())
+
+                # 1. ID каналів, які ПОТРІБНО моніторити (активні + є підписки)
                 active_query = (
-                    select(Channel)
+                    select(Channel.id)
                     .join(UserSubscription, Channel.id == UserSubscription.channel_id)
                     .where(Channel.is_active == True)
                     .distinct()
                 )
-                result = await session.execute(active_query)
-                channels = result.scalars().all()
+                active_ids = {
+                    ch_id for ch_id in (await session.execute(active_query)).scalars().all()
+                    if self.owns(ch_id)
+                }
+
+                added_ids = active_ids if full_resync else active_ids - self._tracked.keys()
+                removed_ids = self._tracked.keys() - active_ids
+
+                channels = []
+                if added_ids:
+                    result = await session.execute(select(Channel).where(Channel.id.in_(added_ids)))
+                    channels = result.scalars().all()
                 
                 # 2. Пошук 'сиріт' (активні, але немає підписок і не ядро)
                 orphans_query = (
@@ -83,48 +302,84 @@ class ChannelMonitor:
                     .where(Channel.is_active == True, UserSubscription.id == None, Channel.is_core == False)
                 )
                 orphans_res = await session.execute(orphans_query)
-                orphans = orphans_res.scalars().all()
+                orphans = [o for o in orphans_res.scalars().all() if self.owns(o.id)]
                 
                 if orphans:
                     logger.info(f"🧹 Знайдено {len(orphans)} каналів-сиріт для очищення.")
                     for orphan in orphans:
-                        identifier = orphan.username or orphan.telegram_id
-                        if identifier:
-                            await self.leave_channel(identifier)
                         orphan.is_active = False # Видаляємо з каталогу теж
                     await session.commit()
+                    await self._leave_many([(o.id, o.username or o.telegram_id) for o in orphans])
+                    # Деактивація змінила водяний знак — перечитуємо, щоб не повторювати цикл
+                    stamp = await self._load_change_stamp(session)
+
+            for ch_id in removed_ids:
+                self._remove_from_cache(ch_id)
 
-            self.active_channels.clear()
-            self.username_to_id.clear()
-            
             channels_to_scan = []
             channels_to_join = []
             for ch in channels:
                 self._add_to_cache(ch)
-                channels_to_join.append(ch)
+                if ch.id not in self.joined_channel_ids:
+                    channels_to_join.append(ch)
                 if ch.last_scanned_at is None:
                     channels_to_scan.append(ch)
-                    
-            logger.info(f"Оновлено список каналів: {len(channels)} активних. Очищено: {len(orphans)}")
+
+            logger.info(
+                f"Оновлено список каналів: {len(active_ids)} активних "
+                f"(+{len(channels)} {'повна звірка' if full_resync else 'нових'}, -{len(removed_ids)}), "
+                f"join: {len(channels_to_join)}. Очищено: {len(orphans)}"
+            )
             
-            for ch in channels_to_join:
-                identifier = ch.username or ch.telegram_id
-                if identifier:
-                    await self.join_channel(identifier)
+            await self._join_many(channels_to_join)
+            if full_resync:
+                await self._leave_handed_over()
             
-            for ch in channels_to_scan:
-                identifier = ch.username or ch.telegram_id
-                if identifier:
-                    logger.info(f"🚀 Авто-сканування історії за 24г для нового каналу: {ch.title}")
-                    asyncio.create_task(self._scan_channel(ch.id, identifier, hours=24))
+            if channels_to_scan:
+                logger.info(f"🚀 Авто-сканування історії за 24г: {len(channels_to_scan)} нових каналів у черзі")
+                await self.backfill.enqueue([
+                    (ch.id, PRIORITY_CORE if ch.is_core else PRIORITY_DEFAULT, 24)
+                    for ch in channels_to_scan
+                ])
+
+            self._change_stamp = stamp
+            if full_resync:
+                self._last_full_resync = now
         except Exception as e:
             logger.error(f"Помилка оновлення каналів: {e}")
 
+    async def _leave_handed_over(self):
+        """
+        Виходить з каналів, які після ребалансування/переселення вже закріплені за іншим шардом
+        (новий власник підтвердив join), — акаунт не накопичує канали, яких не моніторить.
+        """
+        if not self.pool:
+            return
+        handed_over = [
+            ch_id for ch_id in self.joined_channel_ids
+            if self.pool.assigned.get(ch_id) not in (None, self.name) and not self.owns(ch_id)
+        ]
+        if not handed_over:
+            return
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                select(Channel.id, Channel.username, Channel.telegram_id).where(Channel.id.in_(handed_over))
+            )).all()
+        logger.info(f"🔀 [{self.name}] Вихід з {len(rows)} каналів, переданих іншим шардам")
+        await self._leave_many([(ch_id, username or telegram_id) for ch_id, username, telegram_id in rows])
+
     def _add_to_cache(self, channel: Channel):
         """Додає канал до внутрішнього кешу."""
         if channel.telegram_id:
             self.active_channels[channel.telegram_id] = channel.id
+            self.channel_categories[channel.id] = channel.category
             clean_username = (channel.username or "").lower().replace('@', '')
+            self._tracked[channel.id] = (channel.telegram_id, clean_username)
+            # Назва з БД — перше повідомлення каналу не потребує get_chat()
+            if channel.title:
+                self.chat_title_cache.setdefault(channel.telegram_id, channel.title)
+            if channel.last_message_id and channel.last_message_id > self.last_message_ids.get(channel.id, 0):
+                self.last_message_ids[channel.id] = channel.last_message_id
             if clean_username:
                 self.username_to_id[clean_username] = channel.id
                 self.chat_username_cache[channel.telegram_id] = clean_username
@@ -135,11 +390,28 @@ class ChannelMonitor:
                 try:
                     prefixed_id = int(f"-100{channel.telegram_id}")
                     self.active_channels[prefixed_id] = channel.id
+                    if channel.title:
+                        self.chat_title_cache.setdefault(prefixed_id, channel.title)
                     if clean_username:
                         self.chat_username_cache[prefixed_id] = clean_username
                 except ValueError:
                     pass
 
+    def _remove_from_cache(self, channel_db_id: int):
+        """Прибирає канал з внутрішнього кешу (більше не моніториться)."""
+        telegram_id, clean_username = self._tracked.pop(channel_db_id, (None, None))
+        self.channel_categories.pop(channel_db_id, None)
+        self.last_message_ids.pop(channel_db_id, None)
+        self._seen_message_ids.pop(channel_db_id, None)
+        if telegram_id:
+            self.active_channels.pop(telegram_id, None)
+            try:
+                self.active_channels.pop(int(f"-100{telegram_id}"), None)
+            except ValueError:
+                pass
+        if clean_username and self.username_to_id.get(clean_username) == channel_db_id:
+            del self.username_to_id[clean_username]
+
     async def track_channel(self, channel_id: int):
         """
         Примусово додає канал у відстеження та приєднується до нього, якщо потрібно.
@@ -151,36 +423,69 @@ class ChannelMonitor:
                 if not channel or not channel.is_active:
                     return
 
+                if not self.owns(channel_id):
+                    owner = self.pool.local_shard(channel_id)
+                    if owner:
+                        await owner.track_channel(channel_id)
+                    else:
+                        # Шард-власник працює в іншому процесі — підхопить канал при наступному refresh
+                        logger.info(f"Channel {channel_id} належить шарду {self.pool.owner(channel_id)}")
+                    return
+
                 # Оновлюємо кеш
                 self._add_to_cache(channel)
                 
                 # Спробуємо приєднатися до каналу через Telethon
                 identifier = channel.username or channel.telegram_id
                 if identifier:
-                    await self.join_channel(identifier)
-                    # Відразу скануємо історію за останні 12 годин для нового каналу
-                    asyncio.create_task(self._scan_channel(channel.id, identifier, hours=12))
+                    if await self.join_channel(identifier, channel.id):
+                        self.joined_channel_ids.add(channel.id)
+                    # Скануємо історію за останні 12 годин для нового каналу (першим у черзі)
+                    await self.backfill.enqueue([(channel.id, PRIORITY_USER_ADDED, 12)], retry_failed=True)
                 
                 logger.info(f"Channel tracked & joined: {channel.title} (@{channel.username})")
         except Exception as e:
             logger.error(f"Error tracking channel {channel_id}: {e}")
 
-    async def join_channel(self, identifier):
-        """Приєднується до каналу (Join), якщо клієнт ще не в ньому."""
+    def owns(self, channel_db_id: int) -> bool:
+        """Чи належить канал цьому шарду (без пулу — усі канали наші)."""
+        return self.pool is None or self.pool.owner(channel_db_id) == self.name
+
+    async def join_channel(self, identifier, channel_db_id: int = None) -> bool:
+        """Приєднується до каналу (Join), якщо клієнт ще не в ньому. Повертає True при успіху."""
         try:
             from telethon.tl.functions.channels import JoinChannelRequest
-            await self.client(JoinChannelRequest(identifier))
+            result = await self.governor.call(
+                "JoinChannelRequest", self.client, JoinChannelRequest(identifier), priority=Priority.JOIN
+            )
             logger.info(f"Successfully joined channel: {identifier}")
+            if channel_db_id:
+                chats = getattr(result, "chats", None) or [None]
+                self.entities.remember(channel_db_id, chats[0], joined=True)
+                # Постійний власник закріплює канал за собою (тимчасова заміна на час FloodWait — ні)
+                if self.pool and self.pool.stable_owner(channel_db_id) == self.name:
+                    try:
+                        await self.pool.assign([channel_db_id], self.name)
+                    except Exception as e:
+                        logger.error(f"[{self.name}] Не вдалося закріпити канал {channel_db_id}: {e}")
+            return True
         except FloodWaitError as e:
             logger.warning(f"⏳ FloodWait при спробі приєднатися до {identifier}: {e.seconds}с")
+        except ChannelsTooMuchError:
+            logger.warning(f"[{self.name}] Досягнуто ліміту каналів акаунта, {identifier} не додано")
+            if self.pool and channel_db_id:
+                self.pool.mark_full(self.name, channel_db_id)
         except Exception as e:
             logger.debug(f"Info: Already in channel or cannot join {identifier}: {e}")
+        return False
 
     async def leave_channel(self, identifier):
         """Виходить з каналу."""
         try:
             from telethon.tl.functions.channels import LeaveChannelRequest
-            await self.client(LeaveChannelRequest(identifier))
+            await self.governor.call(
+                "LeaveChannelRequest", self.client, LeaveChannelRequest(identifier), priority=Priority.JOIN
+            )
             logger.info(f"Successfully left channel: {identifier}")
         except Exception as e:
             logger.error(f"Error leaving channel {identifier}: {e}")
@@ -188,7 +493,7 @@ class ChannelMonitor:
     async def check_channel_liveness(self, identifier) -> bool:
         """Перевіряє чи канал живий (пост за останні 30 днів)."""
         try:
-            async for message in self.client.iter_messages(identifier, limit=1):
+            async for message in self.governor.iter_messages(self.client, identifier, limit=1):
                 if message.date:
                     # Telethon message.date is already timezone-aware UTC
                     thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
@@ -201,18 +506,139 @@ class ChannelMonitor:
             logger.warning(f"⚠️ Не вдалося перевірити активність {identifier}: {e}")
             return True # Припускаємо що живий
 
-    async def _scan_channel(self, channel_db_id: int, telegram_identifier: int | str, limit: int = 100, hours: int = None):
+    def _identifier_for(self, channel_db_id: int) -> int | str | None:
+        """Повертає username або telegram_id відстежуваного каналу."""
+        telegram_id, clean_username = self._tracked.get(channel_db_id, (None, None))
+        return clean_username or telegram_id
+
+    def _peer_for(self, channel_db_id: int, identifier=None):
+        """Сутність для запитів Telethon: InputPeerChannel з кешу (без resolve) або identifier."""
+        return self.entities.input_peer(channel_db_id) or identifier or self._identifier_for(channel_db_id)
+
+    def _note_message(self, channel_db_id: int, message_id: int):
+        """
+        Фіксує побачене повідомлення: водяний знак іде в буфер запису, а last_message_ids
+        просувається лише після коміту (_on_watermarks_saved).
+        """
+        if message_id > self._seen_message_ids.get(channel_db_id, 0):
+            self._seen_message_ids[channel_db_id] = message_id
+            self.writer.note_watermark(channel_db_id, message_id)
+
+    def _on_watermarks_saved(self, watermarks: dict[int, int]):
+        """Слухач writer: водяні знаки, закомічені разом з публікаціями (буфер спільний для всіх шардів)."""
+        for channel_db_id, message_id in watermarks.items():
+            if channel_db_id in self._tracked and message_id > self.last_message_ids.get(channel_db_id, 0):
+                self.last_message_ids[channel_db_id] = message_id
+
+    def _check_gap(self, channel_db_id: int, message_id: int):
+        """Якщо між водяним знаком і новим повідомленням є розрив — планує його заповнення."""
+        if self._catching_up:
+            return  # догін уже покриває все, що новіше за збережені водяні знаки
+        # Побачене, але ще не записане не є розривом: writer повторює невдалий запис
+        last_id = max(self._seen_message_ids.get(channel_db_id, 0), self.last_message_ids.get(channel_db_id, 0))
+        if last_id and message_id > last_id + 1:
+            self._schedule_gap_fill(channel_db_id, last_id, message_id)
+
+    def note_dropped(self, chat_id: int, message_id: int):
+        """
+        Intake відкинув оновлення (політика drop): одразу планує заповнення розриву,
+        не чекаючи наступного повідомлення в цьому каналі (його може й не бути).
+        """
+        channel_db_id = self.active_channels.get(chat_id)
+        if not channel_db_id:
+            return
+        last_id = max(self._seen_message_ids.get(channel_db_id, 0), self.last_message_ids.get(channel_db_id, 0))
+        self._schedule_gap_fill(channel_db_id, last_id or message_id - 1, message_id + 1)
+
+    def _schedule_gap_fill(self, channel_db_id: int, min_id: int, max_id: int):
+        """
+        Запускає заповнення (min_id, max_id); якщо канал уже заповнюється — відкладає до його завершення.
+        max_id=0 — без верхньої межі (до найновішого повідомлення).
+        """
+        if channel_db_id in self._gap_fills:
+            pending = self._pending_gaps.get(channel_db_id)
+            if pending:
+                upper = 0 if 0 in (max_id, pending[1]) else max(max_id, pending[1])
+                min_id, max_id = min(min_id, pending[0]), upper
+            self._pending_gaps[channel_db_id] = (min_id, max_id)
+            return
+        self._gap_fills.add(channel_db_id)
+        asyncio.create_task(self._fill_gap(channel_db_id, min_id, max_id))
+
+    async def _fill_gap(self, channel_db_id: int, min_id: int, max_id: int):
+        """Дозавантажує повідомлення з id у проміжку (min_id, max_id)."""
+        try:
+            # Даємо паралельним оновленням долетіти — частина "розриву" зазвичай приходить сама
+            await asyncio.sleep(config.GAP_FILL_DELAY)
+            await self._history_resumed.wait()
+            identifier = self._identifier_for(channel_db_id)
+            if identifier:
+                logger.info(f"🩹 Заповнення розриву в каналі {identifier}: id {min_id}..{max_id or '∞'}")
+                await self._scan_channel(channel_db_id, identifier, min_id=min_id, max_id=max_id)
+        finally:
+            self._gap_fills.discard(channel_db_id)
+            pending = self._pending_gaps.pop(channel_db_id, None)
+            if pending and channel_db_id in self._tracked:
+                self._schedule_gap_fill(channel_db_id, *pending)
+
+    def pause_history(self):
+        """Перевантаження intake: призупиняє backfill, догін і заповнення розривів."""
+        self._history_resumed.clear()
+        self.backfill.pause()
+
+    def resume_history(self):
+        self._history_resumed.set()
+        self.backfill.resume()
+
+    async def catch_up_channels(self):
+        """
+        Після старту/перепідключення дозавантажує для кожного каналу лише повідомлення
+        новіші за його водяний знак (min_id), послідовно — щоб не створювати сплеск запитів.
+        """
+        pending = [(ch_id, wm) for ch_id, wm in self.last_message_ids.items() if ch_id in self._tracked]
+        if not pending:
+            return
+        logger.info(f"🔄 Догін пропущених повідомлень для {len(pending)} каналів...")
+        self._catching_up = True
+        try:
+            for ch_id, wm in pending:
+                await self._history_resumed.wait()
+                identifier = self._identifier_for(ch_id)
+                if identifier:
+                    await self._scan_channel(ch_id, identifier, min_id=wm)
+        finally:
+            self._catching_up = False
+        logger.info("🔄 Догін завершено.")
+
+    async def _scan_channel(
+        self,
+        channel_db_id: int,
+        telegram_identifier: int | str,
+        limit: int = 100,
+        hours: int = None,
+        min_id: int = None,
+        max_id: int = None,
+        max_messages: int = None,
+    ) -> bool:
         """
-        Сканує історію каналу. 
-        Якщо вказано hours, збирає всі повідомлення за цей період.
+        Сканує історію каналу. Повертає True, якщо сканування завершилось без помилок.
+        Якщо вказано hours, збирає всі повідомлення за цей період (але не більше max_messages).
+        Якщо вказано min_id — лише повідомлення новіші за водяний знак (від старих до нових,
+        щоб водяний знак зростав монотонно); старші за CATCH_UP_MAX_HOURS пропускаються.
+        Якщо за один прохід досягнуто GAP_FILL_MAX_MESSAGES, решта проміжку планується
+        окремим заповненням розриву від останнього отриманого id.
         """
         try:
-            time_str = f"last {hours}h" if hours else f"limit={limit}"
+            if min_id:
+                time_str = f"min_id={min_id}" + (f", max_id={max_id}" if max_id else "")
+            else:
+                time_str = f"last {hours}h" if hours else f"limit={limit}"
             logger.info(f"Scanning history for channel {telegram_identifier} ({time_str})")
             
             offset_date = None
             if hours:
                 offset_date = datetime.now(timezone.utc) - timedelta(hours=hours)
+            catch_up_cutoff = None
 
             # Створюємо фейковий івент для save_and_cluster
             class FakeEvent:
@@ -221,11 +647,34 @@ class ChannelMonitor:
                     self.chat_id = chat_id
                     self.is_channel = True
 
-            # Якщо hours вказано, прибираємо ліміт у 100 постів, бо нам потрібні всі за цей період
-            scan_limit = limit if not hours else None
+            if min_id:
+                messages = self.governor.iter_messages(
+                    self.client,
+                    self._peer_for(channel_db_id, telegram_identifier),
+                    priority=Priority.BACKFILL,
+                    limit=config.GAP_FILL_MAX_MESSAGES,
+                    min_id=min_id,
+                    max_id=max_id or 0,
+                    reverse=True,
+                )
+                # Telethon ігнорує offset_date разом з min_id і reverse — поріг перевіряється в циклі
+                catch_up_cutoff = datetime.now(timezone.utc) - timedelta(hours=config.CATCH_UP_MAX_HOURS)
+            else:
+                # Якщо hours вказано, ліміт у 100 постів замінюється глибиною від планувальника
+                scan_limit = limit if not hours else max_messages
+                messages = self.governor.iter_messages(
+                    self.client, self._peer_for(channel_db_id, telegram_identifier),
+                    priority=Priority.BACKFILL, limit=scan_limit
+                )
 
-            async for message in self.client.iter_messages(telegram_identifier, limit=scan_limit):
-                if not message.message:
+            fetched = 0
+            last_fetched_id = min_id
+            async for message in messages:
+                fetched += 1
+                last_fetched_id = message.id
+                # Застаре при догоні пропускаємо, але водяний знак просуваємо — щоб не повертатись до нього
+                if not message.message or (catch_up_cutoff and message.date < catch_up_cutoff):
+                    self._note_message(channel_db_id, message.id)
                     continue
                 
                 # Якщо є поріг по часу — зупиняємось, як тільки повідомлення стає застарілим
@@ -235,6 +684,17 @@ class ChannelMonitor:
                 event = FakeEvent(message, telegram_identifier)
                 await self.save_and_cluster(event, channel_db_id)
             
+            if min_id and fetched >= config.GAP_FILL_MAX_MESSAGES:
+                # Ліміт проходу вичерпано — решту не губимо, а дозавантажуємо наступним проходом
+                logger.info(
+                    f"🩹 Канал {telegram_identifier}: досягнуто ліміту {config.GAP_FILL_MAX_MESSAGES}, "
+                    f"продовження з id {last_fetched_id}"
+                )
+                self._schedule_gap_fill(channel_db_id, last_fetched_id, max_id or 0)
+
+            # Дописуємо залишок буфера до того, як позначити канал просканованим
+            await self.writer.flush()
+
             # Оновлюємо час останнього сканування в БД
             async with AsyncSessionLocal() as session:
                 await session.execute(
@@ -243,56 +703,34 @@ class ChannelMonitor:
                     .values(last_scanned_at=datetime.now(timezone.utc))
                 )
                 await session.commit()
+            return True
                 
         except FloodWaitError as e:
             logger.warning(f"⏳ FloodWait під час сканування {telegram_identifier}: {e.seconds}с")
         except Exception as e:
             logger.error(f"Помилка сканування каналу {telegram_identifier}: {e}")
+        return False
 
 
-    async def is_ad(self, text: str, channel_id: int = None) -> bool:
+    def is_ad(self, text: str, channel_id: int = None) -> bool:
         """
         Перевіряє, чи є повідомлення рекламою, враховуючи контекст каналу.
+        Категорія береться з кешу (оновлюється разом з refresh_channels) — без запитів до БД.
         """
-        if not text:
-            return False
-            
-        ad_markers = [
-            "#реклама", "#promo", "реклама", "за посиланням", 
-            "купити", "знижка", "підписуйтесь", "реєструйтеся",
-            "зареєструватися", "гроші", "казино", "ставки",
-            "промокод", "заробіток", "виплати", "крипта",
-            "біткоїн", "bitcoin", "курс валют тут", "дивіться за посиланням",
-            "переходьте", "підпишись", "еко-система", "інвестування",
-            "безкоштовно", "дарма", "акція", "розіграш", "айфон",
-            "інтим", "бутик", "шоп", "18+", "🔞", "замовити",
-            "магазин", "знижк", "промокод", "ловіть", "тільки сьогодні",
-            "t.me/+", "t.me/joinchat", "#промо"
-        ]
+        return self.ad_filter.is_ad(text, self.channel_categories.get(channel_id))
 
-        # Контекстні винятки
-        context_exceptions = []
-        if channel_id:
-            try:
-                async with AsyncSessionLocal() as session:
-                    channel = await session.get(Channel, channel_id)
-                    if channel and channel.category:
-                        cat = channel.category.lower()
-                        if "крипт" in cat or "фінанс" in cat:
-                            context_exceptions.extend(["крипта", "біткоїн", "bitcoin", "інвестування", "виплати"])
-                        if "подорож" in cat or "туризм" in cat:
-                            context_exceptions.extend(["за посиланням", "дивіться за посиланням", "переходьте"])
-            except Exception as e:
-                logger.warning(f"Помилка перевірки контексту реклами: {e}")
-        
-        text_lower = text.lower()
-        for marker in ad_markers:
-            if marker in text_lower:
-                # Перевірка на винятки
-                if any(exc in marker for exc in context_exceptions):
-                    continue
-                return True
-        return False
+    async def _fetch_chat(self, event) -> tuple[str, str | None]:
+        """Запитує чат через governor (пріоритет LIVE) і кешує title/username."""
+        chat = await self.governor.call("get_chat", event.get_chat, priority=Priority.LIVE)
+        title = getattr(chat, 'title', 'Unknown')
+        username = getattr(chat, 'username', None)
+        self.chat_title_cache[event.chat_id] = title
+        if username:
+            self.chat_username_cache[event.chat_id] = username.lower()
+        db_channel_id = self.active_channels.get(event.chat_id) or (username and self.username_to_id.get(username.lower()))
+        if db_channel_id:
+            self.entities.remember(db_channel_id, chat)
+        return title, username
 
     async def _get_chat_info(self, event) -> tuple[int | None, str | None, str | None]:
         """
@@ -312,24 +750,11 @@ class ChannelMonitor:
             # Якщо title ще немає в кеші — запитуємо один раз і кешуємо
             if title is None:
                 try:
-                    chat = await event.get_chat()
-                    title = getattr(chat, 'title', 'Unknown')
-                    username = getattr(chat, 'username', None)
-                    self.chat_title_cache[chat_id] = title
-                    if username:
-                        self.chat_username_cache[chat_id] = username.lower()
-                except FloodWaitError as e:
-                    logger.warning(f"⏳ FloodWait при get_chat: {e.seconds}с")
-                    self.flood_wait_count += 1
-                    self.last_flood_wait = datetime.now()
-                    await asyncio.sleep(e.seconds)
-                    # Повторна спроба
-                    chat = await event.get_chat()
-                    title = getattr(chat, 'title', 'Unknown')
-                    username = getattr(chat, 'username', None)
-                    self.chat_title_cache[chat_id] = title
-                    if username:
-                        self.chat_username_cache[chat_id] = username.lower()
+                    title, fetched_username = await self._fetch_chat(event)
+                    username = fetched_username or username
+                except FloodWaitError:
+                    # Title потрібен лише для логів — не блокуємо обробку, спробуємо наступного разу
+                    pass
                         
             return db_channel_id, title, username
         
@@ -337,20 +762,12 @@ class ChannelMonitor:
         # Для цього потрібен get_chat() — але тільки 1 раз
         if chat_id not in self.chat_title_cache:
             try:
-                chat = await event.get_chat()
-                title = getattr(chat, 'title', 'Unknown')
-                username = getattr(chat, 'username', None)
-                self.chat_title_cache[chat_id] = title
+                title, username = await self._fetch_chat(event)
                 if username:
-                    self.chat_username_cache[chat_id] = username.lower()
                     db_channel_id = self.username_to_id.get(username.lower())
                     if db_channel_id:
                         return db_channel_id, title, username
-            except FloodWaitError as e:
-                logger.warning(f"⏳ FloodWait при fallback get_chat: {e.seconds}с")
-                self.flood_wait_count += 1
-                self.last_flood_wait = datetime.now()
-                await asyncio.sleep(e.seconds)
+            except FloodWaitError:
                 return None, None, None
             except Exception:
                 pass
@@ -359,35 +776,49 @@ class ChannelMonitor:
 
     async def handle_new_message(self, event):
         """Обробник нових повідомлень з обробкою FloodWait."""
+        started = time.perf_counter()
         try:
             text = event.message.message
             if not text:
+                # Медіа без тексту теж просуває водяний знак (щоб не дозавантажувати його повторно)
+                db_channel_id = self.active_channels.get(event.chat_id)
+                if db_channel_id:
+                    self._check_gap(db_channel_id, event.message.id)
+                    self._note_message(db_channel_id, event.message.id)
                 return
 
             # Отримуємо інфо з кешу (мінімум API-запитів)
-            db_channel_id, chat_title, chat_username = await self._get_chat_info(event)
+            with metrics.timer("get_chat_info"):
+                db_channel_id, chat_title, chat_username = await self._get_chat_info(event)
             
             if not db_channel_id:
                 return
 
+            self._check_gap(db_channel_id, event.message.id)
+
             # Обробка (фільтрація реклами тепер всередині save_and_cluster)
-            await self.save_and_cluster(event, db_channel_id, chat_username)
+            await self.save_and_cluster(event, db_channel_id, chat_username, live=True)
+            metrics.observe_lag("e2e_lag_handler", event.message.date)
             
         except FloodWaitError as e:
-            logger.warning(f"⏳ FloodWait у handle_new_message: {e.seconds}с")
-            self.flood_wait_count += 1
-            self.last_flood_wait = datetime.now()
-            await asyncio.sleep(e.seconds)
+            # Не засинаємо в обробнику: пропущене повідомлення підбере заповнення розриву
+            logger.warning(f"⏳ FloodWait у handle_new_message ({e.seconds}с), повідомлення пропущено")
         except Exception as e:
             logger.error(f"Помилка обробки повідомлення: {e}")
+        finally:
+            metrics.observe("handle_new_message", time.perf_counter() - started)
 
-    async def save_and_cluster(self, event, channel_id, chat_username=None):
+    async def save_and_cluster(self, event, channel_id, chat_username=None, live: bool = False):
         try:
             text = event.message.message
             if not text: return
+            self._note_message(channel_id, event.message.id)
             
             # Перевірка на рекламу (для всіх типів збору: real-time та scan)
-            if await self.is_ad(text, channel_id=channel_id):
+            with metrics.timer("is_ad"):
+                blocked = self.is_ad(text, channel_id=channel_id)
+            if blocked:
+                metrics.inc("ads_blocked")
                 logger.info(f"🚫 Реклама заблокована для каналу {channel_id}")
                 return
             
@@ -405,43 +836,37 @@ class ChannelMonitor:
                 clean_id = str(event.chat_id).replace("-100", "")
                 url = f"https://t.me/c/{clean_id}/{msg_id}"
 
-            async with AsyncSessionLocal() as session:
-                try:
-                    new_pub = Publication(
-                        channel_id=channel_id,
-                        telegram_message_id=msg_id,
-                        content=text,
-                        url=url,
-                        published_at=date,
-                        views=views
-                    )
-                    session.add(new_pub)
-                    await session.commit()
-                    await session.refresh(new_pub)
-                    pub_id = new_pub.id
-                    logger.info(f"💾 Saved publication {msg_id} from channel {channel_id}")
-                except IntegrityError:
-                    await session.rollback()
-                    logger.debug(f"Publication {msg_id} already exists in channel {channel_id} (duplicate skipped)")
-                    return
-            
-            # Trigger Clustering (Async)
-            from services.clustering import cluster_publication
-            asyncio.create_task(cluster_publication(pub_id))
+            # Публікація йде в буфер; кластеризація стартує після пакетного INSERT
+            await self.writer.add({
+                "channel_id": channel_id,
+                "telegram_message_id": msg_id,
+                "content": text,
+                "url": url,
+                "published_at": date,
+                "views": views,
+                "content_hash": content_hash(text),
+            }, live=live)
             
-        except FloodWaitError as e:
-            logger.warning(f"⏳ FloodWait у save_and_cluster: {e.seconds}с")
-            self.flood_wait_count += 1
-            self.last_flood_wait = datetime.now()
-            await asyncio.sleep(e.seconds)
         except Exception as e:
             logger.error(f"Помилка збереження/кластеризації: {e}")
 
+    @property
+    def flood_wait_count(self) -> int:
+        return self.governor.flood_wait_count
+
     async def stop(self):
         """Відключає клієнт."""
+        await self.intake.stop()
+        await self.engagement.stop()
+        await self.entities.flush()
+        await self.backfill.stop()
+        await self.writer.stop()
         if self.client.is_connected():
             await self.client.disconnect()
-            logger.info(f"Telethon відключено (FloodWait інцидентів за сесію: {self.flood_wait_count})")
+            logger.info(
+                f"Telethon відключено (FloodWait інцидентів за сесію: {self.flood_wait_count}, "
+                f"метрики: {self.governor.snapshot()})"
+            )
 
     async def run_monitoring(self):
         """Підтримує клієнт активним та оновлює список каналів."""
@@ -450,8 +875,7 @@ class ChannelMonitor:
                 await self.start()
         except FloodWaitError as e:
             logger.error(f"⏳ FloodWait при запуску: очікування {e.seconds}с...")
-            self.flood_wait_count += 1
-            self.last_flood_wait = datetime.now()
+            self.governor.report_flood_wait("start", e.seconds)
             await asyncio.sleep(e.seconds)
             await self.start()
         except Exception as e:
@@ -461,10 +885,20 @@ class ChannelMonitor:
         logger.info("Моніторинг (Event-Driven) запущено.")
         try:
             while True:
+                if not self.client.is_connected():
+                    logger.warning("🔌 Telethon відключено, перепідключення...")
+                    self._needs_catch_up = True
+                    try:
+                        await self.client.connect()
+                    except Exception as e:
+                        logger.error(f"Не вдалося перепідключитися: {e}")
+                if self._needs_catch_up and self.client.is_connected():
+                    self._needs_catch_up = False
+                    asyncio.create_task(self.catch_up_channels())
                 # Оновлюємо список каналів (це автоматично оновить кеш для NewMessage)
                 await self.refresh_channels()
-                # Очікуємо 1 хвилину
-                await asyncio.sleep(60)
+                await self.entities.flush()
+                await asyncio.sleep(config.CHANNEL_REFRESH_INTERVAL)
         except asyncio.CancelledError:
             logger.info("Моніторинг зупинено.")
             await self.stop()
@@ -0,0 +1,227 @@
+"""
+Pulse Monitor Pool — моніторинг каналів кількома Telegram-акаунтами (шардами).
+Канали розподіляються між шардами консистентним хешуванням за channel_id;
+при FloodWait або ліміті каналів акаунта нові/зачеплені канали переходять
+на наступний шард кільця. Кожен шард — окремий ChannelMonitor зі своїм
+клієнтом, governor, кешами та чергою backfill.
+Шард, що приєднався до каналу як постійний власник, закріплюється в channels.shard:
+закріплення переживає рестарт, а попередній шард після цього виходить з каналу.
+
+Запуск у кількох процесах: усі процеси мають однаковий TELETHON_SESSIONS,
+а MONITOR_LOCAL_SHARDS визначає, які шарди запускаються локально
+(напр. бот — "0", воркер — "1,2": `python -m services.monitor_pool`).
+Бюджет LLM кожного процесу — частка AI_BUDGET_SHARE від спільного ліміту (services/ai_scheduler.py).
+Динамічне ребалансування (FloodWait/ліміт) діє між шардами одного процесу;
+закріплення з інших процесів підхоплюються при повній звірці (CHANNEL_FULL_RESYNC_INTERVAL).
+"""
+import asyncio
+import bisect
+import hashlib
+import time
+from loguru import logger
+from sqlalchemy import update
+from telethon.sessions import StringSession
+from config.settings import config
+from database.connection import AsyncSessionLocal
+from database.models import Channel
+from services.cluster_queue import cluster_queue
+from services.metrics import metrics
+from services.monitor import ChannelMonitor, monitor
+
+
+class HashRing:
+    """Консистентне хешування з віртуальними вузлами."""
+
+    def __init__(self, nodes: list[str] = (), replicas: int = 64):
+        self.replicas = replicas
+        self._keys: list[int] = []
+        self._nodes: dict[int, str] = {}
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key) -> int:
+        return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), "big")
+
+    def add(self, node: str):
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            if h not in self._nodes:
+                bisect.insort(self._keys, h)
+                self._nodes[h] = node
+
+    def remove(self, node: str):
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            if self._nodes.get(h) == node:
+                del self._nodes[h]
+                self._keys.remove(h)
+
+    def get(self, key, exclude=()) -> str | None:
+        """Вузол для ключа: перший за годинниковою стрілкою, що не входить до exclude."""
+        if not self._keys:
+            return None
+        start = bisect.bisect(self._keys, self._hash(key))
+        for offset in range(len(self._keys)):
+            node = self._nodes[self._keys[(start + offset) % len(self._keys)]]
+            if node not in exclude:
+                return node
+        return None
+
+
+class MonitorPool:
+    """Набір шардів ChannelMonitor з призначенням каналів і ребалансуванням."""
+
+    def __init__(self, primary: ChannelMonitor):
+        self.shards: dict[str, ChannelMonitor] = {primary.name: primary}
+        extra_sessions = [s.strip() for s in (config.TELETHON_SESSIONS or "").split(",") if s.strip()]
+        for i, session_str in enumerate(extra_sessions, start=1):
+            name = f"shard{i}"
+            self.shards[name] = ChannelMonitor(session=StringSession(session_str), name=name)
+
+        self.ring = HashRing(list(self.shards))
+
+        if config.MONITOR_LOCAL_SHARDS:
+            local_names = {f"shard{i.strip()}" for i in config.MONITOR_LOCAL_SHARDS.split(",") if i.strip()}
+        else:
+            local_names = set(self.shards)
+        self.local: dict[str, ChannelMonitor] = {n: m for n, m in self.shards.items() if n in local_names}
+
+        # Шард -> monotonic-час, до якого він недоступний (тривалий FloodWait)
+        self.unavailable: dict[str, float] = {}
+        # Шарди, що досягли ліміту каналів акаунта (нові канали на них не призначаються)
+        self.full: set[str] = set()
+        # channel_id -> шард, на який канал "переселено" з переповненого шарда (ще до join)
+        self.spill: dict[int, str] = {}
+        # channel_id -> шард, що вже приєднався до каналу (channels.shard)
+        self.assigned: dict[int, str] = {}
+
+        for shard in self.shards.values():
+            shard.pool = self
+            shard.governor.on_flood_wait = self._on_flood_wait
+
+        for name, shard in self.local.items():
+            metrics.register_gauge(f"backfill_in_flight_{name}", lambda s=shard: s.backfill.in_flight)
+            metrics.register_gauge(f"mtproto_rate_{name}", lambda s=shard: round(s.governor._global.rate, 2))
+        metrics.register_gauge("asyncio_tasks", lambda: len(asyncio.all_tasks()))
+
+        self._tasks: list[asyncio.Task] = []
+
+    def stable_owner(self, channel_id: int) -> str:
+        """
+        Постійний власник каналу без урахування тимчасової недоступності: шард переселення,
+        закріплений шард або шард кільця серед не переповнених (новий канал на повний шард не йде).
+        """
+        return (
+            self.spill.get(channel_id)
+            or self.assigned.get(channel_id)
+            or self.ring.get(channel_id, exclude=self.full)
+            or self.ring.get(channel_id)
+            or next(iter(self.shards))
+        )
+
+    def owner(self, channel_id: int) -> str:
+        """Назва шарда, що відповідає за канал зараз (з урахуванням тривалого FloodWait)."""
+        stable = self.stable_owner(channel_id)
+        if stable not in self.unavailable:
+            return stable
+        unavailable = self.unavailable.keys()
+        return (
+            self.ring.get(channel_id, exclude=unavailable | self.full)
+            or self.ring.get(channel_id, exclude=unavailable)
+            or stable
+        )
+
+    def load_assignments(self, rows):
+        """Закріплення (channel_id, shard) з БД; шарди, яких немає в конфігурації, ігноруються."""
+        self.assigned = {ch_id: shard for ch_id, shard in rows if shard in self.shards}
+
+    async def assign(self, channel_ids: list[int], shard: str):
+        """Закріплює канали за шардом, який щойно до них приєднався як постійний власник."""
+        channel_ids = [ch_id for ch_id in channel_ids if self.assigned.get(ch_id) != shard]
+        if not channel_ids:
+            return
+        async with AsyncSessionLocal() as session:
+            await session.execute(update(Channel).where(Channel.id.in_(channel_ids)).values(shard=shard))
+            await session.commit()
+        for ch_id in channel_ids:
+            self.assigned[ch_id] = shard
+            if self.spill.get(ch_id) == shard:
+                del self.spill[ch_id]
+
+    def local_shard(self, channel_id: int) -> ChannelMonitor | None:
+        """Локальний монітор-власник каналу (None, якщо шард працює в іншому процесі)."""
+        return self.local.get(self.owner(channel_id))
+
+    def mark_full(self, shard: str, channel_id: int):
+        """
+        Акаунт шарда досяг ліміту каналів: переносимо канал на наступний шард кільця.
+        У channels.shard переселення потрапляє, коли новий шард справді приєднається.
+        """
+        self.full.add(shard)
+        target = self.ring.get(channel_id, exclude=self.full | self.unavailable.keys())
+        if target and target != shard:
+            self.spill[channel_id] = target
+            logger.warning(f"🔀 Канал {channel_id}: {shard} переповнений, переносимо на {target}")
+            self._rebalance()
+
+    def mark_has_room(self, shard: str):
+        """Шард вийшов з каналів — знову може приймати нові."""
+        if shard in self.full:
+            self.full.discard(shard)
+            logger.info(f"🔀 Шард {shard} знову приймає нові канали")
+
+    def _on_flood_wait(self, shard: str, method: str, seconds: int):
+        if len(self.shards) < 2 or seconds < config.SHARD_FLOOD_REBALANCE_SECONDS:
+            return
+        if shard not in self.unavailable:
+            logger.warning(f"🔀 Шард {shard} у FloodWait {seconds}с ({method}) — тимчасово перерозподіляємо канали")
+        self.unavailable[shard] = max(self.unavailable.get(shard, 0), time.monotonic() + seconds)
+        self._rebalance()
+
+    def _rebalance(self):
+        """Змушує локальні шарди перечитати свої канали з новим призначенням."""
+        for shard in self.local.values():
+            if shard.client.is_connected():
+                asyncio.create_task(shard.refresh_channels(force=True))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(30)
+            now = time.monotonic()
+            recovered = [name for name, until in self.unavailable.items() if until <= now]
+            for name in recovered:
+                del self.unavailable[name]
+                logger.info(f"🔀 Шард {name} знову доступний")
+            if recovered:
+                self._rebalance()
+
+    async def run(self):
+        """Запускає всі локальні шарди та стежить за їхнім станом."""
+        logger.info(f"Monitor pool: {len(self.shards)} шардів, локально: {', '.join(self.local)}")
+        await metrics.start()
+        await cluster_queue.start()
+        self._tasks = [asyncio.create_task(m.run_monitoring()) for m in self.local.values()]
+        self._tasks.append(asyncio.create_task(self._health_loop()))
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            await self.stop()
+            raise
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        for shard in self.local.values():
+            await shard.stop()
+        await cluster_queue.stop()
+        await metrics.stop()
+
+
+monitor_pool = MonitorPool(monitor)
+
+
+if __name__ == "__main__":
+    # Окремий процес-воркер для шардів із MONITOR_LOCAL_SHARDS
+    asyncio.run(monitor_pool.run())
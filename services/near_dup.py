@@ -0,0 +1,203 @@
+"""
+Pulse Near-Duplicate — дешевий CPU-етап кластеризації: MinHash + LSH.
+Текст нормалізується (як для відбитків), розбивається на словесні шинґли,
+для яких рахується MinHash-сигнатура; LSH-індекс за останні NEAR_DUP_WINDOW_HOURS
+знаходить кандидатів за збігом смуг сигнатури, а оцінка Жаккара відсікає хибні.
+Переписані іншими каналами майже дослівні новини приєднуються до того самого сюжету
+ще до ембедингів та LLM.
+"""
+import asyncio
+import time
+import zlib
+from collections import OrderedDict
+import numpy as np
+from loguru import logger
+from config.settings import config
+from services.fingerprint import normalize_text
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+# Публікацій на одну пачку прогріву (один виклик asyncio.to_thread)
+WARM_UP_CHUNK = 500
+
+
+def shingles(text: str, size: int = None) -> set[str]:
+    """Множина словесних шинґлів нормалізованого тексту."""
+    size = size or config.NEAR_DUP_SHINGLE_SIZE
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def optimal_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+    """
+    Кількість смуг b і рядків r (b*r <= num_perm), за яких поріг спрацювання LSH (1/b)^(1/r)
+    найближчий до заданої схожості — з невеликим зсувом униз на користь повноти.
+    """
+    best, best_err = (num_perm, 1), float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if bands < 1:
+            break
+        err = abs((1 / bands) ** (1 / rows) - (threshold - 0.05))
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+class MinHasher:
+    """Обчислює MinHash-сигнатури фіксованої довжини (uint32) з детермінованими перестановками."""
+
+    def __init__(self, num_perm: int = None, seed: int = 1):
+        self.num_perm = num_perm or config.NEAR_DUP_NUM_PERM
+        rng = np.random.RandomState(seed)
+        # a, b < 2^32 і хеші шинґлів 32-бітні: a*x + b вміщується в uint64 без переповнення
+        self._a = rng.randint(1, 1 << 32, size=self.num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.randint(0, 1 << 32, size=self.num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, text: str) -> np.ndarray | None:
+        """Сигнатура тексту або None, якщо шинґлів замало для надійної оцінки."""
+        shingle_set = shingles(text)
+        if len(shingle_set) < config.NEAR_DUP_MIN_SHINGLES:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode()) for s in shingle_set), dtype=np.uint64, count=len(shingle_set)
+        )
+        permuted = ((self._a * hashes + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+class LSHIndex:
+    """
+    LSH-індекс сигнатур публікацій з часовим вікном.
+    Ключ — publication_id, значення — story_id: схожий текст повертає сюжет найближчої публікації.
+    """
+
+    def __init__(self, threshold: float = None, num_perm: int = None, window_hours: int = None):
+        self.threshold = threshold or config.NEAR_DUP_THRESHOLD
+        self.num_perm = num_perm or config.NEAR_DUP_NUM_PERM
+        self.window = (window_hours or config.NEAR_DUP_WINDOW_HOURS) * 3600
+        self.bands, self.rows = optimal_bands(self.threshold, self.num_perm)
+        self._buckets: list[dict[bytes, set[int]]] = [{} for _ in range(self.bands)]
+        # publication_id -> (story_id, сигнатура, monotonic-час закінчення) у порядку додавання
+        self._entries: OrderedDict[int, tuple[int, np.ndarray, float]] = OrderedDict()
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        r = self.rows
+        return [signature[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def add(self, publication_id: int, story_id: int, signature: np.ndarray, expires_at: float = None):
+        if publication_id in self._entries:
+            self.remove(publication_id)
+        self._entries[publication_id] = (story_id, signature, expires_at or time.monotonic() + self.window)
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, set()).add(publication_id)
+        self._prune()
+
+    def remove(self, publication_id: int):
+        entry = self._entries.pop(publication_id, None)
+        if entry is None:
+            return
+        for bucket, key in zip(self._buckets, self._band_keys(entry[1])):
+            ids = bucket.get(key)
+            if ids is not None:
+                ids.discard(publication_id)
+                if not ids:
+                    del bucket[key]
+
+    def _prune(self):
+        now = time.monotonic()
+        while self._entries:
+            pub_id, (_, _, expires_at) = next(iter(self._entries.items()))
+            if expires_at >= now:
+                break
+            self.remove(pub_id)
+
+    def query(self, signature: np.ndarray) -> tuple[int, float] | None:
+        """(story_id, оцінка Жаккара) найсхожішої публікації з оцінкою >= threshold або None."""
+        candidates: set[int] = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            ids = bucket.get(key)
+            if ids:
+                candidates |= ids
+        best = None
+        now = time.monotonic()
+        for pub_id in candidates:
+            story_id, other, expires_at = self._entries[pub_id]
+            if expires_at < now:
+                continue
+            score = float(np.count_nonzero(signature == other)) / self.num_perm
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (story_id, score)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class NearDuplicateDetector:
+    """MinHasher + LSHIndex з ледачим прогрівом з БД (публікації за вікно, що вже мають сюжет)."""
+
+    def __init__(self):
+        self.hasher = MinHasher()
+        self.index = LSHIndex()
+        self._warm = False
+        self._warm_lock = asyncio.Lock()
+
+    async def warm_up(self):
+        if self._warm:
+            return
+        async with self._warm_lock:
+            if self._warm:
+                return
+            from datetime import datetime, timedelta, timezone
+            from sqlalchemy import select
+            from database.connection import AsyncSessionLocal
+            from database.models import Publication
+
+            since = datetime.now(timezone.utc) - timedelta(hours=config.NEAR_DUP_WINDOW_HOURS)
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(Publication.id, Publication.story_id, Publication.content, Publication.published_at)
+                    .where(Publication.published_at >= since, Publication.story_id.isnot(None))
+                    .order_by(Publication.published_at)
+                )
+                rows = result.all()
+            started = time.perf_counter()
+            now_wall, now_mono = datetime.now(timezone.utc), time.monotonic()
+            # Шинґли та MinHash рахуються в потоці пачками, щоб прогрів не блокував цикл подій
+            for start in range(0, len(rows), WARM_UP_CHUNK):
+                chunk = rows[start:start + WARM_UP_CHUNK]
+                signatures = await asyncio.to_thread(self._signatures, [row[2] for row in chunk])
+                for (pub_id, story_id, _, published_at), signature in zip(chunk, signatures):
+                    if signature is not None:
+                        age = (now_wall - published_at).total_seconds()
+                        self.index.add(pub_id, story_id, signature, expires_at=now_mono + self.index.window - age)
+            self._warm = True
+            logger.info(
+                f"🔎 Near-dup index: {len(self.index)} публікацій за {config.NEAR_DUP_WINDOW_HOURS}г "
+                f"({time.perf_counter() - started:.1f}с, bands={self.index.bands}x{self.index.rows})"
+            )
+
+    def _signatures(self, texts: list[str | None]) -> list[np.ndarray | None]:
+        return [self.hasher.signature(text or "") for text in texts]
+
+    def signature(self, text: str) -> np.ndarray | None:
+        return self.hasher.signature(text)
+
+    def find_story(self, signature: np.ndarray) -> tuple[int, float] | None:
+        return self.index.query(signature)
+
+    def add(self, publication_id: int, story_id: int, signature: np.ndarray):
+        self.index.add(publication_id, story_id, signature)
+
+
+near_dup_detector = NearDuplicateDetector()
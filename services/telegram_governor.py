@@ -0,0 +1,284 @@
+"""
+Pulse MTProto Governor — єдина точка для всіх викликів Telethon.
+Тримає token bucket на кожен метод, глобальний адаптивний ліміт (зменшується
+після FloodWait і поступово відновлюється) та пріоритети: живі оновлення
+отримують токени раніше за join та сканування історії.
+FloodWait усередині governor прокидається одразу (щоб знизити темп), а решта викликів
+того самого клієнта зберігає стандартне коротке очікування Telethon.
+"""
+import asyncio
+import contextvars
+import time
+from dataclasses import dataclass
+from enum import IntEnum
+from loguru import logger
+from telethon import TelegramClient
+from telethon.errors import FloodWaitError
+from config.settings import config
+
+
+class Priority(IntEnum):
+    """Чим менше значення — тим вищий пріоритет."""
+    LIVE = 0          # обробка нових повідомлень
+    INTERACTIVE = 1   # дії користувача в боті (валідація каналу)
+    JOIN = 2          # join/leave каналів
+    BACKFILL = 3      # сканування історії, догін, перевірки активності
+
+
+# Ліміти за замовчуванням (запитів/сек) для окремих методів
+DEFAULT_METHOD_RATES = {
+    "get_chat": 5.0,
+    "get_entity": 1.0,
+    "iter_messages": 2.0,
+    "get_messages": 1.0,
+    "iter_dialogs": 1.0,
+    "JoinChannelRequest": 0.2,
+    "LeaveChannelRequest": 0.5,
+}
+
+# Максимальний FloodWait (сек), який governor готовий "переждати" замість того, щоб віддати помилку
+MAX_WAIT_BY_PRIORITY = {
+    Priority.LIVE: 5,
+    Priority.INTERACTIVE: 30,
+    Priority.JOIN: 300,
+    Priority.BACKFILL: 900,
+}
+
+
+# Виконується виклик через governor: FloodWait не "пересипається" в Telethon, ним керує governor
+_governed: contextvars.ContextVar[bool] = contextvars.ContextVar("mtproto_governed", default=False)
+
+
+class GovernedTelegramClient(TelegramClient):
+    """
+    TelegramClient, у якого flood_sleep_threshold дорівнює 0 лише в контексті виклику governor.
+    Обробники, інструменти та внутрішні запити Telethon поза governor і далі автоматично
+    чекають короткі FloodWait (до заданого порогу, за замовчуванням 60 с).
+    """
+
+    @property
+    def flood_sleep_threshold(self):
+        return 0 if _governed.get() else self._flood_sleep_threshold
+
+    @flood_sleep_threshold.setter
+    def flood_sleep_threshold(self, value):
+        self._flood_sleep_threshold = min(value or 0, 24 * 60 * 60)
+
+
+async def _governed_iter(iterable):
+    """Прокидає кожну сторінку async-ітератора Telethon у контексті governor (без витоку в код викликача)."""
+    iterator = iterable.__aiter__()
+    while True:
+        token = _governed.set(True)
+        try:
+            item = await iterator.__anext__()
+        except StopAsyncIteration:
+            return
+        finally:
+            _governed.reset(token)
+        yield item
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Скільки секунд чекати до наступного токена (0 — можна вже)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+@dataclass
+class MethodStats:
+    calls: int = 0
+    errors: int = 0
+    flood_waits: int = 0
+    flood_wait_seconds: int = 0
+    queue_time: float = 0.0
+
+
+class MTProtoGovernor:
+    """Обмежувач запитів одного Telegram-акаунта."""
+
+    def __init__(self, name: str = "primary", global_rate: float = None, min_rate: float = None):
+        self.name = name
+        self.max_rate = global_rate or config.MTPROTO_GLOBAL_RATE
+        self.min_rate = min_rate or config.MTPROTO_MIN_RATE
+        self._global = TokenBucket(self.max_rate)
+        self._buckets: dict[str, TokenBucket] = {}
+        self._blocked_until: dict[str, float] = {}
+        # Кількість готових (не заблокованих своїм методом) очікувачів на кожному пріоритеті
+        self._ready: dict[Priority, int] = {p: 0 for p in Priority}
+        self.stats: dict[str, MethodStats] = {}
+        # Callback (name, method, seconds) — пул моніторів використовує його для ребалансування
+        self.on_flood_wait = None
+
+    @property
+    def flood_wait_count(self) -> int:
+        return sum(s.flood_waits for s in self.stats.values())
+
+    def _bucket(self, method: str) -> TokenBucket:
+        bucket = self._buckets.get(method)
+        if bucket is None:
+            bucket = TokenBucket(DEFAULT_METHOD_RATES.get(method, self.max_rate))
+            self._buckets[method] = bucket
+        return bucket
+
+    def _stats(self, method: str) -> MethodStats:
+        return self.stats.setdefault(method, MethodStats())
+
+    def _higher_priority_ready(self, priority: Priority) -> bool:
+        return any(self._ready[p] for p in Priority if p < priority)
+
+    async def acquire(self, method: str, priority: Priority = Priority.LIVE):
+        """Чекає на токен методу та глобальний токен з урахуванням пріоритету."""
+        bucket = self._bucket(method)
+        started = time.monotonic()
+        while True:
+            now = time.monotonic()
+            method_wait = max(self._blocked_until.get(method, 0) - now, bucket.wait_time(now))
+            if method_wait > 0:
+                await asyncio.sleep(min(method_wait, 1.0))
+                continue
+
+            self._ready[priority] += 1
+            try:
+                if self._higher_priority_ready(priority):
+                    await asyncio.sleep(0.02)
+                    continue
+                global_wait = self._global.wait_time(now)
+                if global_wait > 0:
+                    await asyncio.sleep(global_wait)
+                    continue
+            finally:
+                self._ready[priority] -= 1
+
+            # Між sleep та поверненням стан міг змінитися — перевіряємо метод ще раз
+            now = time.monotonic()
+            if self._blocked_until.get(method, 0) > now or bucket.wait_time(now) > 0:
+                continue
+            bucket.consume()
+            self._global.consume()
+            self._stats(method).queue_time += now - started
+            return
+
+    def report_flood_wait(self, method: str, seconds: int):
+        """Фіксує FloodWait: блокує метод і вдвічі знижує глобальний темп."""
+        stats = self._stats(method)
+        stats.flood_waits += 1
+        stats.flood_wait_seconds += seconds
+        self._blocked_until[method] = max(self._blocked_until.get(method, 0), time.monotonic() + seconds)
+        self._global.rate = max(self.min_rate, self._global.rate / 2)
+        logger.warning(
+            f"⏳ [{self.name}] FloodWait {seconds}с на {method} "
+            f"(глобальний темп → {self._global.rate:.1f} req/s)"
+        )
+        if self.on_flood_wait:
+            self.on_flood_wait(self.name, method, seconds)
+
+    def _report_success(self):
+        # Адитивне відновлення темпу після успішних запитів
+        if self._global.rate < self.max_rate:
+            self._global.rate = min(self.max_rate, self._global.rate + self.max_rate * 0.01)
+
+    async def call(self, method: str, func, *args, priority: Priority = Priority.LIVE, **kwargs):
+        """
+        Виконує виклик Telethon через governor.
+        FloodWait, довший за MAX_WAIT_BY_PRIORITY[priority], прокидається викликачу.
+        """
+        while True:
+            await self.acquire(method, priority)
+            stats = self._stats(method)
+            stats.calls += 1
+            token = _governed.set(True)
+            try:
+                result = await func(*args, **kwargs)
+                self._report_success()
+                return result
+            except FloodWaitError as e:
+                self.report_flood_wait(method, e.seconds)
+                if e.seconds > MAX_WAIT_BY_PRIORITY[priority]:
+                    raise
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                _governed.reset(token)
+
+    async def iter_messages(self, client, entity, priority: Priority = Priority.BACKFILL, **kwargs):
+        """
+        Обгортка над client.iter_messages: токен на кожну сторінку (100 повідомлень),
+        а після FloodWait — продовження з останнього отриманого id.
+        """
+        method = "iter_messages"
+        limit = kwargs.pop("limit", None)
+        yielded = 0
+        while True:
+            await self.acquire(method, priority)
+            stats = self._stats(method)
+            stats.calls += 1
+            remaining = None if limit is None else limit - yielded
+            try:
+                page = 0
+                async for message in _governed_iter(client.iter_messages(entity, limit=remaining, **kwargs)):
+                    yield message
+                    yielded += 1
+                    page += 1
+                    kwargs["offset_id"] = message.id
+                    if page >= 100:
+                        page = 0
+                        await self.acquire(method, priority)
+                        stats.calls += 1
+                self._report_success()
+                return
+            except FloodWaitError as e:
+                self.report_flood_wait(method, e.seconds)
+                if e.seconds > MAX_WAIT_BY_PRIORITY[priority]:
+                    raise
+            except Exception:
+                stats.errors += 1
+                raise
+
+    async def iter_dialogs(self, client, priority: Priority = Priority.JOIN, **kwargs):
+        """
+        Обгортка над client.iter_dialogs: токен на кожну сторінку (100 діалогів).
+        FloodWait прокидається викликачу — знімок діалогів не продовжується з середини.
+        """
+        method = "iter_dialogs"
+        await self.acquire(method, priority)
+        stats = self._stats(method)
+        stats.calls += 1
+        try:
+            page = 0
+            async for dialog in _governed_iter(client.iter_dialogs(**kwargs)):
+                yield dialog
+                page += 1
+                if page >= 100:
+                    page = 0
+                    await self.acquire(method, priority)
+                    stats.calls += 1
+            self._report_success()
+        except FloodWaitError as e:
+            self.report_flood_wait(method, e.seconds)
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+
+    def snapshot(self) -> dict:
+        """Поточні метрики по методах (для логів/моніторингу)."""
+        return {
+            "rate": round(self._global.rate, 2),
+            "methods": {m: vars(s).copy() for m, s in self.stats.items()},
+        }
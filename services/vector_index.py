@@ -0,0 +1,144 @@
+"""
+Pulse Story Vector Index — гаряче вікно ембедингів сюжетів у пам'яті воркера кластеризації.
+Тримає NumPy-матрицю нормалізованих ембедингів сюжетів, оновлених за останні
+VECTOR_INDEX_WINDOW_HOURS, разом з їх id та часом оновлення. Пошук найближчого
+сюжету — один векторизований прохід косинусної схожості без звернення до pgvector.
+Матриця відновлюється з БД при першому використанні, поповнюється інкрементально
+і періодично звільняється від сюжетів, що випали з вікна.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from loguru import logger
+from config.settings import config
+from services.ai_service import EMBEDDING_DIM
+from services.metrics import metrics
+
+# Як часто (сек) виконувати витіснення застарілих сюжетів
+EVICT_INTERVAL = 60
+
+
+class StoryVectorIndex:
+    def __init__(self, dim: int = EMBEDDING_DIM, window_hours: int = None, capacity: int = 1024):
+        self.dim = dim
+        self.window = (window_hours or config.VECTOR_INDEX_WINDOW_HOURS) * 3600
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._updated = np.zeros(capacity, dtype=np.float64)  # unix-час останнього оновлення сюжету
+        self._size = 0
+        self._rows: dict[int, int] = {}  # story_id -> рядок матриці
+        self._last_evict = time.monotonic()
+        self._warm = False
+        self._warm_lock = asyncio.Lock()
+        self._mismatched_dims: set[int] = set()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray | None:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else None
+
+    def _fits(self, v: np.ndarray) -> bool:
+        """Вектор іншої розмірності (змінили модель/EMBEDDING_DIM) не порівнюється, але й не губиться мовчки."""
+        if v.shape[0] == self.dim:
+            return True
+        metrics.inc("vector_index_dim_mismatch")
+        if v.shape[0] not in self._mismatched_dims:
+            self._mismatched_dims.add(v.shape[0])
+            logger.error(
+                f"🧭 Story vector index: ембединг розмірності {v.shape[0]} замість {self.dim} — "
+                f"такі вектори ігноруються, пошук сюжетів у пам'яті не працює. "
+                f"Перевірте EMBEDDING_DIM і розмірність колонки stories.embedding_vector"
+            )
+        return False
+
+    def _grow(self):
+        capacity = self._vectors.shape[0] * 2
+        for name in ("_vectors", "_ids", "_updated"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add(self, story_id: int, vector, updated_at: datetime):
+        """Додає або оновлює ембединг сюжету."""
+        v = self._normalize(vector)
+        if v is None or not self._fits(v):
+            return
+        row = self._rows.get(story_id)
+        if row is None:
+            if self._size == self._vectors.shape[0]:
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[story_id] = row
+            self._ids[row] = story_id
+        self._vectors[row] = v
+        self._updated[row] = updated_at.timestamp()
+
+    def touch(self, story_id: int, updated_at: datetime):
+        """Продовжує перебування сюжету у вікні (нова публікація в сюжеті)."""
+        row = self._rows.get(story_id)
+        if row is not None:
+            self._updated[row] = max(self._updated[row], updated_at.timestamp())
+
+    def evict(self):
+        """Прибирає сюжети, не оновлювані довше за вікно (ущільнює матрицю)."""
+        self._last_evict = time.monotonic()
+        if not self._size:
+            return
+        keep = self._updated[:self._size] >= time.time() - self.window
+        kept = int(keep.sum())
+        if kept == self._size:
+            return
+        self._vectors[:kept] = self._vectors[:self._size][keep]
+        self._ids[:kept] = self._ids[:self._size][keep]
+        self._updated[:kept] = self._updated[:self._size][keep]
+        self._size = kept
+        self._rows = {int(story_id): row for row, story_id in enumerate(self._ids[:kept])}
+
+    def query(self, vector, max_distance: float) -> tuple[int, float] | None:
+        """(story_id, косинусна відстань) найближчого сюжету, якщо відстань <= max_distance."""
+        if time.monotonic() - self._last_evict > EVICT_INTERVAL:
+            self.evict()
+        if not self._size:
+            return None
+        v = self._normalize(vector)
+        if v is None or not self._fits(v):
+            return None
+        similarities = self._vectors[:self._size] @ v
+        best = int(np.argmax(similarities))
+        distance = 1.0 - float(similarities[best])
+        if distance <= max_distance:
+            return int(self._ids[best]), distance
+        return None
+
+    async def warm_up(self):
+        """Завантажує з БД ембединги сюжетів, оновлених у межах вікна (один раз на процес)."""
+        if self._warm:
+            return
+        async with self._warm_lock:
+            if self._warm:
+                return
+            from sqlalchemy import select
+            from database.connection import AsyncSessionLocal
+            from database.models import Story
+
+            since = datetime.now(timezone.utc) - timedelta(seconds=self.window)
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(Story.id, Story.embedding_vector, Story.last_updated_at)
+                    .where(Story.last_updated_at >= since, Story.embedding_vector.isnot(None))
+                )
+                for story_id, embedding, updated_at in result.all():
+                    self.add(story_id, embedding, updated_at)
+            self._warm = True
+            logger.info(f"🧭 Story vector index: {self._size} сюжетів ({time.perf_counter() - started:.1f}с)")
+
+
+story_vector_index = StoryVectorIndex()
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from services import ai_scheduler as scheduler_module
+from services.ai_scheduler import AIBudgetExceeded, AIScheduler, Lane, QuotaBucket, estimate_tokens
+
+
+def test_quota_bucket_wait_time_respects_reserve():
+    bucket = QuotaBucket(60)  # 1 токен на секунду
+    now = bucket.updated
+    assert bucket.wait_time(now, 10, reserve=0.0) == 0.0
+    bucket.consume(50)
+    # Залишок 10: смуга без резерву бере 10 одразу, смуга з резервом 0.5 (30) чекає 30 с
+    assert bucket.wait_time(now, 10, reserve=0.0) == 0.0
+    assert bucket.wait_time(now, 10, reserve=0.5) == pytest.approx(30.0)
+
+
+def test_quota_bucket_refills_up_to_capacity():
+    bucket = QuotaBucket(60)
+    now = bucket.updated
+    bucket.consume(60)
+    assert bucket.wait_time(now + 5, 5, reserve=0.0) == pytest.approx(0.0)
+    bucket.wait_time(now + 600, 1, reserve=0.0)
+    assert bucket.tokens == bucket.capacity
+
+
+def test_quota_bucket_caps_oversized_request():
+    bucket = QuotaBucket(100)
+    # Запит, більший за доступну смузі частину, не чекає вічно — списується лише ця частина
+    assert bucket.wait_time(bucket.updated, 1000, reserve=0.2) == 0.0
+    bucket.consume(1000, reserve=0.2)
+    assert bucket.tokens == pytest.approx(20.0)
+
+
+def test_quota_bucket_adjust_can_go_negative():
+    bucket = QuotaBucket(100)
+    bucket.adjust(150)
+    assert bucket.tokens == pytest.approx(-50.0)
+    bucket.adjust(-1000)
+    assert bucket.tokens == bucket.capacity
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("a" * 400) == 101
+
+
+def _scheduler(rpm: int, tpm: int = 0, concurrency: int = 4) -> AIScheduler:
+    return AIScheduler(rpm=rpm, tpm=tpm, concurrency={lane: concurrency for lane in Lane})
+
+
+def test_scheduler_call_records_stats():
+    scheduler = _scheduler(rpm=0)
+
+    async def answer(value):
+        return value * 2
+
+    assert asyncio.run(scheduler.call(Lane.CLUSTERING, answer, 21, tokens=10)) == 42
+    stats = scheduler.snapshot()["lanes"]["clustering"]
+    assert stats["requests"] == 1
+    assert stats["errors"] == 0
+    assert stats["active"] == 0
+
+
+def test_scheduler_counts_provider_errors_and_releases_slot():
+    scheduler = _scheduler(rpm=0, concurrency=1)
+
+    async def fail():
+        raise RuntimeError("provider down")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await scheduler.call(Lane.DIGEST, fail)
+        # Слот смуги звільнено: наступний виклик не чекає
+        return await asyncio.wait_for(scheduler.call(Lane.DIGEST, asyncio.sleep, 0, result="ok"), 1)
+
+    assert asyncio.run(run()) == "ok"
+    assert scheduler.stats[Lane.DIGEST].errors == 1
+
+
+def test_scheduler_rejects_lower_lane_at_reserve(monkeypatch):
+    monkeypatch.setitem(scheduler_module.MAX_WAIT_BY_LANE, Lane.BACKFILL, 0.1)
+    scheduler = _scheduler(rpm=10)
+    # 5 із 10 запитів використано: backfill (резерв 50%) уже не може брати, interactive — може
+    scheduler._requests.consume(5)
+
+    async def noop():
+        return None
+
+    async def run():
+        with pytest.raises(AIBudgetExceeded):
+            await scheduler.call(Lane.BACKFILL, noop)
+        await scheduler.call(Lane.INTERACTIVE, noop)
+
+    asyncio.run(run())
+    assert scheduler.stats[Lane.BACKFILL].rejected == 1
+    assert scheduler.stats[Lane.INTERACTIVE].requests == 1
+
+
+def test_scheduler_serves_higher_lane_first():
+    scheduler = _scheduler(rpm=60)
+    # Бюджет вичерпано: обидві смуги чекають на поповнення (1 запит на секунду)
+    scheduler._requests.consume(60)
+    order = []
+
+    async def record(name):
+        order.append(name)
+
+    async def run():
+        backfill = asyncio.create_task(scheduler.call(Lane.BACKFILL, record, "backfill"))
+        await asyncio.sleep(0.05)
+        interactive = asyncio.create_task(scheduler.call(Lane.INTERACTIVE, record, "interactive"))
+        await asyncio.wait_for(interactive, 5)
+        backfill.cancel()
+
+    asyncio.run(run())
+    assert order == ["interactive"]
+
+
+def test_note_degraded():
+    scheduler = _scheduler(rpm=0)
+    scheduler.note_degraded(Lane.CLUSTERING, 3)
+    assert scheduler.snapshot()["lanes"]["clustering"]["degraded"] == 3
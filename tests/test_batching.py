@@ -0,0 +1,107 @@
+import asyncio
+from services.batching import MicroBatcher
+
+
+class Recorder:
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [item * 10 for item in items]
+
+
+def test_full_batch_is_sent_without_delay():
+    process = Recorder()
+    batcher = MicroBatcher(process, batch_size=3, max_delay=10, name="test")
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(3))), 1)
+
+    assert asyncio.run(run()) == [0, 10, 20]
+    assert process.batches == [[0, 1, 2]]
+    assert (batcher.requests, batcher.items) == (1, 3)
+
+
+def test_partial_batch_waits_for_max_delay():
+    process = Recorder()
+    batcher = MicroBatcher(process, batch_size=10, max_delay=0.05, name="test")
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(4)))
+
+    assert asyncio.run(run()) == [0, 10, 20, 30]
+    assert process.batches == [[0, 1, 2, 3]]
+
+
+def test_overflow_goes_to_next_batch():
+    process = Recorder()
+    batcher = MicroBatcher(process, batch_size=2, max_delay=0.05, name="test")
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert asyncio.run(run()) == [0, 10, 20, 30, 40]
+    assert process.batches == [[0, 1], [2, 3], [4]]
+
+
+def test_wait_for_more_false_sends_immediately():
+    process = Recorder()
+    batcher = MicroBatcher(process, batch_size=10, max_delay=10, name="test", wait_for_more=lambda: False)
+    assert asyncio.run(asyncio.wait_for(batcher.submit(7), 1)) == 70
+    assert process.batches == [[7]]
+
+
+def test_wait_for_more_groups_until_last_candidate():
+    process = Recorder()
+    waiting = {"count": 3}
+
+    def wait_for_more():
+        waiting["count"] -= 1
+        return waiting["count"] > 0
+
+    batcher = MicroBatcher(process, batch_size=10, max_delay=10, name="test", wait_for_more=wait_for_more)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(3))), 1)
+
+    assert asyncio.run(run()) == [0, 10, 20]
+    assert process.batches == [[0, 1, 2]]
+
+
+def test_batch_error_returns_error_result():
+    batcher = MicroBatcher(Recorder(fail=True), batch_size=2, max_delay=0.01, name="test", error_result="fallback")
+
+    async def run():
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2))
+
+    assert asyncio.run(run()) == ["fallback", "fallback"]
+
+
+def test_propagated_error_reaches_every_caller():
+    async def process(items):
+        raise KeyError("not recorded")
+
+    batcher = MicroBatcher(process, batch_size=2, max_delay=0.01, name="test", error_result="fallback",
+                           propagate=(KeyError,))
+
+    async def run():
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    assert all(isinstance(r, KeyError) for r in asyncio.run(run()))
+
+
+def test_per_item_exception_fails_only_its_caller():
+    async def process(items):
+        return [KeyError(item) if item == 2 else item * 10 for item in items]
+
+    batcher = MicroBatcher(process, batch_size=3, max_delay=0.01, name="test")
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(1, 4)), return_exceptions=True)
+
+    first, second, third = asyncio.run(run())
+    assert (first, third) == (10, 30) and isinstance(second, KeyError)
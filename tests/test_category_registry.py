@@ -0,0 +1,53 @@
+import asyncio
+import time
+from services.category_registry import CategoryEntry, CategoryRegistry, clean_name
+
+
+def test_clean_name_strips_emoji_prefix():
+    assert clean_name("⚽ Спорт") == "Спорт"
+    assert clean_name("🇺🇦 Україна") == "Україна"
+    assert clean_name("📍 Київ") == "Київ"
+    assert clean_name("  Економіка ") == "Економіка"
+    assert clean_name("5G мережі") == "5G мережі"
+    assert clean_name("") == ""
+    assert clean_name(None) == ""
+
+
+def _registry(*entries: CategoryEntry) -> CategoryRegistry:
+    # Знімок уже завантажено й звірено щойно — refresh не йде в БД
+    registry = CategoryRegistry(refresh_interval=3600)
+    registry._by_name = {e.name.lower(): e for e in entries}
+    registry._version = "test"
+    registry._checked_at = time.monotonic()
+    return registry
+
+
+def test_get_by_name_or_label_case_insensitive():
+    sport = CategoryEntry(1, "Спорт", "⚽")
+    registry = _registry(sport, CategoryEntry(2, "Економіка", "💵"))
+
+    async def run():
+        return [await registry.get(value) for value in ("Спорт", "спорт", "⚽ Спорт", "🏆 СПОРТ", " спорт ")]
+
+    assert asyncio.run(run()) == [sport] * 5
+    assert sport.label == "⚽ Спорт"
+
+
+def test_get_unknown_or_empty():
+    registry = _registry(CategoryEntry(1, "Спорт", "⚽"))
+
+    async def run():
+        return [await registry.get(value) for value in ("Культура", "", None)]
+
+    assert asyncio.run(run()) == [None, None, None]
+
+
+def test_all_filters_hidden():
+    registry = _registry(CategoryEntry(1, "Спорт", "⚽"), CategoryEntry(2, "Архів", "🗄", is_visible=False))
+
+    async def run():
+        return await registry.names(), await registry.labels(visible_only=False)
+
+    names, labels = asyncio.run(run())
+    assert names == ["Спорт"]
+    assert labels == ["⚽ Спорт", "🗄 Архів"]
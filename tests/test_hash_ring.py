@@ -0,0 +1,42 @@
+from services.monitor_pool import HashRing
+
+
+def test_empty_ring():
+    assert HashRing().get(1) is None
+
+
+def test_assignment_is_stable_and_covers_all_nodes():
+    ring = HashRing(["shard0", "shard1", "shard2"])
+    owners = {ch: ring.get(ch) for ch in range(3000)}
+    assert owners == {ch: HashRing(["shard0", "shard1", "shard2"]).get(ch) for ch in range(3000)}
+    counts = {node: list(owners.values()).count(node) for node in ("shard0", "shard1", "shard2")}
+    # Віртуальні вузли дають приблизно рівний розподіл
+    assert all(600 < c < 1400 for c in counts.values()), counts
+
+
+def test_adding_node_moves_only_its_share():
+    ring = HashRing(["shard0", "shard1"])
+    before = {ch: ring.get(ch) for ch in range(3000)}
+    ring.add("shard2")
+    after = {ch: ring.get(ch) for ch in range(3000)}
+    moved = [ch for ch in before if before[ch] != after[ch]]
+    # Переїжджають лише канали нового вузла
+    assert all(after[ch] == "shard2" for ch in moved)
+    assert 500 < len(moved) < 1500
+
+
+def test_remove_restores_previous_assignment():
+    ring = HashRing(["shard0", "shard1"])
+    before = {ch: ring.get(ch) for ch in range(500)}
+    ring.add("shard2")
+    ring.remove("shard2")
+    assert {ch: ring.get(ch) for ch in range(500)} == before
+
+
+def test_exclude_skips_to_next_node():
+    ring = HashRing(["shard0", "shard1", "shard2"])
+    for ch in range(200):
+        owner = ring.get(ch)
+        fallback = ring.get(ch, exclude={owner})
+        assert fallback is not None and fallback != owner
+    assert ring.get(7, exclude={"shard0", "shard1", "shard2"}) is None
@@ -0,0 +1,77 @@
+import asyncio
+from sqlalchemy.exc import IntegrityError, OperationalError
+from services.ingest import PublicationWriter
+
+
+class FakeDB:
+    """Підміна PublicationWriter._write: відхиляє пакети з «отруйними» рядками."""
+
+    def __init__(self, poison=(), down: bool = False):
+        self.poison = set(poison)
+        self.down = down
+        self.saved = []
+        self.watermarks = {}
+
+    async def __call__(self, rows, watermarks):
+        if self.down:
+            raise OperationalError("INSERT", {}, ConnectionError("db down"))
+        if any(row["telegram_message_id"] in self.poison for row in rows):
+            raise IntegrityError("INSERT", {}, ValueError("fk violation"))
+        self.saved += [row["telegram_message_id"] for row in rows]
+        self.watermarks.update(watermarks)
+        return []
+
+
+def _row(message_id: int, channel_id: int = 1) -> dict:
+    return {"channel_id": channel_id, "telegram_message_id": message_id}
+
+
+def _writer(db: FakeDB, **kwargs) -> PublicationWriter:
+    writer = PublicationWriter(**kwargs)
+    writer._write = db
+    return writer
+
+
+def test_poison_rows_are_dropped_and_rest_saved():
+    db = FakeDB(poison={3, 6})
+    writer = _writer(db, batch_size=100, flush_interval=10)
+
+    async def run():
+        for i in range(1, 9):
+            await writer.add(_row(i))
+        await writer.flush()
+
+    asyncio.run(run())
+    assert sorted(db.saved) == [1, 2, 4, 5, 7, 8]
+    assert db.watermarks == {1: 8}
+    assert writer.pending == 0
+
+
+def test_transient_error_keeps_batch_for_retry():
+    db = FakeDB(down=True)
+    writer = _writer(db, batch_size=100, flush_interval=10)
+
+    async def run():
+        await writer.add(_row(1))
+        await writer.flush()
+
+    asyncio.run(run())
+    assert writer.pending == 1 and db.saved == []
+
+
+def test_full_buffer_waits_for_db():
+    db = FakeDB(down=True)
+    writer = _writer(db, batch_size=2, flush_interval=0.01, max_buffer=4)
+
+    async def run():
+        for i in range(4):
+            await writer.add(_row(i))
+        blocked = asyncio.create_task(writer.add(_row(10)))
+        await asyncio.sleep(0.05)
+        assert not blocked.done() and writer.pending == 4
+        db.down = False
+        await asyncio.wait_for(blocked, 1)
+
+    asyncio.run(run())
+    assert sorted(db.saved) == [0, 1, 2, 3]
+    assert writer.pending == 1
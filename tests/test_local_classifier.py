@@ -0,0 +1,57 @@
+import numpy as np
+from services.local_classifier import LinearTextModel, channel_prior, combine, featurize
+
+N_FEATURES = 2 ** 12
+SPORT = ["футбол матч гол збірна перемога", "тренер збірної оголосив склад на матч",
+         "гол у другому таймі приніс перемогу", "чемпіонат з футболу стартує завтра"]
+ECONOMY = ["курс гривні долар банк інфляція", "нацбанк змінив облікову ставку",
+           "інфляція сповільнилась за даними банку", "ціни на пальне та курс долара зросли"]
+
+
+def _trained() -> LinearTextModel:
+    texts = SPORT + ECONOMY
+    labels = np.array([0] * len(SPORT) + [1] * len(ECONOMY))
+    model = LinearTextModel(["⚽ Спорт", "💵 Економіка"], n_features=N_FEATURES)
+    model.fit([featurize(t, N_FEATURES) for t in texts], labels, epochs=30, batch_size=4)
+    return model
+
+
+def test_featurize_is_l2_normalized():
+    indices, values = featurize("Гол! Гол, гол у матчі", N_FEATURES)
+    assert len(indices) == len(set(indices.tolist()))
+    assert abs(np.linalg.norm(values) - 1) < 1e-6
+    assert len(featurize("", N_FEATURES)[0]) == 0
+
+
+def test_untrained_model_is_uniform():
+    model = LinearTextModel(["a", "b", "c"], n_features=N_FEATURES)
+    proba = model.predict_proba([featurize("будь-який текст", N_FEATURES)])[0]
+    assert np.allclose(proba, 1 / 3)
+
+
+def test_fit_separates_classes():
+    model = _trained()
+    proba = model.predict_proba([featurize("збірна забила гол у матчі", N_FEATURES),
+                                 featurize("банк підняв ставку через інфляцію", N_FEATURES)])
+    assert proba[0].argmax() == 0 and proba[1].argmax() == 1
+    assert np.allclose(proba.sum(axis=1), 1.0)
+
+
+def test_save_load_roundtrip(tmp_path):
+    model = _trained()
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = LinearTextModel.load(path)
+    assert loaded.classes == model.classes and loaded.n_features == N_FEATURES
+    features = [featurize("курс долара в банку", N_FEATURES)]
+    # Ваги зберігаються у float16 — невелика похибка
+    assert np.allclose(loaded.predict_proba(features), model.predict_proba(features), atol=1e-2)
+
+
+def test_channel_prior_shifts_prediction():
+    prior = channel_prior({"💵 Економіка": 50}, ["⚽ Спорт", "💵 Економіка"])
+    assert prior[1] > prior[0] and abs(prior.sum() - 1) < 1e-6
+    text_proba = np.array([0.55, 0.45], dtype=np.float32)
+    assert combine(text_proba, prior, prior_weight=1.0).argmax() == 1
+    assert combine(text_proba, prior, prior_weight=0.0) is text_proba
+    assert combine(text_proba, None, prior_weight=1.0) is text_proba
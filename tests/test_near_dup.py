@@ -0,0 +1,61 @@
+import time
+import numpy as np
+from services.near_dup import LSHIndex, MinHasher, jaccard, optimal_bands, shingles
+
+BASE = ("Уряд ухвалив постанову про підвищення мінімальної зарплати з першого січня наступного року "
+        "до восьми тисяч гривень, повідомили в міністерстві економіки після засідання")
+REWRITE = ("Уряд ухвалив постанову про підвищення мінімальної зарплати з першого січня наступного року "
+           "до восьми тисяч гривень, повідомили в міністерстві фінансів увечері")
+OTHER = ("Збірна України з футболу перемогла суперників у відбірковому матчі чемпіонату Європи "
+         "з рахунком два нуль завдяки голам у другому таймі")
+
+
+def test_shingles_and_jaccard():
+    assert shingles("Раз, два! Три чотири", size=3) == {"раз два три", "два три чотири"}
+    assert shingles("два слова", size=3) == {"два слова"}
+    assert shingles("", size=3) == set()
+    assert jaccard({"a", "b"}, {"b", "c"}) == 1 / 3
+    assert jaccard(set(), {"a"}) == 0.0
+
+
+def test_optimal_bands_fit_signature():
+    for threshold in (0.3, 0.5, 0.8):
+        bands, rows = optimal_bands(threshold, 128)
+        assert bands * rows <= 128
+    # Вищий поріг — довші смуги
+    assert optimal_bands(0.8, 128)[1] >= optimal_bands(0.3, 128)[1]
+
+
+def test_signature_is_deterministic_and_estimates_jaccard():
+    hasher = MinHasher(num_perm=256)
+    a, b = hasher.signature(BASE), hasher.signature(REWRITE)
+    assert np.array_equal(a, MinHasher(num_perm=256).signature(BASE))
+    estimate = np.count_nonzero(a == b) / 256
+    assert abs(estimate - jaccard(shingles(BASE), shingles(REWRITE))) < 0.15
+
+
+def test_signature_none_for_short_text():
+    assert MinHasher().signature("Тривога!") is None
+
+
+def test_lsh_finds_rewrite_but_not_other_topic():
+    hasher = MinHasher()
+    index = LSHIndex(threshold=0.5, num_perm=hasher.num_perm, window_hours=1)
+    index.add(1, story_id=10, signature=hasher.signature(BASE))
+    match = index.query(hasher.signature(REWRITE))
+    assert match is not None and match[0] == 10 and match[1] >= 0.5
+    assert index.query(hasher.signature(OTHER)) is None
+
+
+def test_lsh_remove_and_expiry():
+    hasher = MinHasher()
+    index = LSHIndex(threshold=0.5, num_perm=hasher.num_perm, window_hours=1)
+    signature = hasher.signature(BASE)
+    index.add(1, 10, signature)
+    index.remove(1)
+    assert len(index) == 0 and index.query(signature) is None
+    # Прострочений запис не повертається й вичищається при наступному додаванні
+    index.add(2, 20, signature, expires_at=time.monotonic() - 1)
+    assert index.query(signature) is None
+    index.add(3, 30, hasher.signature(OTHER))
+    assert len(index) == 1
@@ -0,0 +1,102 @@
+"""
+Мікро-бенчмарк фільтра реклами: старий лінійний скан маркерів проти скомпільованого AdFilter.
+
+Використання:
+    python -m tools.bench_ad_filter --dump corpus.jsonl --limit 5000   # зняти корпус з БД
+    python -m tools.bench_ad_filter --corpus corpus.jsonl              # прогнати бенчмарк
+
+Корпус — JSONL з полями "content" та "category" (категорія каналу).
+Старий варіант міряється без звернення до БД за категорією, тобто реальна різниця ще більша.
+"""
+import argparse
+import asyncio
+import json
+import time
+from services.ad_filter import AD_MARKERS, CONTEXT_EXCEPTIONS, AdFilter
+
+
+def legacy_is_ad(text: str, category: str | None) -> bool:
+    """Копія логіки ChannelMonitor.is_ad до переходу на скомпільований матчер."""
+    if not text:
+        return False
+    ad_markers = list(AD_MARKERS)
+    context_exceptions = []
+    if category:
+        cat = category.lower()
+        for needles, markers in CONTEXT_EXCEPTIONS:
+            if any(n in cat for n in needles):
+                context_exceptions.extend(markers)
+    text_lower = text.lower()
+    for marker in ad_markers:
+        if marker in text_lower:
+            if any(exc in marker for exc in context_exceptions):
+                continue
+            return True
+    return False
+
+
+async def dump_corpus(path: str, limit: int):
+    from sqlalchemy import select
+    from database.connection import AsyncSessionLocal
+    from database.models import Channel, Publication
+
+    async with AsyncSessionLocal() as session:
+        stmt = (
+            select(Publication.content, Channel.category)
+            .join(Channel, Publication.channel_id == Channel.id)
+            .where(Publication.content != None)
+            .order_by(Publication.published_at.desc())
+            .limit(limit)
+        )
+        rows = (await session.execute(stmt)).all()
+
+    with open(path, "w", encoding="utf-8") as f:
+        for content, category in rows:
+            f.write(json.dumps({"content": content, "category": category}, ensure_ascii=False) + "\n")
+    print(f"Записано {len(rows)} публікацій у {path}")
+
+
+def load_corpus(path: str) -> list[tuple[str, str | None]]:
+    with open(path, encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    return [(i.get("content") or "", i.get("category")) for i in items]
+
+
+def run(name: str, func, corpus, repeat: int) -> list[bool]:
+    results = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(text, cat) for text, cat in corpus]
+    elapsed = time.perf_counter() - start
+    rate = len(corpus) * repeat / elapsed if elapsed else float("inf")
+    print(f"{name:<12} {rate:>12,.0f} msg/s  ({elapsed:.3f}s, {sum(results)} ads)")
+    return results
+
+
+def bench(path: str, repeat: int):
+    corpus = load_corpus(path)
+    if not corpus:
+        print("Корпус порожній")
+        return
+    print(f"Корпус: {len(corpus)} публікацій × {repeat} повторів")
+
+    compiled = AdFilter()
+    old = run("legacy", legacy_is_ad, corpus, repeat)
+    new = run("compiled", compiled.is_ad, corpus, repeat)
+
+    mismatches = sum(1 for a, b in zip(old, new) if a != b)
+    print(f"Розбіжностей між реалізаціями: {mismatches}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL-корпус публікацій для бенчмарку")
+    parser.add_argument("--dump", help="Зняти корпус з БД у вказаний файл")
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.dump:
+        asyncio.run(dump_corpus(args.dump, args.limit))
+    if args.corpus:
+        bench(args.corpus, args.repeat)
@@ -0,0 +1,157 @@
+"""
+Бенчмарк AI-частини конвеєра кластеризації без мережі та БД: ембединг (кеш у пам'яті +
+мікро-батчинг) і метадані нових сюжетів (пакетні запити, як у cluster_publication),
+плюс денний дайджест посеред навантаження. Пропускна здатність, кількість запитів до
+провайдера, затримка на публікацію (p50/p95), а також по смугах планувальника AI —
+час у черзі, затримка провайдера, відхилені запити й екстрактивні (деградовані) результати.
+
+Використання:
+    python -m tools.bench_ai_pipeline                                        # mock-провайдер
+    python -m tools.bench_ai_pipeline --texts 2000 --workers 16 --latency 0.5 --failure-rate 0.05
+    python -m tools.bench_ai_pipeline --corpus corpus.jsonl                  # корпус з tools.bench_near_dup --dump
+    python -m tools.bench_ai_pipeline --rpm 60 --backfill-share 0.5          # вичерпання бюджету
+    LLM_PROVIDER=gemini python -m tools.bench_ai_pipeline --provider env --cassette record --texts 200
+    python -m tools.bench_ai_pipeline --provider env --cassette replay --corpus corpus.jsonl --texts 200
+
+--provider env — провайдер із налаштувань (LLM_PROVIDER); --cassette record записує його
+відповіді в LLM_CASSETTE_PATH, replay відтворює їх на ізольованій машині.
+Метадані сюжетів записуються й по одній новині, тож відтворення не залежить від складу
+пакетів; якщо відповіді бракує, бенчмарк завершується з помилкою (результат не порівнюваний).
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from config.settings import config
+import services.ai_service as ai
+from services.ai_scheduler import AIScheduler, Lane
+from services.batching import MicroBatcher
+from services.clustering import StoryCandidates
+from services.embedding_cache import EmbeddingCache
+from services.llm_provider import CassetteMiss, CassetteProvider, MockProvider, create_provider
+
+TOPICS = ("обстріл області", "засідання уряду", "курс гривні", "матч збірної", "новий закон", "запуск ракети")
+
+
+def synthetic_texts(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n):
+        if texts and rng.random() < 0.15:
+            texts.append(rng.choice(texts))  # репост — має влучити в кеш ембедингів
+        else:
+            topic = rng.choice(TOPICS)
+            texts.append(f"Новина {i}: {topic}. Подробиці події {rng.randrange(10 ** 6)} від джерела, "
+                         f"коментарі та реакція. Слідкуйте за оновленнями.")
+    return texts
+
+
+def pct(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)] * 1000
+
+
+async def bench(texts: list[str], workers: int, backfill_share: float):
+    candidates = StoryCandidates()
+
+    def story_batcher(lane: Lane, name: str) -> MicroBatcher:
+        return MicroBatcher(
+            lambda batch: ai.generate_story_info_batch(batch, lane),
+            batch_size=config.STORY_BATCH_SIZE,
+            max_delay=config.STORY_BATCH_MAX_DELAY,
+            name=name,
+            wait_for_more=lambda: candidates.count > 0,
+            propagate=(CassetteMiss,),
+        )
+
+    batchers = {Lane.CLUSTERING: story_batcher(Lane.CLUSTERING, "story_info"),
+                Lane.BACKFILL: story_batcher(Lane.BACKFILL, "story_info_backfill")}
+    rng = random.Random(1)
+    queue: asyncio.Queue = asyncio.Queue()
+    for text in texts:
+        queue.put_nowait((Lane.BACKFILL if rng.random() < backfill_share else Lane.CLUSTERING, text))
+    latencies: list[float] = []
+
+    async def worker():
+        while not queue.empty():
+            lane, text = queue.get_nowait()
+            t0 = time.perf_counter()
+            try:
+                with candidates.track():
+                    await ai.get_text_embedding(text, lane)
+                    with candidates.paused():
+                        await batchers[lane].submit(text)
+            except CassetteMiss:
+                continue  # рахується в provider.misses — бенчмарк завершиться з помилкою
+            latencies.append(time.perf_counter() - t0)
+
+    digest_time = 0.0
+
+    async def digest():
+        # Розсилка стартує, коли кластеризація вже навантажила провайдера
+        nonlocal digest_time
+        await asyncio.sleep(0.5)
+        t0 = time.perf_counter()
+        await ai.generate_daily_digest({"other_news": [{"channel": "bench", "text": t} for t in texts[:20]]})
+        digest_time = time.perf_counter() - t0
+
+    started = time.perf_counter()
+    await asyncio.gather(digest(), *(worker() for _ in range(workers)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(texts)} publications, {workers} workers, provider {ai.llm.name}")
+    print(f"  throughput: {len(texts) / elapsed:,.1f} publications/s ({elapsed:.1f}s)")
+    print(f"  latency:    p50 {pct(latencies, 0.5):.0f} ms, p95 {pct(latencies, 0.95):.0f} ms")
+    for batcher in (ai.embedding_batcher, ai.backfill_embedding_batcher):
+        print(f"  {batcher.name}: {batcher.requests} requests for {batcher.items} texts")
+    print(f"  embedding cache: {len(ai.embedding_cache)} entries")
+    for lane, batcher in batchers.items():
+        print(f"  stories ({lane.name.lower()}): {batcher.requests} batch requests for {batcher.items} items")
+    print(f"  digest:     {digest_time * 1000:.0f} ms")
+    snapshot = ai.ai_scheduler.snapshot()
+    print(f"  budget left: {snapshot['rpm_available']} requests, {snapshot['tpm_available']} tokens")
+    for name, s in snapshot["lanes"].items():
+        if s["requests"] or s["rejected"]:
+            print(f"  lane {name:<11} {s['requests']:>5} requests, queue avg {s['avg_queue_time'] * 1000:.0f} ms, "
+                  f"latency avg {s['avg_latency'] * 1000:.0f} ms, {s['errors']} errors, "
+                  f"{s['rejected']} rejected, {s['degraded']} degraded")
+    inner = getattr(ai.llm, "inner", ai.llm)
+    if isinstance(inner, MockProvider):
+        print(f"  mock calls: {inner.calls}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", choices=("mock", "env"), default="mock")
+    parser.add_argument("--cassette", choices=("record", "replay"))
+    parser.add_argument("--corpus", help="JSONL з полем content")
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=config.CLUSTER_WORKERS)
+    parser.add_argument("--latency", type=float, default=config.MOCK_LLM_LATENCY)
+    parser.add_argument("--failure-rate", type=float, default=config.MOCK_LLM_FAILURE_RATE)
+    parser.add_argument("--rpm", type=int, default=config.AI_RPM_LIMIT, help="Бюджет запитів/хв (0 — без обмеження)")
+    parser.add_argument("--tpm", type=int, default=config.AI_TPM_LIMIT, help="Бюджет токенів/хв (0 — без обмеження)")
+    parser.add_argument("--backfill-share", type=float, default=0.0, help="Частка публікацій у смузі backfill")
+    args = parser.parse_args()
+
+    if args.provider == "mock":
+        provider = MockProvider(latency=args.latency, failure_rate=args.failure_rate)
+        if args.cassette:
+            provider = CassetteProvider(provider, config.LLM_CASSETTE_PATH, args.cassette)
+    else:
+        provider = create_provider(cassette_mode=args.cassette)
+    ai.llm = provider
+    ai.embedding_cache = EmbeddingCache(provider.embedding_model, ai.EMBEDDING_DIM, persist=False)
+    ai.ai_scheduler = AIScheduler(rpm=args.rpm, tpm=args.tpm)
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [json.loads(line)["content"] for line in f if line.strip()]
+        corpus = [t for t in corpus if t][:args.texts]
+    else:
+        corpus = synthetic_texts(args.texts)
+    asyncio.run(bench(corpus, args.workers, args.backfill_share))
+    if isinstance(provider, CassetteProvider) and provider.misses:
+        raise SystemExit(f"cassette {args.cassette}: {provider.misses} requests not found in {provider.path}")
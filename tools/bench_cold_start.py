@@ -0,0 +1,66 @@
+"""
+Бенчмарк холодного старту монітора: час від запуску до першого обробленого live-повідомлення
+та до першої збереженої публікації, плюс кількість API-запитів за період прогріву.
+
+Використання:
+    python -m tools.bench_cold_start                      # з персистентним кешем сутностей
+    python -m tools.bench_cold_start --no-entity-cache    # як до появи кешу (resolve/join/get_chat)
+
+Запускати на робочій сесії з підписаними каналами; скрипт чекає на перше повідомлення
+не довше --timeout секунд. Порівнюйте get_chat / JoinChannelRequest / get_entity у звіті.
+"""
+import argparse
+import asyncio
+import time
+from loguru import logger
+
+
+async def run(use_entity_cache: bool, timeout: float):
+    from services.ingest import publication_writer
+    from services.monitor import monitor
+
+    monitor.entities.enabled = use_entity_cache
+    started = time.perf_counter()
+    marks: dict[str, float] = {}
+    first_message = asyncio.Event()
+
+    def on_saved(publication_ids: list[int]):
+        marks.setdefault("first_publication_saved", time.perf_counter() - started)
+
+    publication_writer.add_listener(on_saved)
+
+    original_handler = monitor.handle_new_message
+
+    async def timed_handler(event):
+        await original_handler(event)
+        if "first_live_message" not in marks and event.chat_id in monitor.active_channels:
+            marks["first_live_message"] = time.perf_counter() - started
+            first_message.set()
+
+    monitor.handle_new_message = timed_handler
+
+    try:
+        await monitor.start()
+        marks["client_ready"] = time.perf_counter() - started
+        try:
+            await asyncio.wait_for(first_message.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Жодного live-повідомлення за {timeout}с")
+        snapshot = monitor.governor.snapshot()
+    finally:
+        await monitor.stop()
+
+    print(f"\nEntity cache: {'on' if use_entity_cache else 'off'}")
+    for name, value in sorted(marks.items(), key=lambda kv: kv[1]):
+        print(f"  {name:<26} {value:8.2f} s")
+    print("  API calls during warm-up:")
+    for method, stats in sorted(snapshot["methods"].items()):
+        print(f"    {method:<24} {stats['calls']:6d} calls, {stats['flood_waits']} FloodWait")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-entity-cache", action="store_true", help="Не використовувати channel_entities")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+    asyncio.run(run(not args.no_entity_cache, args.timeout))
@@ -0,0 +1,71 @@
+"""
+Бенчмарк мікро-батчингу ембедингів на локальному фейковому провайдері (без мережі та ключів).
+
+Порівнює послідовні запити по одному тексту з EmbeddingBatcher за тієї ж конкурентності:
+пропускна здатність, кількість запитів до провайдера та затримка виклику embed() (p50/p95).
+
+Використання:
+    python -m tools.bench_embedding_batcher
+    python -m tools.bench_embedding_batcher --texts 2000 --concurrency 64 --batch-size 32 --max-delay 0.02
+    python -m tools.bench_embedding_batcher --latency 0.3 --per-item 0.001 --max-inflight 8
+"""
+import argparse
+import asyncio
+import math
+import time
+from config.settings import config
+from services.embedding_batcher import EmbeddingBatcher, FakeEmbeddingProvider
+
+
+def pct(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)] * 1000
+
+
+async def run(texts: list[str], concurrency: int, embed) -> tuple[float, list[float]]:
+    """Прогін texts через embed з обмеженням конкурентності; повертає (тривалість, затримки)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(text: str):
+        async with semaphore:
+            t0 = time.perf_counter()
+            await embed(text)
+            latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(t) for t in texts))
+    return time.perf_counter() - started, latencies
+
+
+async def bench(n: int, concurrency: int, batch_size: int, max_delay: float, latency: float, per_item: float,
+                max_inflight: int):
+    texts = [f"Публікація {i}: тестовий текст новини для ембедингу" for i in range(n)]
+    print(f"{n} texts, concurrency {concurrency}, provider latency {latency * 1000:.0f} ms + "
+          f"{per_item * 1000:.1f} ms/text, {max_inflight} requests in flight")
+
+    provider = FakeEmbeddingProvider(latency=latency, per_item=per_item, max_inflight=max_inflight)
+    elapsed, lat = await run(texts, concurrency, lambda t: provider.embed_many([t]))
+    print(f"  unbatched: {n / elapsed:8,.0f} texts/s, {provider.calls} requests, "
+          f"p50 {pct(lat, 0.5):.1f} ms, p95 {pct(lat, 0.95):.1f} ms")
+
+    provider = FakeEmbeddingProvider(latency=latency, per_item=per_item, max_inflight=max_inflight)
+    batcher = EmbeddingBatcher(provider.embed_many, batch_size=batch_size, max_delay=max_delay)
+    elapsed, lat = await run(texts, concurrency, batcher.embed)
+    print(f"  batched:   {n / elapsed:8,.0f} texts/s, {provider.calls} requests "
+          f"(avg {batcher.items / max(batcher.requests, 1):.1f} texts, size {batch_size}, delay {max_delay * 1000:.0f} ms), "
+          f"p50 {pct(lat, 0.5):.1f} ms, p95 {pct(lat, 0.95):.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=config.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--max-delay", type=float, default=config.EMBEDDING_BATCH_MAX_DELAY)
+    parser.add_argument("--latency", type=float, default=0.15, help="Фіксована затримка запиту провайдера (сек)")
+    parser.add_argument("--per-item", type=float, default=0.002, help="Додаткова затримка на текст (сек)")
+    parser.add_argument("--max-inflight", type=int, default=4, help="Ліміт одночасних запитів до провайдера")
+    args = parser.parse_args()
+    asyncio.run(bench(args.texts, args.concurrency, args.batch_size, args.max_delay, args.latency, args.per_item,
+                      args.max_inflight))
@@ -0,0 +1,127 @@
+"""
+Бенчмарк етапу майже-дублікатів (MinHash/LSH): пропускна здатність та повнота/точність
+відносно точної схожості Жаккара шинґлів.
+
+Використання:
+    python -m tools.bench_near_dup --dump corpus.jsonl --hours 48 --limit 5000   # зняти корпус з БД
+    python -m tools.bench_near_dup --corpus corpus.jsonl                         # записаний корпус
+    python -m tools.bench_near_dup --corpus corpus.jsonl --rewrites              # + синтетичні переписування
+    python -m tools.bench_near_dup --corpus corpus.jsonl --threshold 0.5
+
+Корпус — JSONL з полем "content" у хронологічному порядку. Документи додаються в індекс
+по черзі; кожен спершу шукається серед попередніх (як у cluster_publication).
+Еталон — точний Жаккар шинґлів (O(n²), тому для оцінки якості береться --quality-limit документів).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from config.settings import config
+from services.near_dup import LSHIndex, MinHasher, jaccard, shingles
+
+
+async def dump_corpus(path: str, hours: int, limit: int):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import select
+    from database.connection import AsyncSessionLocal
+    from database.models import Publication
+
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Publication.id, Publication.channel_id, Publication.content)
+            .where(Publication.published_at >= since, Publication.content.isnot(None))
+            .order_by(Publication.published_at)
+            .limit(limit)
+        )
+        rows = result.all()
+    with open(path, "w", encoding="utf-8") as f:
+        for pub_id, channel_id, content in rows:
+            f.write(json.dumps({"id": pub_id, "channel_id": channel_id, "content": content}, ensure_ascii=False) + "\n")
+    print(f"Saved {len(rows)} publications to {path}")
+
+
+def rewrite(text: str, rng: random.Random) -> str:
+    """Імітація переписування іншим каналом: емодзі/підпис, пропуск і заміна частини слів."""
+    words = text.split()
+    out = [w for w in words if rng.random() > 0.08]
+    for _ in range(max(1, len(out) // 25)):
+        if out:
+            out[rng.randrange(len(out))] = rng.choice(("терміново", "джерело", "заявив", "повідомили"))
+    return "⚡️ " + " ".join(out) + "\n\n👉 Підписатися @other_channel"
+
+
+def bench(texts: list[str], threshold: float, quality_limit: int, with_rewrites: bool):
+    hasher = MinHasher()
+    index = LSHIndex(threshold=threshold)
+    print(f"Corpus: {len(texts)} docs, threshold={threshold}, perm={hasher.num_perm}, bands={index.bands}x{index.rows}")
+
+    started = time.perf_counter()
+    signatures = [hasher.signature(t) for t in texts]
+    sig_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    found: dict[int, int] = {}
+    for i, sig in enumerate(signatures):
+        if sig is None:
+            continue
+        match = index.query(sig)
+        if match:
+            found[i] = match[0]
+        index.add(i, i, sig)
+    index_time = time.perf_counter() - started
+
+    indexed = sum(s is not None for s in signatures)
+    print(f"  signatures: {len(texts) / sig_time:,.0f} docs/s ({indexed} with enough shingles)")
+    print(f"  query+add:  {indexed / max(index_time, 1e-9):,.0f} docs/s, matches: {len(found)}")
+
+    # Якість на префіксі корпусу відносно точного Жаккара
+    n = min(quality_limit, len(texts))
+    shingle_sets = [shingles(t) for t in texts[:n]]
+    truth: dict[int, set[int]] = {}
+    for i in range(n):
+        if signatures[i] is None:
+            continue
+        for j in range(i):
+            if signatures[j] is not None and jaccard(shingle_sets[i], shingle_sets[j]) >= threshold:
+                truth.setdefault(i, set()).add(j)
+    hits = sum(1 for i in truth if found.get(i) is not None)
+    predicted = [i for i in found if i < n]
+    correct = sum(1 for i in predicted if jaccard(shingle_sets[i], shingle_sets[found[i]]) >= threshold - 0.1)
+    print(f"  quality on first {n}: {len(truth)} docs with a true near-duplicate")
+    print(f"    recall    {hits / len(truth):.3f}" if truth else "    recall    n/a")
+    print(f"    precision {correct / len(predicted):.3f} (exact jaccard >= threshold-0.1)" if predicted else "    precision n/a")
+
+    if with_rewrites:
+        rng = random.Random(7)
+        sample = [i for i, s in enumerate(signatures) if s is not None]
+        sample = rng.sample(sample, min(1000, len(sample)))
+        recovered = 0
+        for i in sample:
+            sig = hasher.signature(rewrite(texts[i], rng))
+            match = index.query(sig) if sig is not None else None
+            if match and match[0] == i:
+                recovered += 1
+        print(f"  synthetic rewrites: {recovered / len(sample):.3f} linked back to the original ({len(sample)} samples)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL-корпус публікацій")
+    parser.add_argument("--dump", help="Зняти корпус з БД у вказаний файл")
+    parser.add_argument("--hours", type=int, default=48)
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--threshold", type=float, default=config.NEAR_DUP_THRESHOLD)
+    parser.add_argument("--quality-limit", type=int, default=2000)
+    parser.add_argument("--rewrites", action="store_true", help="Перевірити повноту на синтетичних переписуваннях")
+    args = parser.parse_args()
+
+    if args.dump:
+        asyncio.run(dump_corpus(args.dump, args.hours, args.limit))
+    elif args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [json.loads(line)["content"] or "" for line in f if line.strip()]
+        bench(corpus, args.threshold, args.quality_limit, args.rewrites)
+    else:
+        parser.print_help()
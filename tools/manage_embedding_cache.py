@@ -0,0 +1,61 @@
+"""
+Обслуговування постійного рівня кешу ембедингів (таблиця embedding_cache).
+
+Використання:
+    python -m tools.manage_embedding_cache status
+    python -m tools.manage_embedding_cache prune --days 30       # видалити старіші записи
+    python -m tools.manage_embedding_cache prune --model gemini-embedding-001 --keep-dim 768
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from loguru import logger
+from sqlalchemy import delete, func, select
+from database.connection import AsyncSessionLocal
+from database.models import EmbeddingCacheEntry
+
+
+async def status():
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(
+            select(EmbeddingCacheEntry.model, EmbeddingCacheEntry.dim, func.count(),
+                   func.sum(func.octet_length(EmbeddingCacheEntry.vector)),
+                   func.min(EmbeddingCacheEntry.created_at))
+            .group_by(EmbeddingCacheEntry.model, EmbeddingCacheEntry.dim)
+        )).all()
+    if not rows:
+        print("embedding_cache is empty")
+    for model, dim, count, size, oldest in rows:
+        print(f"{model} / {dim}: {count} entries, {(size or 0) / 1024 / 1024:.1f} MB, oldest {oldest:%Y-%m-%d}")
+
+
+async def prune(days: int | None, model: str | None, keep_dim: int | None):
+    stmt = delete(EmbeddingCacheEntry)
+    if days is not None:
+        stmt = stmt.where(EmbeddingCacheEntry.created_at < datetime.now(timezone.utc) - timedelta(days=days))
+    if model is not None:
+        stmt = stmt.where(EmbeddingCacheEntry.model == model)
+    if keep_dim is not None:
+        stmt = stmt.where(EmbeddingCacheEntry.dim != keep_dim)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(stmt)
+        await session.commit()
+    logger.info(f"✅ Removed {result.rowcount} cached embeddings")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    prune_parser = sub.add_parser("prune")
+    prune_parser.add_argument("--days", type=int, help="Видалити записи, старші за N днів")
+    prune_parser.add_argument("--model", help="Лише для цієї моделі")
+    prune_parser.add_argument("--keep-dim", type=int, help="Видалити записи з іншою розмірністю")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        asyncio.run(status())
+    elif args.days is None and args.model is None and args.keep_dim is None:
+        prune_parser.error("вкажіть хоча б один фільтр (--days, --model, --keep-dim)")
+    else:
+        asyncio.run(prune(args.days, args.model, args.keep_dim))
@@ -0,0 +1,258 @@
+"""
+Керування ANN-індексом stories.embedding_vector (pgvector HNSW / IVFFlat).
+
+Індекс частковий: лише активні сюжети, оновлені після фіксованої дати (у предикаті
+часткового індексу не можна використовувати now(), тому дата вшивається при створенні;
+команду create варто періодично повторювати, щоб зсувати вікно). Побудова йде
+CONCURRENTLY під тимчасовим іменем з подальшою заміною — без блокування записів.
+
+Використання:
+    python -m tools.manage_vector_index status
+    python -m tools.manage_vector_index create --method hnsw --days 7
+    python -m tools.manage_vector_index create --method ivfflat --days 7 --lists 100
+    python -m tools.manage_vector_index rebuild-dimension --dim 768
+    python -m tools.manage_vector_index bench --rows 20000 --queries 200 --method hnsw
+
+Кластеризація (services/clustering.py) зараз шукає схожі сюжети в індексі в пам'яті
+(services/vector_index.py) і цей індекс не запитує — він потрібен для ручних/аналітичних
+запитів і як запасний шлях. Щоб планувальник використав частковий індекс, запит має
+містити той самий предикат:
+    WHERE status = 'active' AND last_updated_at >= :cutoff   (cutoff не раніше дати індексу)
+    ORDER BY embedding_vector <=> :vector LIMIT k
+
+HNSW та IVFFlat для типу vector обмежені MAX_INDEX_DIM вимірами.
+rebuild-dimension будує лише HNSW: колонка на момент побудови порожня, а центроїди IVFFlat
+навчаються на наявних даних. IVFFlat — командою create, коли ембединги перераховано.
+"""
+import argparse
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from loguru import logger
+from sqlalchemy import text
+from database.connection import engine
+
+INDEX_NAME = "ix_stories_embedding_ann"
+# Найбільша розмірність vector, яку підтримують індекси HNSW/IVFFlat у pgvector
+MAX_INDEX_DIM = 2000
+
+
+def vector_literal(v) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in v) + "]"
+
+
+def index_ddl(name: str, table: str, method: str, where: str | None, lists: int = 100,
+              m: int = 16, ef_construction: int = 64, concurrently: bool = True,
+              column: str = "embedding_vector") -> str:
+    if method == "hnsw":
+        using = f"hnsw ({column} vector_cosine_ops) WITH (m = {m}, ef_construction = {ef_construction})"
+    elif method == "ivfflat":
+        using = f"ivfflat ({column} vector_cosine_ops) WITH (lists = {lists})"
+    else:
+        raise ValueError(f"Unknown index method: {method}")
+    ddl = f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} ON {table} USING {using}"
+    return ddl + (f" WHERE {where}" if where else "")
+
+
+def partial_predicate(days: int, column: str = "embedding_vector") -> str:
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    return f"status = 'active' AND {column} IS NOT NULL AND last_updated_at >= '{cutoff}'"
+
+
+async def _autocommit():
+    conn = await engine.connect()
+    return await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+
+async def status():
+    conn = await _autocommit()
+    try:
+        dim = (await conn.execute(text("""
+            SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = 'stories'::regclass AND attname = 'embedding_vector'
+        """))).scalar()
+        counts = (await conn.execute(text("""
+            SELECT count(*), count(embedding_vector), count(*) FILTER (WHERE status = 'active') FROM stories
+        """))).one()
+        indexes = (await conn.execute(text("""
+            SELECT indexname, indexdef, pg_size_pretty(pg_relation_size(indexname::regclass))
+            FROM pg_indexes WHERE tablename = 'stories' AND indexdef ILIKE '%embedding_vector%'
+        """))).all()
+    finally:
+        await conn.close()
+    print(f"stories.embedding_vector: {dim}")
+    print(f"stories: {counts[0]} total, {counts[1]} with embedding, {counts[2]} active")
+    for name, ddl, size in indexes or []:
+        print(f"  {name} ({size}): {ddl}")
+    if not indexes:
+        print("  (no ANN index)")
+
+
+async def create_index(method: str, days: int, lists: int, m: int, ef_construction: int):
+    """Будує новий частковий індекс під тимчасовим іменем і замінює ним старий."""
+    tmp_name = f"{INDEX_NAME}_new"
+    ddl = index_ddl(tmp_name, "stories", method, partial_predicate(days), lists, m, ef_construction)
+    conn = await _autocommit()
+    try:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp_name}"))
+        logger.info(f"Building: {ddl}")
+        started = time.perf_counter()
+        await conn.execute(text(ddl))
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}"))
+        await conn.execute(text(f"ALTER INDEX {tmp_name} RENAME TO {INDEX_NAME}"))
+        logger.info(f"✅ {INDEX_NAME} ({method}, last {days} days) built in {time.perf_counter() - started:.1f}s")
+    finally:
+        await conn.close()
+
+
+async def rebuild_dimension(dim: int, days: int, m: int, ef_construction: int):
+    """
+    Змінює розмірність колонки. Спершу поруч створюється порожня колонка vector(dim) і
+    будується HNSW-індекс на ній (HNSW не потребує даних для навчання, на відміну від
+    IVFFlat), потім в одній транзакції стара колонка (несумісні ембединги) замінюється
+    новою разом з індексом. Ембединги перераховуються кластеризацією.
+    """
+    method = "hnsw"
+    from database.models import Story
+    model_dim = Story.embedding_vector.type.dim
+    if model_dim != dim:
+        raise SystemExit(
+            f"database.models.Story.embedding_vector is Vector({model_dim}) — update it to Vector({dim}) first"
+        )
+    if dim > MAX_INDEX_DIM:
+        raise SystemExit(f"{method} index supports at most {MAX_INDEX_DIM} dimensions, got {dim}")
+
+    new_column = "embedding_vector_new"
+    tmp_name = f"{INDEX_NAME}_new"
+    ddl = index_ddl(tmp_name, "stories", method, partial_predicate(days, new_column),
+                    m=m, ef_construction=ef_construction, column=new_column)
+    conn = await _autocommit()
+    try:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp_name}"))
+        await conn.execute(text(f"ALTER TABLE stories DROP COLUMN IF EXISTS {new_column}"))
+        await conn.execute(text(f"ALTER TABLE stories ADD COLUMN {new_column} vector({dim})"))
+        logger.info(f"Building: {ddl}")
+        await conn.execute(text(ddl))
+    finally:
+        await conn.close()
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {INDEX_NAME}"))
+        await conn.execute(text("ALTER TABLE stories DROP COLUMN embedding_vector"))
+        await conn.execute(text(f"ALTER TABLE stories RENAME COLUMN {new_column} TO embedding_vector"))
+        await conn.execute(text(f"ALTER INDEX {tmp_name} RENAME TO {INDEX_NAME}"))
+    logger.info(f"✅ stories.embedding_vector is now vector({dim}) with {INDEX_NAME} ({method}); old embeddings cleared")
+    logger.info("For IVFFlat run `create --method ivfflat` once embeddings have been recomputed")
+
+
+def generate_dataset(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Сюжетоподібні дані: гаусові хмари навколо випадкових центрів, нормалізовані."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, clusters, size=rows)] + 0.35 * rng.normal(size=(rows, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+async def bench(rows: int, queries: int, dim: int, k: int, method: str, lists: int, m: int,
+                ef_construction: int, ef_search: int, probes: int):
+    """Точний пошук проти ANN на згенерованих даних у тимчасовій таблиці: recall@k і затримка."""
+    data = generate_dataset(rows + queries, dim, clusters=max(10, rows // 50))
+    base, query_vectors = data[:rows], data[rows:]
+    conn = await _autocommit()
+    try:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.execute(text("DROP TABLE IF EXISTS bench_story_vectors"))
+        await conn.execute(text(f"CREATE TABLE bench_story_vectors (id integer PRIMARY KEY, embedding_vector vector({dim}))"))
+        started = time.perf_counter()
+        batch = 500
+        for i in range(0, rows, batch):
+            await conn.execute(
+                text("INSERT INTO bench_story_vectors (id, embedding_vector) VALUES (:id, CAST(:v AS vector))"),
+                [{"id": i + j, "v": vector_literal(v)} for j, v in enumerate(base[i:i + batch])]
+            )
+        logger.info(f"Inserted {rows} vectors in {time.perf_counter() - started:.1f}s")
+
+        search_sql = text(f"""
+            SELECT id FROM bench_story_vectors
+            ORDER BY embedding_vector <=> CAST(:v AS vector) LIMIT {k}
+        """)
+
+        async def run_queries() -> tuple[list[set[int]], list[float]]:
+            results, latencies = [], []
+            for q in query_vectors:
+                t0 = time.perf_counter()
+                ids = (await conn.execute(search_sql, {"v": vector_literal(q)})).scalars().all()
+                latencies.append(time.perf_counter() - t0)
+                results.append(set(ids))
+            return results, latencies
+
+        exact, exact_lat = await run_queries()
+
+        started = time.perf_counter()
+        await conn.execute(text(index_ddl("bench_story_vectors_ann", "bench_story_vectors", method, None,
+                                          lists, m, ef_construction, concurrently=False)))
+        build_time = time.perf_counter() - started
+        await conn.execute(text("ANALYZE bench_story_vectors"))
+        if method == "hnsw":
+            await conn.execute(text(f"SET hnsw.ef_search = {ef_search}"))
+        else:
+            await conn.execute(text(f"SET ivfflat.probes = {probes}"))
+        ann, ann_lat = await run_queries()
+    finally:
+        await conn.execute(text("DROP TABLE IF EXISTS bench_story_vectors"))
+        await conn.close()
+
+    recall = sum(len(a & e) for a, e in zip(ann, exact)) / sum(len(e) for e in exact)
+
+    def pct(values, p):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)] * 1000
+
+    print(f"Dataset: {rows} x {dim}, {queries} queries, k={k}, {method} (build {build_time:.1f}s)")
+    print(f"  exact: p50 {pct(exact_lat, 0.5):.2f} ms, p95 {pct(exact_lat, 0.95):.2f} ms")
+    print(f"  ann:   p50 {pct(ann_lat, 0.5):.2f} ms, p95 {pct(ann_lat, 0.95):.2f} ms")
+    print(f"  recall@{k}: {recall:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+
+    def add_index_args(p):
+        p.add_argument("--method", choices=("hnsw", "ivfflat"), default="hnsw")
+        p.add_argument("--days", type=int, default=7, help="Вікно часткового індексу")
+        p.add_argument("--lists", type=int, default=100, help="IVFFlat: кількість списків")
+        p.add_argument("--m", type=int, default=16, help="HNSW: зв'язків на вузол")
+        p.add_argument("--ef-construction", type=int, default=64)
+
+    add_index_args(sub.add_parser("create"))
+    rebuild = sub.add_parser(
+        "rebuild-dimension",
+        help="Змінити розмірність колонки; будує лише HNSW (IVFFlat на порожній колонці не навчити)",
+    )
+    rebuild.add_argument("--dim", type=int, required=True)
+    rebuild.add_argument("--days", type=int, default=7, help="Вікно часткового індексу")
+    rebuild.add_argument("--m", type=int, default=16, help="HNSW: зв'язків на вузол")
+    rebuild.add_argument("--ef-construction", type=int, default=64)
+    bench_parser = sub.add_parser("bench")
+    add_index_args(bench_parser)
+    bench_parser.add_argument("--rows", type=int, default=20000)
+    bench_parser.add_argument("--queries", type=int, default=200)
+    bench_parser.add_argument("--dim", type=int, default=768)
+    bench_parser.add_argument("--k", type=int, default=10)
+    bench_parser.add_argument("--ef-search", type=int, default=40)
+    bench_parser.add_argument("--probes", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        asyncio.run(status())
+    elif args.command == "create":
+        asyncio.run(create_index(args.method, args.days, args.lists, args.m, args.ef_construction))
+    elif args.command == "rebuild-dimension":
+        asyncio.run(rebuild_dimension(args.dim, args.days, args.m, args.ef_construction))
+    else:
+        asyncio.run(bench(args.rows, args.queries, args.dim, args.k, args.method, args.lists, args.m,
+                          args.ef_construction, args.ef_search, args.probes))
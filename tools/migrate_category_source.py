@@ -0,0 +1,24 @@
+import asyncio
+from sqlalchemy import text
+from database.connection import AsyncSessionLocal
+from loguru import logger
+
+async def migrate():
+    """
+    Додає stories.category_source і publications.category_source — хто визначив категорію
+    (llm, local або default). Наявні записи лишаються NULL і вважаються категоріями від LLM.
+    """
+    logger.info("Adding stories.category_source, publications.category_source...")
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(text("ALTER TABLE stories ADD COLUMN IF NOT EXISTS category_source VARCHAR(8);"))
+            await session.execute(text("ALTER TABLE publications ADD COLUMN IF NOT EXISTS category_source VARCHAR(8);"))
+            await session.commit()
+            logger.info("✅ stories.category_source, publications.category_source added.")
+        except Exception as e:
+            logger.error(f"❌ Migration failed: {e}")
+            await session.rollback()
+            raise e
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
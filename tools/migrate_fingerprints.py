@@ -0,0 +1,50 @@
+import asyncio
+from sqlalchemy import text
+from database.connection import AsyncSessionLocal
+from services.fingerprint import content_hash
+from loguru import logger
+
+BATCH = 1000
+
+async def migrate(hours: int = 48):
+    """
+    Додає publications.content_hash з індексом і заповнює відбитки
+    для публікацій за останні `hours` годин (щоб дедуплікація працювала одразу після деплою).
+    """
+    logger.info("Adding publications.content_hash...")
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(text("ALTER TABLE publications ADD COLUMN IF NOT EXISTS content_hash VARCHAR(16);"))
+            await session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_publications_content_hash ON publications (content_hash);"
+            ))
+            await session.commit()
+
+            result = await session.execute(
+                text("""
+                    SELECT id, content FROM publications
+                    WHERE content_hash IS NULL AND published_at >= now() - make_interval(hours => :hours)
+                """),
+                {"hours": hours}
+            )
+            rows = [(pub_id, content_hash(content)) for pub_id, content in result.all()]
+            rows = [(pub_id, h) for pub_id, h in rows if h]
+            for i in range(0, len(rows), BATCH):
+                chunk = rows[i:i + BATCH]
+                await session.execute(
+                    text("""
+                        UPDATE publications AS p SET content_hash = v.hash
+                        FROM unnest(CAST(:ids AS integer[]), CAST(:hashes AS varchar[])) AS v(id, hash)
+                        WHERE p.id = v.id
+                    """),
+                    {"ids": [r[0] for r in chunk], "hashes": [r[1] for r in chunk]}
+                )
+            await session.commit()
+            logger.info(f"✅ Fingerprints computed for {len(rows)} publications.")
+        except Exception as e:
+            logger.error(f"❌ Migration failed: {e}")
+            await session.rollback()
+            raise e
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
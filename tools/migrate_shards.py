@@ -0,0 +1,26 @@
+import asyncio
+from sqlalchemy import text
+from database.connection import AsyncSessionLocal
+from loguru import logger
+
+async def migrate():
+    """
+    Додає backfill_jobs.shard — шард монітора, який виконує завдання.
+    Наявні завдання (shard IS NULL) може взяти будь-який шард.
+    Додає channels.shard — шард, чий акаунт приєднався до каналу; для наявних каналів
+    заповнюється знімком діалогів при першому старті монітора.
+    """
+    logger.info("Adding backfill_jobs.shard, channels.shard...")
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(text("ALTER TABLE backfill_jobs ADD COLUMN IF NOT EXISTS shard VARCHAR;"))
+            await session.execute(text("ALTER TABLE channels ADD COLUMN IF NOT EXISTS shard VARCHAR;"))
+            await session.commit()
+            logger.info("✅ backfill_jobs.shard, channels.shard added.")
+        except Exception as e:
+            logger.error(f"❌ Migration failed: {e}")
+            await session.rollback()
+            raise e
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
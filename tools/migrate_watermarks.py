@@ -0,0 +1,33 @@
+import asyncio
+from sqlalchemy import text
+from database.connection import AsyncSessionLocal
+from loguru import logger
+
+async def migrate():
+    """
+    Додає channels.last_message_id (водяний знак монітора) та заповнює його
+    найбільшим telegram_message_id з уже збережених публікацій.
+    """
+    logger.info("Adding channels.last_message_id watermark...")
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(text("ALTER TABLE channels ADD COLUMN IF NOT EXISTS last_message_id BIGINT;"))
+            result = await session.execute(text("""
+                UPDATE channels AS c
+                SET last_message_id = m.max_id
+                FROM (
+                    SELECT channel_id, MAX(telegram_message_id) AS max_id
+                    FROM publications
+                    GROUP BY channel_id
+                ) AS m
+                WHERE c.id = m.channel_id AND c.last_message_id IS NULL;
+            """))
+            await session.commit()
+            logger.info(f"✅ Watermarks initialised for {result.rowcount} channels.")
+        except Exception as e:
+            logger.error(f"❌ Migration failed: {e}")
+            await session.rollback()
+            raise e
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -1,46 +1,48 @@
 import asyncio
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from database.connection import AsyncSessionLocal
-from database.models import Publication
-from services.clustering import cluster_publication
+from database.models import Publication, ClusterJob
+from services.cluster_queue import cluster_queue
 from loguru import logger
 import sys
 
 async def process_stuck_publications():
+    """
+    Ставить у чергу кластеризації публікації без story_id, для яких немає завдання
+    (збережені до появи cluster_jobs), і повертає dead-завдання в роботу.
+    Саму кластеризацію виконують воркери cluster_queue у процесі монітора.
+    """
     logger.info("Starting manual queue processing...")
-    
+
     async with AsyncSessionLocal() as session:
         from datetime import datetime, timedelta
         time_limit = datetime.utcnow() - timedelta(hours=48)
-        
-        # Шукаємо останні публікації без story_id
+
+        # Шукаємо останні публікації без story_id і без завдання в черзі
         query = (
-            select(Publication)
-            .where(Publication.story_id == None, Publication.published_at >= time_limit)
+            select(Publication.id)
+            .outerjoin(ClusterJob, ClusterJob.publication_id == Publication.id)
+            .where(Publication.story_id == None, Publication.published_at >= time_limit, ClusterJob.id == None)
             .order_by(Publication.published_at.desc())
-            .limit(200)
         )
         result = await session.execute(query)
-        pubs = result.scalars().all()
-        
-        if not pubs:
-            logger.info("No stuck publications found in last 48h.")
-            return
+        pub_ids = result.scalars().all()
+
+        # Dead-завдання отримують ще один набір спроб
+        revived = await session.execute(
+            update(ClusterJob)
+            .where(ClusterJob.status == "dead")
+            .values(status="pending", attempts=0, available_at=func.now())
+        )
+        await session.commit()
+        logger.info(f"Revived {revived.rowcount} dead jobs.")
 
-        logger.info(f"Found {len(pubs)} publications to process.")
-        
-        for pub in pubs:
-            logger.info(f"Processing pub ID {pub.id}: {pub.content[:50]}...")
-            try:
-                await cluster_publication(pub.id)
-                logger.info(f"✅ Successfully processed pub {pub.id}")
-            except Exception as e:
-                logger.error(f"❌ Failed to process pub {pub.id}: {e}")
-            
-            # Мінімальне очікування
-            await asyncio.sleep(0.1)
+    if not pub_ids:
+        logger.info("No stuck publications found in last 48h.")
+        return
 
-    logger.info("Manual processing completed.")
+    await cluster_queue.enqueue(list(pub_ids))
+    logger.info(f"Enqueued {len(pub_ids)} publications for clustering.")
 
 if __name__ == "__main__":
     # Додаємо поточну директорію в path для імпортів
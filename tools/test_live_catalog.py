@@ -2,6 +2,7 @@ import asyncio
 from database.connection import AsyncSessionLocal
 from database.models import Publication, Channel, Category, ChannelCategory
 from services.clustering import cluster_publication
+from services.category_stats import channel_category_counter
 from sqlalchemy import select
 from loguru import logger
 from datetime import datetime, timezone
@@ -48,6 +49,7 @@ async def test_live_catalog():
     # - Створити категорію в БД, якщо її немає
     # - Оновити ChannelCategory
     await cluster_publication(pub_id)
+    await channel_category_counter.flush()
     
     # 4. Перевіряємо результат
     async with AsyncSessionLocal() as session:
@@ -0,0 +1,146 @@
+"""
+Навчання та оцінка локального класифікатора категорій (services/local_classifier.py).
+
+Корпус — JSONL з полями channel_id, category (мітка "емодзі назва") і content,
+знятий з publications.category — лише категорії від LLM (category_source), без рішень
+самого класифікатора та категорій за замовчуванням. Навчання та оцінка працюють офлайн
+лише з файлом корпусу.
+
+Використання:
+    python -m tools.train_category_model dump --out corpus.jsonl --days 60
+    python -m tools.train_category_model train --corpus corpus.jsonl --out data/category_model.npz
+    python -m tools.train_category_model evaluate --corpus corpus.jsonl --model data/category_model.npz
+
+Оцінка ділить корпус на навчальну та тестову частини (та сама --holdout і --seed, що й
+при навчанні); апріорні розподіли каналів рахуються лише з навчальної частини.
+Виводиться точність і частка публікацій, що обійдуться без LLM, для кількох порогів.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+import numpy as np
+from config.settings import config
+from services.local_classifier import LinearTextModel, channel_prior, combine, featurize, llm_labelled
+
+
+async def dump_corpus(path: str, days: int, limit: int):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import select
+    from database.connection import AsyncSessionLocal
+    from database.models import Publication
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Publication.channel_id, Publication.category, Publication.content)
+            .where(Publication.published_at >= since, Publication.category.isnot(None),
+                   Publication.content.isnot(None), llm_labelled(Publication))
+            .order_by(Publication.published_at)
+            .limit(limit)
+        )
+        rows = result.all()
+    with open(path, "w", encoding="utf-8") as f:
+        for channel_id, category, content in rows:
+            f.write(json.dumps({"channel_id": channel_id, "category": category, "content": content},
+                               ensure_ascii=False) + "\n")
+    print(f"Saved {len(rows)} publications to {path}")
+
+
+def load_corpus(path: str, min_class_size: int) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        docs = [json.loads(line) for line in f if line.strip()]
+    docs = [d for d in docs if d.get("category") and d.get("content")]
+    sizes = Counter(d["category"] for d in docs)
+    return [d for d in docs if sizes[d["category"]] >= min_class_size]
+
+
+def split(docs: list[dict], holdout: float, seed: int) -> tuple[list[dict], list[dict]]:
+    order = np.random.default_rng(seed).permutation(len(docs))
+    cut = int(len(docs) * (1 - holdout))
+    return [docs[i] for i in order[:cut]], [docs[i] for i in order[cut:]]
+
+
+def train(corpus: str, out: str, holdout: float, seed: int, epochs: int, lr: float, min_class_size: int):
+    docs = load_corpus(corpus, min_class_size)
+    train_docs, _ = split(docs, holdout, seed)
+    classes = sorted({d["category"] for d in train_docs})
+    print(f"Training on {len(train_docs)} of {len(docs)} docs, {len(classes)} categories")
+    started = time.perf_counter()
+    features = [featurize(d["content"]) for d in train_docs]
+    labels = np.array([classes.index(d["category"]) for d in train_docs])
+    model = LinearTextModel(classes)
+    model.fit(features, labels, epochs=epochs, lr=lr, seed=seed)
+    model.save(out)
+    print(f"Saved {out} ({time.perf_counter() - started:.1f}s)")
+
+
+def evaluate(corpus: str, model_path: str, holdout: float, seed: int, prior_weight: float, min_class_size: int):
+    model = LinearTextModel.load(model_path)
+    train_docs, test_docs = split(load_corpus(corpus, min_class_size), holdout, seed)
+    test_docs = [d for d in test_docs if d["category"] in model.classes]
+    if not test_docs:
+        print("No test documents with known categories")
+        return
+
+    counts: dict[int, Counter] = {}
+    for d in train_docs:
+        counts.setdefault(d.get("channel_id"), Counter())[d["category"]] += 1
+
+    started = time.perf_counter()
+    text_proba = model.predict_proba([featurize(d["content"], model.n_features) for d in test_docs])
+    elapsed = time.perf_counter() - started
+    truth = np.array([model.classes.index(d["category"]) for d in test_docs])
+
+    variants = {"text only": text_proba}
+    if prior_weight > 0:
+        variants[f"text + channel prior (w={prior_weight})"] = np.stack([
+            combine(p, channel_prior(counts[d.get("channel_id")], model.classes)
+                    if d.get("channel_id") in counts else None, prior_weight)
+            for p, d in zip(text_proba, test_docs)
+        ])
+
+    print(f"Test: {len(test_docs)} docs, {len(model.classes)} categories, "
+          f"{len(test_docs) / max(elapsed, 1e-9):,.0f} docs/s")
+    for name, proba in variants.items():
+        predicted = proba.argmax(axis=1)
+        confidence = proba.max(axis=1)
+        print(f"  {name}: accuracy {np.mean(predicted == truth):.3f}")
+        for threshold in sorted({0.6, 0.7, 0.8, config.LOCAL_CLASSIFIER_THRESHOLD, 0.9, 0.95}):
+            confident = confidence >= threshold
+            precision = np.mean(predicted[confident] == truth[confident]) if confident.any() else float("nan")
+            print(f"    threshold {threshold:.2f}: coverage {confident.mean():.3f}, precision {precision:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    dump = sub.add_parser("dump")
+    dump.add_argument("--out", required=True)
+    dump.add_argument("--days", type=int, default=60)
+    dump.add_argument("--limit", type=int, default=200000)
+
+    def add_common(p):
+        p.add_argument("--corpus", required=True)
+        p.add_argument("--holdout", type=float, default=0.1)
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--min-class-size", type=int, default=20, help="Рідші категорії не навчаються")
+
+    train_parser = sub.add_parser("train")
+    add_common(train_parser)
+    train_parser.add_argument("--out", default=config.LOCAL_CLASSIFIER_PATH)
+    train_parser.add_argument("--epochs", type=int, default=8)
+    train_parser.add_argument("--lr", type=float, default=5.0)
+    eval_parser = sub.add_parser("evaluate")
+    add_common(eval_parser)
+    eval_parser.add_argument("--model", default=config.LOCAL_CLASSIFIER_PATH)
+    eval_parser.add_argument("--prior-weight", type=float, default=config.LOCAL_CLASSIFIER_PRIOR_WEIGHT)
+    args = parser.parse_args()
+
+    if args.command == "dump":
+        asyncio.run(dump_corpus(args.out, args.days, args.limit))
+    elif args.command == "train":
+        train(args.corpus, args.out, args.holdout, args.seed, args.epochs, args.lr, args.min_class_size)
+    else:
+        evaluate(args.corpus, args.model, args.holdout, args.seed, args.prior_weight, args.min_class_size)